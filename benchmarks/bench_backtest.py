@@ -0,0 +1,179 @@
+"""
+Synthetic large-input benchmarks for the backtest engines.
+
+Times the hot paths of `BaseBacktest` (`__build__`, `get_analysis`, `get_performance`, `summarize`
+and `to_json`) for both engines over synthetic inputs, tracks the peak traced memory of each stage
+and writes the results to a JSON baseline. Comparing against a previous baseline flags regressions.
+
+Usage:
+    python -m benchmarks.bench_backtest --sizes 10000 100000 1000000 10000000 --output benchmarks/baseline.json
+    python -m benchmarks.bench_backtest --sizes 10000 100000 --compare benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import gc
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import orjson
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BaseBacktest, BenchmarkCache
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType
+
+ENGINES = {
+    "vn_stocks": BacktestVnStocks,
+    "vn_futures": BacktestVnFutures,
+}
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def synthetic_input(bt_cls, n: int, seed: int = 0) -> BacktestInput:
+    """Random-walk prices on a 1-minute grid with a regime-switching long/short signal."""
+    rng = np.random.default_rng(seed)
+    if bt_cls is BacktestVnFutures:
+        prices = 1_250 + np.cumsum(rng.normal(0, 0.5, n))
+        positions = np.repeat(rng.choice([-2.0, 0.0, 2.0], -(-n // 240)), 240)[:n]
+        symbol, symbol_type = "VN30F1M", TypeSymbolType.VnFuture
+    else:
+        prices = 25_000 * np.exp(np.cumsum(rng.normal(0, 0.0005, n)))
+        positions = np.repeat(rng.choice([0.0, 10_000.0], -(-n // 240)), 240)[:n]
+        symbol, symbol_type = "SSI", TypeSymbolType.VnStock
+    trade_sizes = np.diff(positions, prepend=0.0)
+    return BacktestInput(
+        bot_id=f"bench-{n}",
+        timeframe="1min",
+        bt_mode=TypeTradeMode.Train,
+        bt_cls=bt_cls,
+        symbol=symbol,
+        symbol_type=symbol_type,
+        re_run=False,
+        book_size=1_000_000_000,
+        actions=np.sign(trade_sizes).astype(np.int8).tolist(),
+        times=np.datetime64("2015-01-05T09:00", "ns") + np.arange(n).astype("timedelta64[m]"),
+        prices=prices,
+        positions=positions,
+        trade_sizes=trade_sizes,
+        volumes=rng.integers(1_000, 100_000, n).astype(np.float64),
+    )
+
+
+def _measure(fn: Callable, trace_memory: bool):
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _record(engine: str, n: int, stage: str, seconds: float, peak) -> Dict:
+    memory = f" peak={peak / 1024 ** 2:10.1f} MiB" if peak is not None else ""
+    logging.info(f"{engine:>10} n={n:>10,} {stage:<16} {seconds:9.3f}s{memory}")
+    return dict(engine=engine, bars=n, stage=stage, seconds=seconds, peak_bytes=peak)
+
+
+def bench_engine(name: str, bt_cls, n: int, trace_memory: bool = True, **kwargs) -> List[Dict]:
+    inp = synthetic_input(bt_cls, n)
+    BenchmarkCache.clear()
+    bt: BaseBacktest
+    bt, init_s, init_peak = _measure(lambda: bt_cls(inp, **kwargs), trace_memory)
+
+    def build():
+        BenchmarkCache.clear()
+        return bt.__build__()
+
+    def summarize():
+        # Recompute the metrics the previous stages cached, as a first summarize would
+        bt.trade_analysis, bt.performance = None, None
+        return bt.summarize()
+
+    stages = [
+        ("__build__", build),
+        ("get_analysis", lambda: (setattr(bt, "trade_analysis", None), bt.get_analysis())),
+        ("get_performance", lambda: (setattr(bt, "performance", None), bt.get_performance())),
+        ("summarize", summarize),
+    ]
+    results = [_record(name, n, "__init__", init_s, init_peak)]
+    summary = None
+    for stage, fn in stages:
+        summary, seconds, peak = _measure(fn, trace_memory)
+        results.append(_record(name, n, stage, seconds, peak))
+    _, seconds, peak = _measure(summary.to_json, trace_memory)
+    results.append(_record(name, n, "to_json", seconds, peak))
+    return results
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Stages slower or heavier than the baseline by more than `tolerance` (relative)."""
+    previous = {(r["engine"], r["bars"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["engine"], r["bars"], r["stage"]))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if old.get(metric) and r.get(metric) and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{r['engine']} n={r['bars']} {r['stage']} {metric}: {old[metric]:.4g} -> {r[metric]:.4g}"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument("--output", default=None, help="write the results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--lean", action="store_true", help="run the engines in lean mode")
+    parser.add_argument("--float32", action="store_true", help="float32 series (lean mode)")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.sizes:
+        for name in args.engines:
+            results.extend(bench_engine(
+                name, ENGINES[name], n, trace_memory=not args.no_memory,
+                lean=args.lean, dtype=np.float32 if args.float32 else None,
+            ))
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "lean": args.lean,
+            "float32": args.float32,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        logging.info(f"Baseline written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            regressions = compare(results, orjson.loads(f.read()), args.tolerance)
+        for line in regressions:
+            logging.warning(f"Regression: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
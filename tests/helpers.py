@@ -0,0 +1,40 @@
+import numpy as np
+
+from xno.backtest import BacktestVnFutures
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType
+
+T0 = np.datetime64("2024-01-02T09:00", "ns")
+
+
+def minute_times(n, start=T0, step=1):
+    """`n` bar times `step` minutes apart from `start`"""
+    return start + (np.arange(n) * step).astype("timedelta64[m]")
+
+
+def make_input(bt_cls, prices, positions, trade_sizes=None, times=None, volumes=None, bars=slice(None),
+               bot_id="bot", timeframe="1min", symbol="SSI", book_size=1e9) -> BacktestInput:
+    """
+    Backtest input of full-length series cut to `bars`. Trade sizes default to the position changes,
+    actions are their signs and times are consecutive minutes from `T0`.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    if trade_sizes is None:
+        trade_sizes = np.diff(positions, prepend=0.0)
+    if times is None:
+        times = minute_times(len(positions))
+    return BacktestInput(
+        bot_id=bot_id,
+        timeframe=timeframe,
+        bt_mode=TypeTradeMode.Train,
+        bt_cls=bt_cls,
+        symbol=symbol,
+        symbol_type=TypeSymbolType.VnFuture if bt_cls is BacktestVnFutures else TypeSymbolType.VnStock,
+        re_run=False,
+        book_size=book_size,
+        actions=np.sign(np.diff(positions, prepend=0.0)).astype(int).tolist()[bars],
+        times=times[bars],
+        prices=np.asarray(prices)[bars],
+        positions=positions[bars],
+        trade_sizes=np.asarray(trade_sizes)[bars],
+        volumes=None if volumes is None else np.asarray(volumes)[bars],
+    )
@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+try:
+    from xno.data import all_data_final
+except RuntimeError as e:  # xno.connectors needs a reachable Redis at import time
+    raise unittest.SkipTest(f"xno.data.all_data_final unavailable: {e}")
+
+EPS = "income_statement_EPS"
+PE = "ratio_P/E"
+
+
+def make_bars(start="2023-12-01", end="2024-09-30"):
+    times = pd.date_range(start, end, freq="B")
+    close = np.linspace(20.0, 30.0, len(times))
+    return pd.DataFrame(dict(open=close, high=close, low=close, close=close, volume=1.0), index=times)
+
+
+def make_statements():
+    index = pd.DatetimeIndex(["2023-09-30", "2023-12-31", "2024-03-31", "2024-06-30"], name="time")
+    return pd.DataFrame({EPS: [1.0, 2.0, 3.0, 4.0], PE: [10.0, 11.0, 12.0, 13.0]}, index=index)
+
+
+class TestAllData(unittest.TestCase):
+    """Unit tests for the point-in-time join of financials onto bars"""
+
+    def setUp(self):
+        all_data_final.AllData._aligned_cache.clear()
+        self.bars = make_bars()
+        self.statements = make_statements()
+        self.patches = [
+            mock.patch.object(all_data_final.OhlcvDataManager, "get", side_effect=lambda *a, **k: self.bars.copy()),
+            mock.patch.object(all_data_final, "get_financial_data", side_effect=lambda **k: self.statements),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_no_lookahead(self):
+        """A period's figures only appear once its report is known, period end + lag"""
+        df = all_data_final.AllData(reporting_lag={"quarter": 45}).add_field(EPS).get("D", "SSI")
+
+        # Q4 2023 (2023-12-31) is known from 2024-02-14, Q1 2024 from 2024-05-15
+        self.assertEqual(df.loc["2024-02-13", EPS], 1.0)
+        self.assertEqual(df.loc["2024-02-14", EPS], 2.0)
+        self.assertEqual(df.loc["2024-05-14", EPS], 2.0)
+        self.assertEqual(df.loc["2024-05-15", EPS], 3.0)
+        self.assertEqual(list(df.columns), ["Close", EPS])
+
+    def test_publish_date_column(self):
+        """Actual publication dates take precedence over the lag, missing ones fall back to it"""
+        self.statements["published"] = pd.to_datetime(["2023-10-20", "2024-01-25", None, "2024-07-22"])
+        data = all_data_final.AllData(reporting_lag={"quarter": 45}, publish_date_column="published")
+        df = data.add_field(EPS).add_field(PE).get("D", "SSI")
+
+        self.assertEqual(df.loc["2024-01-24", EPS], 1.0)
+        self.assertEqual(df.loc["2024-01-25", PE], 11.0)
+        self.assertEqual(df.loc["2024-05-15", EPS], 3.0)
+        self.assertEqual(df.loc["2024-07-22", EPS], 4.0)
+
+    def test_alignment_cached(self):
+        """The as-of join is computed once per symbol, resolution and field set while inputs are unchanged"""
+        data = all_data_final.AllData().add_field(EPS)
+        with mock.patch.object(all_data_final.pd, "merge_asof", wraps=pd.merge_asof) as merge_asof:
+            first = data.get("D", "SSI")
+            second = data.get("D", "SSI")
+            self.assertEqual(merge_asof.call_count, 1)
+
+            self.statements = make_statements()  # statements refreshed
+            data.get("D", "SSI")
+            self.assertEqual(merge_asof.call_count, 2)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_get_many(self):
+        """Bars of all symbols are preloaded in bulk, statements fetched together and joined in one pass"""
+        statements = {"SSI": self.statements, "HPG": self.statements.drop(columns=PE) * 2}
+        data = all_data_final.AllData(reporting_lag={"quarter": 45}).add_field(EPS).add_field(PE)
+        with mock.patch.object(all_data_final.OhlcvDataManager, "preload") as preload, \
+                mock.patch.object(all_data_final, "get_financial_data_many",
+                                  side_effect=lambda symbols, period: {s: statements[s] for s in symbols}) as fetch, \
+                mock.patch.object(all_data_final.pd, "merge_asof", wraps=pd.merge_asof) as merge_asof:
+            dfs = data.get_many("D", ["SSI", "HPG", "SSI"], from_time="2024-01-01", to_time="2024-09-30")
+            self.assertEqual(merge_asof.call_count, 1)
+
+        preload.assert_called_once()
+        self.assertEqual(preload.call_args.args[0], ["SSI", "HPG"])
+        fetch.assert_called_once()
+        self.assertEqual(list(dfs), ["SSI", "HPG"])
+        for symbol, df in dfs.items():
+            self.statements = statements[symbol]
+            pd.testing.assert_frame_equal(df, data.get("D", symbol))
+        self.assertNotIn(PE, dfs["HPG"].columns)
+
+if __name__ == "__main__":
+    unittest.main()
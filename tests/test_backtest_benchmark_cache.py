@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from cachetools import LRUCache
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache
+from tests import helpers
+
+
+def make_input(bt_cls, n, start=0, bot_id="bot"):
+    rng = np.random.default_rng(42)
+    bars = slice(start, start + n)
+    prices = 20_000 * np.exp(np.cumsum(rng.normal(0, 0.001, 5_000)))
+    positions = np.zeros(5_000)
+    positions[bars] = np.where(np.sin(np.arange(n) / 50.0) > 0, 1.0, 0.0)  # flat before the start
+    return helpers.make_input(bt_cls, prices, positions, bars=bars, bot_id=bot_id)
+
+
+class TestBenchmarkCache(unittest.TestCase):
+    """Unit tests for the shared benchmark series cache"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+
+    def test_shared_between_bots(self):
+        """Bots on the same market reuse the same benchmark arrays"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            first = bt_cls(make_input(bt_cls, 2_000, bot_id="a"))
+            second = bt_cls(make_input(bt_cls, 2_000, bot_id="b"))
+
+            self.assertTrue(np.shares_memory(first.bm_equities, second.bm_equities))
+
+    def test_shorter_range_gets_own_entry(self):
+        """A shorter range with the same first bar is keyed on its own history and matches a fresh build"""
+        full = BacktestVnStocks(make_input(BacktestVnStocks, 3_000))
+        cached = BacktestVnStocks(make_input(BacktestVnStocks, 1_000))
+        BenchmarkCache.clear()
+        fresh = BacktestVnStocks(make_input(BacktestVnStocks, 1_000))
+
+        self.assertEqual(len(cached.bm_cumrets), 1_000)
+        self.assertFalse(np.shares_memory(full.bm_equities, cached.bm_equities))
+        for name in ("bm_equities", "bm_returns", "bm_cumrets", "bm_pnls"):
+            np.testing.assert_array_equal(getattr(cached, name), getattr(fresh, name))
+
+    def test_byte_budget(self):
+        """Entries are evicted least recently used first once the byte budget is exceeded"""
+        one = sum(s.nbytes for s in BacktestVnStocks(make_input(BacktestVnStocks, 1_000)).get_benchmark())
+        BenchmarkCache.clear()
+        budget = LRUCache(maxsize=2.5 * one, getsizeof=BenchmarkCache._cache.getsizeof)
+        with mock.patch.object(BenchmarkCache, "_cache", budget):
+            first = BacktestVnStocks(make_input(BacktestVnStocks, 1_000))
+            for start in (1, 2):
+                BacktestVnStocks(make_input(BacktestVnStocks, 1_000, start=start))
+            self.assertEqual(len(BenchmarkCache._cache), 2)
+            self.assertLessEqual(BenchmarkCache._cache.currsize, 2.5 * one)
+            again = BacktestVnStocks(make_input(BacktestVnStocks, 1_000))
+
+        self.assertFalse(np.shares_memory(first.bm_equities, again.bm_equities))
+
+    def test_later_start_is_recomputed(self):
+        """A range starting later does not reuse the entry"""
+        full = BacktestVnFutures(make_input(BacktestVnFutures, 3_000))
+        shifted = BacktestVnFutures(make_input(BacktestVnFutures, 1_000, start=500))
+
+        self.assertFalse(np.shares_memory(full.bm_equities, shifted.bm_equities))
+        self.assertEqual(shifted.bm_returns[0], 0.0)
+
+    def test_adjusted_history_is_recomputed(self):
+        """A backward-adjusted history with the same last bar does not reuse the unadjusted series"""
+        BacktestVnStocks(make_input(BacktestVnStocks, 2_000))
+        adjusted = make_input(BacktestVnStocks, 2_000, bot_id="adjusted")
+        adjusted.prices = np.r_[adjusted.prices[:1_000] * 0.9, adjusted.prices[1_000:]]
+        cached = BacktestVnStocks(adjusted)
+        BenchmarkCache.clear()
+        fresh = BacktestVnStocks(adjusted)
+
+        np.testing.assert_array_equal(cached.bm_equities, fresh.bm_equities)
+
+    def test_engine_parameters_in_key(self):
+        """A different fee rate or contract size gets its own benchmark"""
+        base = BacktestVnFutures(make_input(BacktestVnFutures, 1_000))
+        for name, value in (("fee_rate", 0.0), ("price_per_contract", 12_500_000)):
+            with mock.patch.object(BacktestVnFutures, name, value):
+                other = BacktestVnFutures(make_input(BacktestVnFutures, 1_000))
+            self.assertFalse(np.shares_memory(base.bm_equities, other.bm_equities))
+            self.assertNotEqual(base.bm_equities[0], other.bm_equities[0])
+
+if __name__ == "__main__":
+    unittest.main()
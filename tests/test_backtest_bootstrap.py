@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest.bootstrap import (
+    block_bootstrap_indices,
+    bootstrap_metrics,
+    bootstrap_confidence_intervals,
+    resampled_metrics,
+)
+
+
+class TestBootstrap(unittest.TestCase):
+    """Unit tests for the vectorized block bootstrap"""
+
+    def setUp(self):
+        self.returns = np.random.default_rng(7).normal(0.0005, 0.01, 2_000)
+
+    def test_indices_are_circular_blocks(self):
+        """Each row is made of consecutive (wrapped) blocks"""
+        idx = block_bootstrap_indices(100, 5, 10, np.random.default_rng(0))
+
+        self.assertEqual(idx.shape, (5, 100))
+        self.assertTrue(((idx >= 0) & (idx < 100)).all())
+        steps = (np.diff(idx.reshape(5, 10, 10), axis=2) % 100)
+        self.assertTrue((steps == 1).all())
+
+    def test_metrics_match_direct_computation(self):
+        """Row-wise metrics match a straightforward computation"""
+        metrics = resampled_metrics(self.returns[None, :], periods=252)
+        wealth = np.cumprod(1 + self.returns)
+
+        self.assertAlmostEqual(
+            metrics["sharpe"][0],
+            self.returns.mean() / self.returns.std(ddof=1) * np.sqrt(252),
+        )
+        self.assertAlmostEqual(metrics["max_drawdown"][0], np.min(wealth / np.maximum.accumulate(wealth)) - 1)
+
+    def test_chunking_does_not_change_results(self):
+        """Results only depend on the seed, not on the chunk size"""
+        whole = bootstrap_metrics(self.returns, 252, n_resamples=50, seed=3)
+        chunked = bootstrap_metrics(self.returns, 252, n_resamples=50, seed=3, max_chunk_bytes=1)
+
+        for name in whole:
+            np.testing.assert_allclose(whole[name], chunked[name])
+
+    def test_interval_contains_point_estimate(self):
+        """The 95% interval brackets the full-sample Sharpe"""
+        intervals = bootstrap_confidence_intervals(self.returns, 252, n_resamples=300, seed=1)
+        sharpe = self.returns.mean() / self.returns.std(ddof=1) * np.sqrt(252)
+
+        lower, upper = intervals["sharpe"]
+        self.assertLess(lower, sharpe)
+        self.assertGreater(upper, sharpe)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks
+from xno.backtest.costs import (
+    HOSE_TICKS,
+    PercentFee,
+    SellTax,
+    TickSlippage,
+    VolumeSlippage,
+    tick_sizes,
+    vn_stock_cost_model,
+)
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType
+
+
+class TestCostModels(unittest.TestCase):
+    """Unit tests for the vectorized cost models"""
+
+    def setUp(self):
+        self.prices = np.array([9_990.0, 10_000.0, 49_950.0, 50_000.0])
+        self.positions = np.array([100.0, 300.0, 200.0, 0.0])
+        self.trade_sizes = np.array([100.0, 200.0, 100.0, 200.0])  # stock runner records sells as positive sizes
+        self.volumes = np.array([1_000.0, 0.0, 400.0, 1e9])
+
+    def test_hose_tick_ladder(self):
+        """Tick sizes follow the HOSE price ladder"""
+        np.testing.assert_array_equal(tick_sizes(self.prices, HOSE_TICKS), [10, 50, 50, 100])
+
+    def test_sell_tax_only_on_position_decrease(self):
+        """Tax is charged on bars where the position decreases"""
+        tax = SellTax(0.001).costs(self.prices, self.trade_sizes, self.positions)
+
+        np.testing.assert_allclose(tax, [0, 0, 100 * 49_950 * 0.001, 200 * 50_000 * 0.001])
+
+    def test_volume_participation_is_capped(self):
+        """Participation is size / volume, capped at 1 and charged at the cap without volume"""
+        costs = VolumeSlippage(impact=0.1, exponent=1).costs(self.prices, self.trade_sizes, self.positions, self.volumes)
+
+        expected_participation = np.array([0.1, 1.0, 0.25, 200 / 1e9])
+        np.testing.assert_allclose(costs, self.trade_sizes * self.prices * 0.1 * expected_participation)
+        np.testing.assert_array_equal(
+            VolumeSlippage().costs(self.prices, self.trade_sizes, self.positions, None), np.zeros(4)
+        )
+
+    def test_composite_is_sum(self):
+        """Composed models add up"""
+        fee, tax, spread = PercentFee(0.0015), SellTax(0.001), TickSlippage("HOSE")
+        args = (self.prices, self.trade_sizes, self.positions, self.volumes)
+
+        np.testing.assert_allclose(
+            (fee + tax + spread).costs(*args),
+            fee.costs(*args) + tax.costs(*args) + spread.costs(*args),
+        )
+
+    def test_engine_uses_cost_model(self):
+        """Backtests charge the injected cost model, default is the flat fee"""
+        n = 4
+        inp = BacktestInput(
+            bot_id="bot",
+            timeframe="D",
+            bt_mode=TypeTradeMode.Train,
+            bt_cls=BacktestVnStocks,
+            symbol="SSI",
+            symbol_type=TypeSymbolType.VnStock,
+            re_run=False,
+            book_size=1e8,
+            actions=[1, 1, -1, -1],
+            times=np.datetime64("2024-01-02", "ns") + np.arange(n).astype("timedelta64[D]"),
+            prices=self.prices,
+            positions=self.positions,
+            trade_sizes=self.trade_sizes,
+            volumes=self.volumes,
+        )
+
+        default = BacktestVnStocks(inp)
+        realistic = BacktestVnStocks(inp, cost_model=vn_stock_cost_model())
+
+        np.testing.assert_allclose(default.fees, self.trade_sizes * self.prices * BacktestVnStocks.fee_rate)
+        self.assertTrue((realistic.fees >= default.fees).all())
+        self.assertLess(realistic.equities[-1], default.equities[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnFutures
+from xno.backtest.drawdown import drawdown_episodes, top_drawdown_episodes
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType
+
+
+def naive_episodes(equities):
+    episodes = []
+    peak, peak_idx, current = equities[0], 0, None
+    for i, value in enumerate(equities):
+        if value >= peak:
+            if current is not None:
+                current["recovery"] = i
+                episodes.append(current)
+                current = None
+            peak, peak_idx = value, i
+        else:
+            depth = value / peak - 1
+            if current is None:
+                current = dict(start=peak_idx, trough=i, recovery=-1, depth=depth)
+            elif depth < current["depth"]:
+                current.update(trough=i, depth=depth)
+    if current is not None:
+        episodes.append(current)
+    return episodes
+
+
+class TestDrawdownEpisodes(unittest.TestCase):
+    """Unit tests for the vectorized drawdown episodes"""
+
+    def test_matches_naive_loop(self):
+        """Episodes match a bar-by-bar reference"""
+        rng = np.random.default_rng(3)
+        equities = 1e6 * np.exp(np.cumsum(rng.normal(0, 0.01, 5_000)))
+        episodes = drawdown_episodes(equities)
+        expected = naive_episodes(equities)
+
+        self.assertEqual(len(episodes["depth"]), len(expected))
+        for name in ("start", "trough", "recovery"):
+            np.testing.assert_array_equal(episodes[name], [e[name] for e in expected])
+        np.testing.assert_allclose(episodes["depth"], [e["depth"] for e in expected])
+
+    def test_simple_curve(self):
+        """Depth, length and an unrecovered last episode"""
+        episodes = drawdown_episodes(np.array([100, 110, 99, 88, 110, 120, 90, 100.0]))
+
+        np.testing.assert_array_equal(episodes["start"], [1, 5])
+        np.testing.assert_array_equal(episodes["trough"], [3, 6])
+        np.testing.assert_array_equal(episodes["recovery"], [4, -1])
+        np.testing.assert_allclose(episodes["depth"], [-0.2, -0.25])
+        np.testing.assert_array_equal(episodes["length"], [3, 2])
+
+    def test_top_n(self):
+        """Top episodes are sorted by depth"""
+        top = top_drawdown_episodes(np.array([100, 110, 99, 88, 110, 120, 90, 100.0]), top_n=1)
+
+        np.testing.assert_array_equal(top["start"], [5])
+
+    def test_no_drawdown(self):
+        """A monotonic curve has no episode"""
+        self.assertEqual(len(drawdown_episodes(np.arange(1, 10.0))["depth"]), 0)
+
+    def test_summary(self):
+        """The summary carries the deepest episodes with their times"""
+        n = 3_000
+        rng = np.random.default_rng(9)
+        positions = np.where(np.sin(np.arange(n) / 60.0) > 0, 5.0, -5.0)
+        trade_sizes = np.diff(positions, prepend=0.0)
+        times = np.datetime64("2024-01-02T09:00", "ns") + np.arange(n).astype("timedelta64[m]")
+        bt = BacktestVnFutures(BacktestInput(
+            bot_id="bot", timeframe="1min", bt_mode=TypeTradeMode.Train, bt_cls=BacktestVnFutures,
+            symbol="VN30F1M", symbol_type=TypeSymbolType.VnFuture, re_run=False, book_size=1e9,
+            actions=np.sign(trade_sizes).astype(int).tolist(), times=times,
+            prices=1_200 + np.cumsum(rng.normal(0, 1.0, n)), positions=positions, trade_sizes=trade_sizes,
+        ))
+        drawdowns = bt.summarize().drawdowns
+
+        self.assertLessEqual(len(drawdowns), bt.drawdown_top_n)
+        self.assertEqual([d.depth for d in drawdowns], sorted(d.depth for d in drawdowns))
+        self.assertAlmostEqual(drawdowns[0].depth, float(np.min(bt.equities / np.maximum.accumulate(bt.equities) - 1)))
+        self.assertIn(drawdowns[0].trough, times)
+
+
+if __name__ == "__main__":
+    unittest.main()
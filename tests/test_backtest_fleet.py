@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache, FleetAggregator
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType
+
+T0 = np.datetime64("2024-01-02T09:00", "ns")
+
+
+def make_payload(bot_id, symbol, start, n, seed, init_cash=1e6):
+    rng = np.random.default_rng(seed)
+    return dict(
+        bot_id=bot_id,
+        symbol=symbol,
+        init_cash=init_cash,
+        times=T0 + (start + np.arange(n)).astype("timedelta64[m]"),
+        equities=init_cash + np.cumsum(rng.normal(0, 1_000, n)),
+        exposures=rng.normal(0, 1e5, n),
+    )
+
+
+class TestFleetAggregator(unittest.TestCase):
+    """Unit tests for the fleet-level aggregation"""
+
+    def test_union_axis_and_forward_fill(self):
+        """Bots are held at init cash before their start and at their last value after their end"""
+        fleet = FleetAggregator()
+        fleet.update(dict(bot_id="a", symbol="SSI", init_cash=100.0, times=T0 + np.array([0, 2], "timedelta64[m]"),
+                          equities=[110.0, 120.0], exposures=[5.0, 6.0]))
+        fleet.update(dict(bot_id="b", symbol="HPG", init_cash=50.0, times=T0 + np.array([1, 3], "timedelta64[m]"),
+                          equities=[40.0, 60.0]))
+
+        self.assertEqual(len(fleet.times()), 4)
+        np.testing.assert_allclose(fleet.equity(), [160, 150, 160, 180])
+        np.testing.assert_allclose(fleet.exposure_by_symbol()["SSI"], [5, 5, 6, 6])
+        np.testing.assert_allclose(fleet.drawdown(), [0, 150 / 160 - 1, 0, 0])
+
+    def test_incremental_matches_rebuild(self):
+        """Appending bars and replacing bots gives the same totals as a full rebuild"""
+        payloads = [make_payload(f"bot{i}", ["SSI", "HPG", "VN30F1M"][i % 3], 10 * i, 500, i) for i in range(6)]
+        fleet = FleetAggregator()
+        for payload in payloads:
+            fleet.update(payload)
+        # Live refresh: bot 2 gets 50 more bars, bot 4 is replaced
+        payloads[2] = make_payload("bot2", "VN30F1M", 20, 550, 2)
+        payloads[4] = make_payload("bot4", "HPG", 40, 500, 99)
+        fleet.update(payloads[2])
+        fleet.update(payloads[4])
+
+        rebuilt = FleetAggregator()
+        rebuilt.update_many(payloads)
+        np.testing.assert_array_equal(fleet.times(), rebuilt.times())
+        np.testing.assert_allclose(fleet.equity(), rebuilt.equity())
+        for symbol, exposure in rebuilt.exposure_by_symbol().items():
+            np.testing.assert_allclose(fleet.exposure_by_symbol()[symbol], exposure, atol=1e-6)
+
+    def test_inserted_times_rebuild(self):
+        """Times falling between existing bars trigger a rebuild of the axis"""
+        fleet = FleetAggregator()
+        fleet.update(dict(bot_id="a", symbol="SSI", init_cash=1.0, times=T0 + np.array([0, 2], "timedelta64[m]"),
+                          equities=[1.0, 2.0]))
+        fleet.update(dict(bot_id="b", symbol="SSI", init_cash=1.0, times=T0 + np.array([1], "timedelta64[m]"),
+                          equities=[3.0]))
+
+        np.testing.assert_allclose(fleet.equity(), [2, 4, 5])
+
+    def test_empty_update(self):
+        """A bot without bars is held at its init cash, before and after other bots arrive"""
+        fleet = FleetAggregator()
+        fleet.update(dict(bot_id="a", symbol="SSI", init_cash=10.0, times=[], equities=[]))
+        fleet.update(dict(bot_id="b", symbol="SSI", init_cash=1.0, times=T0 + np.array([0, 1], "timedelta64[m]"),
+                          equities=[2.0, 3.0], exposures=[1.0, 1.0]))
+        np.testing.assert_allclose(fleet.equity(), [12, 13])
+
+        fleet.update(dict(bot_id="b", symbol="SSI", init_cash=1.0, times=[], equities=[]))
+        np.testing.assert_allclose(fleet.equity(), [11, 11])
+        np.testing.assert_allclose(fleet.exposure_by_symbol()["SSI"], [0, 0])
+
+    def test_from_summaries(self):
+        """Summaries (including their JSON time format) feed the aggregator"""
+        BenchmarkCache.clear()
+        n = 1_000
+        rng = np.random.default_rng(1)
+        summaries = []
+        for bt_cls, symbol, price in ((BacktestVnStocks, "SSI", 20_000), (BacktestVnFutures, "VN30F1M", 1_200)):
+            positions = np.where(np.sin(np.arange(n) / 30.0) > 0, 1.0, 0.0)
+            trade_sizes = np.diff(positions, prepend=0.0)
+            summaries.append(bt_cls(BacktestInput(
+                bot_id=symbol, timeframe="1min", bt_mode=TypeTradeMode.Live, bt_cls=bt_cls, symbol=symbol,
+                symbol_type=TypeSymbolType.VnStock, re_run=False, book_size=1e9,
+                actions=np.sign(trade_sizes).astype(int).tolist(),
+                times=T0 + np.arange(n).astype("timedelta64[m]"),
+                prices=price + np.cumsum(rng.normal(0, 1.0, n)), positions=positions, trade_sizes=trade_sizes,
+            )).summarize())
+        fleet = FleetAggregator()
+        fleet.update_many(summaries)
+        overview = fleet.overview()
+
+        self.assertEqual(overview["bots"], 2)
+        self.assertAlmostEqual(overview["equity"], sum(s.series["equities"].values[-1] for s in summaries))
+        self.assertEqual(set(overview["exposure"]), {"SSI", "VN30F1M"})
+        self.assertAlmostEqual(overview["exposure"]["VN30F1M"], summaries[1].series["prices"].values[-1] * positions[-1] * 100_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from xno.backtest import BacktestVnStocks, BenchmarkCache, IndexReturnsCache, batch_relative_metrics
+from xno.backtest.index import align_index_returns, relative_metrics
+from tests import helpers
+
+N = 2_000
+TIMES = helpers.minute_times(N)
+INDEX = 1_200 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.001, N)))
+
+
+def make_input(seed, n=N):
+    rng = np.random.default_rng(seed)
+    # Stock moving with the index plus idiosyncratic noise, held most of the time
+    prices = 20_000 * np.exp(np.cumsum(1.2 * np.diff(np.log(INDEX), prepend=np.log(INDEX[0])) + rng.normal(0, 5e-4, N)))
+    positions = np.where(rng.random(N) < 0.9, 40_000.0, 0.0)
+    return helpers.make_input(BacktestVnStocks, prices, positions, times=TIMES, bars=slice(n), bot_id=f"bot-{seed}")
+
+
+class TestIndexMetrics(unittest.TestCase):
+    """Unit tests for the index-relative metrics"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+        IndexReturnsCache.clear()
+        IndexReturnsCache.put("VNINDEX", "1min", TIMES, INDEX)
+
+    def test_against_numpy(self):
+        """Beta and correlation match np.cov / np.corrcoef"""
+        rng = np.random.default_rng(1)
+        m = rng.normal(0, 0.01, 500)
+        r = 0.8 * m + rng.normal(0, 0.005, 500)
+        metrics = relative_metrics(r, m, 252)
+
+        self.assertAlmostEqual(metrics["beta"], np.cov(r, m)[0, 1] / np.var(m, ddof=1))
+        self.assertAlmostEqual(metrics["correlation"], np.corrcoef(r, m)[0, 1])
+        self.assertAlmostEqual(metrics["tracking_error"], np.std(r - m, ddof=1) * np.sqrt(252))
+
+    def test_matrix_mode(self):
+        """Each row of a (bots x bars) matrix gets the same metrics as a single series"""
+        rng = np.random.default_rng(2)
+        m = rng.normal(0, 0.01, 300)
+        matrix = rng.normal(0, 0.01, (4, 300)) + m
+        batch = relative_metrics(matrix, m, 252)
+
+        for i in range(4):
+            single = relative_metrics(matrix[i], m, 252)
+            for name, value in single.items():
+                self.assertAlmostEqual(batch[name][i], value)
+
+    def test_alignment_forward_fills(self):
+        """Bars between index closes use the last known close"""
+        index_times = TIMES[[0, 2]]
+        returns = align_index_returns(TIMES[:4], index_times, np.array([100.0, 110.0]))
+
+        np.testing.assert_allclose(returns, [0, 0, 0.1, 0])
+
+    def test_backtest_metrics(self):
+        """A bot mostly long a high-beta stock has a beta above one, set on the performance"""
+        bt = BacktestVnStocks(make_input(3))
+        metrics = bt.get_index_metrics("VNINDEX")
+
+        self.assertGreater(metrics["beta"], 0.5)
+        self.assertGreater(metrics["correlation"], 0.5)
+        self.assertEqual(bt.get_performance().beta, metrics["beta"])
+
+    def test_batch(self):
+        """Batch mode matches per-bot computation, including bots on other bars"""
+        bts = [BacktestVnStocks(make_input(seed)) for seed in (4, 5)] + [BacktestVnStocks(make_input(6, n=1_000))]
+        batch = batch_relative_metrics(bts, "VNINDEX")
+
+        for bt, metrics in zip(bts, batch):
+            expected = bt.get_index_metrics("VNINDEX")
+            for name, value in expected.items():
+                self.assertAlmostEqual(metrics[name], value)
+
+    def test_loads_bot_range_from_data_manager(self):
+        """Index closes are loaded over the bot's bars from OhlcvDataManager (runner column names)"""
+        try:
+            from xno.data import ohlcv
+        except RuntimeError as e:  # xno.connectors needs a reachable Redis at import time
+            self.skipTest(f"xno.data.ohlcv unavailable: {e}")
+
+        def get(resolution, symbol, from_time=None, to_time=None, factor=1):
+            mask = (TIMES >= np.datetime64(from_time, "ns")) & (TIMES <= np.datetime64(to_time, "ns"))
+            return pd.DataFrame({"Open": INDEX[mask], "High": INDEX[mask], "Low": INDEX[mask], "Close": INDEX[mask],
+                                 "Volume": 1.0}, index=pd.DatetimeIndex(TIMES[mask], name="time"))
+
+        expected = BacktestVnStocks(make_input(7)).get_index_metrics("VNINDEX")
+        IndexReturnsCache.clear()
+        with mock.patch.object(ohlcv.OhlcvDataManager, "get", side_effect=get) as data_get:
+            metrics = BacktestVnStocks(make_input(7, n=1_000)).get_index_metrics("VNINDEX")
+            self.assertEqual(data_get.call_args.kwargs["from_time"], TIMES[0])
+            self.assertEqual(data_get.call_args.kwargs["to_time"], TIMES[999])
+            # A bot beyond the cached range extends it, one within it is served from the cache
+            self.assertEqual(BacktestVnStocks(make_input(7)).get_index_metrics("VNINDEX"), expected)
+            BacktestVnStocks(make_input(8, n=500)).get_index_metrics("VNINDEX")
+            self.assertEqual(data_get.call_count, 2)
+        self.assertGreater(metrics["beta"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache
+from tests import helpers
+
+
+def make_input(bt_cls, n=2_000):
+    rng = np.random.default_rng(5)
+    positions = np.where(np.sin(np.arange(n) / 30.0) > 0, 3.0, 0.0)
+    return helpers.make_input(bt_cls, 1_200 + np.cumsum(rng.normal(0, 1.0, n)), positions, symbol="VN30F1M")
+
+
+class TestLeanBacktest(unittest.TestCase):
+    """Unit tests for the memory-lean backtest mode"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+
+    def test_lean_float64_matches_default(self):
+        """Lean float64 produces the same summary JSON as the default mode"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            default = bt_cls(make_input(bt_cls)).summarize()
+            lean = bt_cls(make_input(bt_cls), lean=True).summarize()
+
+            self.assertIsInstance(lean.series["pnls"].values, np.ndarray)
+            self.assertEqual(lean.to_json(), default.to_json())
+
+    def test_float32(self):
+        """float32 series stay close to the float64 results"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            default = bt_cls(make_input(bt_cls))
+            lean = bt_cls(make_input(bt_cls), lean=True, dtype=np.float32)
+
+            self.assertEqual(lean.equities.dtype, np.float32)
+            np.testing.assert_allclose(lean.equities, default.equities, rtol=1e-5)
+            self.assertAlmostEqual(lean.get_performance().sharpe, default.get_performance().sharpe, places=2)
+
+    def test_dtype_ignored_without_lean(self):
+        """The default mode always computes in float64"""
+        bt = BacktestVnStocks(make_input(BacktestVnStocks), dtype=np.float32)
+
+        self.assertEqual(bt.pnls.dtype, np.float64)
+
+    def test_read_only_inputs(self):
+        """Read-only input arrays are used as-is and never written"""
+        inp = make_input(BacktestVnFutures)
+        for name in ("prices", "positions", "trade_sizes"):
+            getattr(inp, name).setflags(write=False)
+        bt = BacktestVnFutures(inp, lean=True)
+
+        self.assertTrue(np.shares_memory(bt.prices, inp.prices))
+        self.assertIsNone(bt.return_series)
+        self.assertIsNotNone(bt.get_performance().sharpe)
+
+
+if __name__ == "__main__":
+    unittest.main()
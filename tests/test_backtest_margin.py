@@ -0,0 +1,126 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnFutures
+from xno.backtest.margin import simulate_margin, session_ends
+from tests import helpers
+
+
+def reference_margin(prices, target, init_cash, contract_size, fee, initial_margin_rate, maintenance_margin_ratio):
+    """Straightforward ledger: rebuild everything after each liquidation."""
+    positions = target.copy()
+    n = len(positions)
+    changes = np.flatnonzero(np.diff(target, prepend=0.0) != 0)
+    start = 0
+    while True:
+        trade_sizes = np.diff(positions, prepend=0.0)
+        prev = np.concatenate(([0.0], positions[:-1]))
+        pnls = prev * np.diff(prices, prepend=prices[0]) * contract_size - np.abs(trade_sizes) * fee
+        equities = init_cash + np.cumsum(pnls)
+        maintenance = np.abs(positions) * prices * contract_size * initial_margin_rate * maintenance_margin_ratio
+        breaches = np.flatnonzero((positions[start:] != 0) & (equities[start:] < maintenance[start:]))
+        if len(breaches) == 0:
+            return positions, equities
+        i = start + breaches[0]
+        k = np.searchsorted(changes, i, side="right")
+        positions[i:changes[k] if k < len(changes) else n] = 0.0
+        start = i + 1
+
+
+class TestMarginLedger(unittest.TestCase):
+    """Unit tests for the futures margin ledger"""
+
+    def setUp(self):
+        n = 5_000
+        rng = np.random.default_rng(11)
+        self.times = np.datetime64("2024-01-02T09:00", "ns") + (np.arange(n) // 250).astype("timedelta64[D]") \
+            + (np.arange(n) % 250).astype("timedelta64[m]")
+        self.prices = 1_250 + np.cumsum(rng.normal(0, 1.5, n))
+        self.target = np.repeat(rng.choice([-10.0, 0.0, 10.0], n // 100), 100)
+
+    def test_matches_reference_ledger(self):
+        """Windowed patching gives the same result as rebuilding the ledger"""
+        ledger = simulate_margin(
+            self.times, self.prices, self.target, 2e8, 100_000,
+            costs=lambda bars, trade_sizes, positions: np.abs(trade_sizes) * 20_000,
+            initial_margin_rate=0.17, maintenance_margin_ratio=0.8,
+        )
+        positions, equities = reference_margin(self.prices, self.target, 2e8, 100_000, 20_000, 0.17, 0.8)
+
+        self.assertGreater(ledger.liquidations.sum(), 0)
+        np.testing.assert_array_equal(ledger.positions, positions)
+        np.testing.assert_allclose(ledger.equities, equities)
+
+    def test_daily_settlement(self):
+        """Cash is settled at each session close and carried through the next session"""
+        ledger = simulate_margin(
+            self.times, self.prices, self.target, 1e10, 100_000,
+            costs=lambda bars, trade_sizes, positions: np.zeros(len(trade_sizes)),
+        )
+        ends = np.flatnonzero(session_ends(self.times))
+
+        self.assertEqual(len(ends), 20)
+        self.assertFalse(ledger.liquidations.any())
+        self.assertTrue((ledger.settled_cash[:250] == 1e10).all())
+        self.assertEqual(ledger.settled_cash[250], ledger.equities[ends[0]])
+        self.assertAlmostEqual(ledger.variation_margin.sum(), ledger.equities[-1] - 1e10, places=2)
+
+    def test_keeps_input_trade_sizes(self):
+        """The caller's trades are kept as given outside liquidation windows"""
+        trade_sizes = np.diff(self.target, prepend=0.0)
+        trade_sizes[trade_sizes == 0] = 1e-3  # marks bars the ledger must not touch
+        ledger = simulate_margin(
+            self.times, self.prices, self.target, 2e8, 100_000,
+            costs=lambda bars, trade_sizes, positions: np.zeros(len(trade_sizes)),
+            initial_margin_rate=0.17, maintenance_margin_ratio=0.8, trade_sizes=trade_sizes,
+        )
+        patched = np.diff(ledger.positions, prepend=0.0) != np.diff(self.target, prepend=0.0)
+        patched |= (ledger.positions == 0) & (self.target != 0)
+
+        self.assertGreater(ledger.liquidations.sum(), 0)
+        np.testing.assert_array_equal(ledger.trade_sizes[~patched], trade_sizes[~patched])
+        np.testing.assert_array_equal(ledger.trade_sizes[patched], np.diff(ledger.positions, prepend=0.0)[patched])
+
+    def test_keeps_dtype(self):
+        """Float32 inputs give a float32 ledger"""
+        ledger = simulate_margin(
+            self.times, self.prices.astype(np.float32), self.target.astype(np.float32), 2e8, 100_000,
+            costs=lambda bars, trade_sizes, positions: np.abs(trade_sizes) * 20_000,
+            initial_margin_rate=0.17, maintenance_margin_ratio=0.8,
+        )
+
+        for name in ("positions", "trade_sizes", "equities", "settled_cash", "variation_margin",
+                     "initial_margin", "maintenance_margin", "margin_ratio"):
+            self.assertEqual(getattr(ledger, name).dtype, np.float32, name)
+
+    def make_input(self, book_size=2e8, start=0, stop=None):
+        return helpers.make_input(BacktestVnFutures, self.prices, self.target, times=self.times,
+                                  bars=slice(start, stop), symbol="VN30F1M", book_size=book_size)
+
+    def test_engine_margin_mode(self):
+        """The futures engine uses the liquidation-adjusted path when margin is enabled"""
+        inp = self.make_input()
+        bt = BacktestVnFutures(inp, margin=True)
+
+        np.testing.assert_allclose(bt.equities, bt.margin_ledger.equities)
+        self.assertIn("margin_ratio", bt.summarize().series)
+        self.assertIsNone(BacktestVnFutures(inp).margin_ledger)
+
+    def test_period_rebases_ledger(self):
+        """A period's ledger is rebased like its equity: init_cash settled at the start, rebased closes after"""
+        full = BacktestVnFutures(self.make_input(), margin=True)
+        period = full.period(600, 1_700)
+        ledger = period.margin_ledger
+        ends = np.flatnonzero(session_ends(period.times))
+
+        np.testing.assert_allclose(ledger.equities, period.equities)
+        self.assertTrue((ledger.settled_cash[:ends[0] + 1] == full.init_cash).all())
+        np.testing.assert_allclose(ledger.settled_cash[ends[0] + 1], period.equities[ends[0]])
+        self.assertAlmostEqual(ledger.variation_margin.sum(), period.equities[ends[-1]] - full.init_cash, places=2)
+        active = ledger.initial_margin > 0
+        np.testing.assert_allclose(ledger.margin_ratio[active], period.equities[active] / ledger.initial_margin[active])
+        self.assertEqual(full.margin_ledger.settled_cash[0], full.init_cash)
+
+if __name__ == "__main__":
+    unittest.main()
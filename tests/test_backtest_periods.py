@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache
+from xno.backtest.common import period_bounds
+from xno.models import TypeTradeMode
+from tests import helpers
+
+
+def make_input(bt_cls, start=0, stop=3_000):
+    rng = np.random.default_rng(11)
+    n = 3_000
+    prices = 1_200 + np.cumsum(rng.normal(0, 1.0, n))
+    positions = np.where(np.sin(np.arange(n) / 40.0) > 0, 2.0, -1.0 if bt_cls is BacktestVnFutures else 0.0)
+    return helpers.make_input(bt_cls, prices, positions, bars=slice(start, stop), symbol="VN30F1M")
+
+
+class TestBacktestPeriods(unittest.TestCase):
+    """Unit tests for the single-run multi-period summaries"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+
+    def test_period_matches_separate_run(self):
+        """A period of the full run equals a backtest of the sliced input"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            full = bt_cls(make_input(bt_cls))
+            period = full.period(1_000, 2_000)
+            separate = bt_cls(make_input(bt_cls, 1_000, 2_000))
+
+            for name in ("fees", "pnls", "equities", "returns", "cum_rets", "bm_equities", "bm_cumrets"):
+                np.testing.assert_allclose(getattr(period, name), getattr(separate, name), rtol=1e-9, atol=1e-3)
+            self.assertAlmostEqual(period.get_performance().sharpe, separate.get_performance().sharpe, places=6)
+
+    def test_period_does_not_modify_full_run(self):
+        """Taking a period leaves the full-run arrays untouched"""
+        full = BacktestVnStocks(make_input(BacktestVnStocks))
+        pnls = full.pnls.copy()
+        full.period(500, 1_500)
+
+        np.testing.assert_array_equal(full.pnls, pnls)
+        self.assertEqual(len(full.times), 3_000)
+
+    def test_summarize_periods(self):
+        """All modes are summarized from one run; missing modes stay empty"""
+        full = BacktestVnFutures(make_input(BacktestVnFutures))
+        result = full.summarize_periods({
+            TypeTradeMode.Train: (0, 2_000),
+            TypeTradeMode.Test: (2_000, 2_500),
+            TypeTradeMode.Simulate: (2_500, 3_000),
+        })
+
+        self.assertEqual(result.train.total_candles, 2_000)
+        self.assertEqual(result.test.bt_mode, TypeTradeMode.Test)
+        self.assertEqual(result.simulate.analysis.start_value, full.init_cash - full.fees[2_500])
+        self.assertEqual(result.live, {})
+        self.assertEqual(full.bt_mode, TypeTradeMode.Train)
+
+    def test_period_bounds(self):
+        """Boundaries are inclusive, or exclusive at the start when asked"""
+        times = np.datetime64("2024-01-01", "ns") + np.arange(10).astype("timedelta64[D]")
+
+        self.assertEqual(period_bounds(times, "2024-01-03", "2024-01-05"), (2, 5))
+        self.assertEqual(period_bounds(times, "2024-01-05", None, include_start=False), (5, 10))
+        self.assertEqual(period_bounds(times, None, "2023-01-01"), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
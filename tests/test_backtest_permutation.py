@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache
+from xno.backtest.permutation import permuted_sharpes, sharpe_ratios
+from tests import helpers
+
+
+def make_input(bt_cls, informed: bool, n=3_000):
+    rng = np.random.default_rng(4)
+    moves = rng.normal(0, 1.0, n)
+    prices = 1_200 + np.cumsum(moves)
+    if informed:
+        # Look-ahead signal: long before up moves, short before down moves
+        positions = np.sign(np.roll(moves, -1)) * 2.0
+        positions[-1] = 0.0
+    else:
+        positions = np.repeat(rng.choice([-2.0, 2.0], n // 50 + 1), 50)[:n]
+    if bt_cls is BacktestVnStocks:
+        prices = prices * 20
+        positions = np.maximum(positions, 0) * 1_000
+    return helpers.make_input(bt_cls, prices, positions, symbol="VN30F1M")
+
+
+class TestPermutationTest(unittest.TestCase):
+    """Unit tests for the Sharpe permutation test"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+
+    def test_kernel_matches_backtest(self):
+        """Without permutation the matrix kernel reproduces the engine's Sharpe"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            bt = bt_cls(make_input(bt_cls, informed=False))
+
+            class Identity:
+                @staticmethod
+                def permuted(values, axis):
+                    return np.array(values)
+
+            sharpe = permuted_sharpes(bt.kernel(bt.init_cash), bt.prices, bt.positions, bt.fees, None,
+                                      bt.periods, 3, "returns", Identity())
+            np.testing.assert_allclose(sharpe, bt.get_performance().sharpe, rtol=1e-10)
+            self.assertAlmostEqual(sharpe_ratios(bt.returns, bt.periods)[0], bt.get_performance().sharpe)
+
+    def test_informed_signal_is_significant(self):
+        """A look-ahead signal gets a small p-value in both modes"""
+        bt = BacktestVnFutures(make_input(BacktestVnFutures, informed=True))
+        for mode in ("returns", "signals"):
+            result = bt.get_permutation_test(n_permutations=200, mode=mode, n_jobs=1, seed=1)
+
+            self.assertAlmostEqual(result["pvalue"], 1 / 201)
+            self.assertEqual(bt.get_performance().sharpe_pvalue, result["pvalue"])
+
+    def test_random_signal_is_not_significant(self):
+        """A random signal is not rejected"""
+        for bt_cls in (BacktestVnStocks, BacktestVnFutures):
+            bt = bt_cls(make_input(bt_cls, informed=False))
+            result = bt.get_permutation_test(n_permutations=200, mode="signals", n_jobs=1, seed=2)
+
+            self.assertGreater(result["pvalue"], 0.01)
+            self.assertEqual(len(result["null"]), 200)
+
+    def test_process_pool(self):
+        """Permutations split across worker processes reading shared-memory arrays"""
+        bt = BacktestVnFutures(make_input(BacktestVnFutures, informed=False, n=1_000))
+        pooled = bt.get_permutation_test(n_permutations=40, n_jobs=2, seed=3)
+
+        self.assertEqual(len(pooled["null"]), 40)
+        self.assertTrue(np.all(np.isfinite(pooled["null"])))
+        self.assertTrue(0 < pooled["pvalue"] <= 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache, ResultsStore
+from xno.models import TypeEngine
+from tests import helpers
+
+T0 = helpers.T0
+
+
+def make_summary(bot_id, bt_cls=BacktestVnStocks, timeframe="5min", n=600, seed=0, lean=False, step=5):
+    rng = np.random.default_rng(seed)
+    positions = np.where(np.sin(np.arange(n) / (10.0 + seed)) > 0, 1.0, 0.0)
+    trade_sizes = np.diff(positions, prepend=0.0)
+    if bt_cls is BacktestVnStocks:
+        trade_sizes = np.abs(trade_sizes)
+    inp = helpers.make_input(
+        bt_cls, 20_000 + np.cumsum(rng.normal(0, 20.0, n)), positions, trade_sizes=trade_sizes,
+        times=helpers.minute_times(n, step=step),  # ~2 days of 5min bars by default
+        bot_id=bot_id, timeframe=timeframe,
+    )
+    return bt_cls(inp, lean=lean).summarize()
+
+
+class TestResultsStore(unittest.TestCase):
+    """Unit tests for the partitioned Parquet results store"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitions_and_series_round_trip(self):
+        """A bot's series is one file under bt_mode/engine and is read back unchanged"""
+        summary = make_summary("bot/1")
+        self.store.write(summary, engine=TypeEngine.TABot)
+
+        files = sorted(glob.glob(os.path.join(self.tmp.name, "series", "*", "*", "*.parquet")))
+        self.assertEqual(len(files), 1)
+        self.assertIn(os.sep.join(["bt_mode=train", "engine=TA-Bot"]), files[0])
+        df = self.store.read_series("bot/1", bt_mode="train", engine=TypeEngine.TABot)
+        np.testing.assert_array_equal(df.index.values, np.asarray(summary.candles).astype("datetime64[ns]"))
+        np.testing.assert_array_equal(df["equities"].values, summary.series["equities"].values)
+
+        window = self.store.read_series("bot/1", start=T0 + np.timedelta64(1, "D"), end=T0 + np.timedelta64(36, "h"))
+        self.assertEqual(window.index.min(), T0 + np.timedelta64(1, "D"))
+        self.assertLessEqual(window.index.max(), T0 + np.timedelta64(36, "h"))
+
+    def test_monthly_row_groups(self):
+        """Long histories stay in one file with one row group per month, pruned by time filters"""
+        summary = make_summary("daily", timeframe="D", n=400, step=24 * 60)
+        self.store.write(summary)
+
+        files = glob.glob(os.path.join(self.tmp.name, "series", "*", "*", "*.parquet"))
+        self.assertEqual(len(files), 1)
+        self.assertEqual(pq.ParquetFile(files[0]).metadata.num_row_groups, 14)
+        window = self.store.read_series("daily", start="2024-03-01", end="2024-03-31 23:59")
+        self.assertEqual(len(window), 31)
+        self.assertEqual(window.index.min(), np.datetime64("2024-03-01T09:00"))
+
+    def test_cross_bot_query(self):
+        """Summary metrics of many bots are queried with SQL across engines and timeframes"""
+        summaries = [make_summary(f"bot{i}", timeframe=["5min", "1h"][i % 2], seed=i) for i in range(4)]
+        summaries.append(make_summary("fut", bt_cls=BacktestVnFutures, seed=7, lean=True))
+        self.store.write_many(summaries[:3], engine=TypeEngine.TABot)
+        self.store.write_many(summaries[3:], engine=TypeEngine.AIBot)
+
+        df = self.store.query("SELECT bot_id, sharpe FROM summaries WHERE timeframe = ? AND engine = ? ORDER BY bot_id",
+                              ["5min", "TA-Bot"])
+        self.assertEqual(df["bot_id"].tolist(), ["bot0", "bot2"])
+        self.assertAlmostEqual(df["sharpe"].iloc[0], summaries[0].performance.sharpe)
+
+        best = max(summaries, key=lambda s: s.performance.sharpe)
+        top = self.store.query("SELECT bot_id FROM summaries ORDER BY sharpe DESC LIMIT 1")
+        self.assertEqual(top["bot_id"].iloc[0], best.bot_id)
+
+    def test_rewrite_replaces_bot(self):
+        """Writing a bot again replaces its rows, including date partitions it no longer covers"""
+        self.store.write(make_summary("bot", n=600))
+        self.store.write(make_summary("bot", n=100, seed=3))
+
+        counts = self.store.query("SELECT (SELECT count(*) FROM summaries) AS summaries, "
+                                  "(SELECT count(*) FROM series) AS bars")
+        self.assertEqual(counts["summaries"].iloc[0], 1)
+        self.assertEqual(counts["bars"].iloc[0], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
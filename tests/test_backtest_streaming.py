@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xno.backtest import BacktestVnStocks, BacktestVnFutures, BenchmarkCache, StreamingBacktest, iter_parquet_chunks
+from xno.backtest.costs import vn_stock_cost_model
+from tests import helpers
+
+
+def make_input(bt_cls, n=20_000):
+    rng = np.random.default_rng(8)
+    if bt_cls is BacktestVnFutures:
+        prices = 1_200 + np.cumsum(rng.normal(0, 1.0, n))
+        positions = np.repeat(rng.choice([-2.0, 0.0, 2.0], n // 100 + 1), 100)[:n]
+    else:
+        prices = 20_000 * np.exp(np.cumsum(rng.normal(0, 5e-4, n)))
+        positions = np.repeat(rng.choice([0.0, 10_000.0], n // 100 + 1), 100)[:n]
+    return helpers.make_input(
+        bt_cls, prices, positions, times=helpers.minute_times(n, np.datetime64("2020-01-02T09:00", "ns")),
+        volumes=rng.integers(1_000, 50_000, n).astype(np.float64),
+    )
+
+
+def chunks(inp, size):
+    for i in range(0, len(inp.times), size):
+        bars = slice(i, i + size)
+        yield dict(times=inp.times[bars], prices=inp.prices[bars], positions=inp.positions[bars],
+                   trade_sizes=inp.trade_sizes[bars], volumes=inp.volumes[bars])
+
+
+class TestStreamingBacktest(unittest.TestCase):
+    """Unit tests for the chunked out-of-core backtest"""
+
+    def setUp(self):
+        BenchmarkCache.clear()
+
+    def test_matches_in_memory_backtest(self):
+        """Series, analysis and performance match the in-memory engines"""
+        for bt_cls, cost_model in ((BacktestVnStocks, vn_stock_cost_model()), (BacktestVnFutures, None)):
+            inp = make_input(bt_cls)
+            bt = bt_cls(inp, cost_model=cost_model)
+            streaming = StreamingBacktest(bt_cls, "bot", "1min", inp.book_size, cost_model=cost_model)
+            series = [streaming.process(chunk) for chunk in chunks(inp, 3_333)]
+            summary = streaming.summarize()
+
+            for name, attr in (("fees", "fees"), ("equities", "equities"), ("returns", "returns"),
+                               ("cumrets", "cum_rets"), ("bm_equities", "bm_equities"), ("bm_cumrets", "bm_cumrets")):
+                np.testing.assert_allclose(np.concatenate([s[name] for s in series]), getattr(bt, attr),
+                                           rtol=1e-9, atol=1e-6, err_msg=name)
+            analysis, expected = summary.analysis, bt.get_analysis()
+            self.assertEqual(analysis.total_trades, expected.total_trades)
+            self.assertEqual(analysis.total_closed_trades, expected.total_closed_trades)
+            self.assertAlmostEqual(analysis.end_value, expected.end_value, places=3)
+            for name in ("sharpe", "sortino", "volatility", "max_drawdown", "annual_return", "win_rate",
+                         "profit_factor", "ulcer_index", "calmar"):
+                self.assertAlmostEqual(getattr(summary.performance, name), getattr(bt.get_performance(), name),
+                                       places=8, msg=name)
+
+    def test_parquet_round_trip(self):
+        """Inputs are read from Parquet in batches and the series are written to Parquet"""
+        inp = make_input(BacktestVnFutures, n=5_000)
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "input.parquet")
+            series_path = os.path.join(tmp, "series.parquet")
+            pd.DataFrame(dict(time=inp.times, close=inp.prices, positions=inp.positions,
+                              trade_sizes=inp.trade_sizes)).to_parquet(input_path)
+
+            streaming = StreamingBacktest(BacktestVnFutures, "bot", "1min", inp.book_size, series_path=series_path)
+            summary = streaming.run(iter_parquet_chunks(input_path, batch_size=1_000,
+                                                        columns={"times": "time", "prices": "close"}))
+            written = pd.read_parquet(series_path)
+
+        expected = BacktestVnFutures(inp)
+        self.assertEqual(summary.total_candles, 5_000)
+        self.assertEqual(len(written), 5_000)
+        np.testing.assert_allclose(written["equities"].to_numpy(), expected.equities, rtol=1e-12)
+        np.testing.assert_array_equal(written["times"].to_numpy(), inp.times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import pickle
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from xno.backtest import BacktestVnStocks
+from xno.models import BacktestInput, TypeTradeMode, TypeSymbolType, TypeAction
+from xno.tasks import transport
+from xno.tasks.backtest import run_backtest_by_reference
+from xno.tasks.transport import load_backtest_input, put_backtest_input
+from xno.utils.binary import pack_arrays, unpack_arrays
+
+
+class FakeRedis:
+    """In-memory stand-in for `RedisClient`"""
+
+    def __init__(self):
+        self.data, self.ttl = {}, {}
+
+    def set(self, key, value, ex=None):
+        self.data[key], self.ttl[key] = bytes(value), ex
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestBacktestTransport(unittest.TestCase):
+    """Unit tests for the binary BacktestInput wire format"""
+
+    def setUp(self):
+        n = 1_000
+        self.inp = BacktestInput(
+            bot_id="bot",
+            timeframe="1min",
+            bt_mode=TypeTradeMode.Train,
+            bt_cls=BacktestVnStocks,
+            symbol="SSI",
+            symbol_type=TypeSymbolType.VnStock,
+            re_run=False,
+            book_size=1e9,
+            actions=[TypeAction.Buy, TypeAction.Hold, TypeAction.Sell] * (n // 3) + [TypeAction.Hold],
+            times=np.datetime64("2024-01-02T09:00", "ns") + np.arange(n).astype("timedelta64[m]"),
+            prices=np.linspace(20_000, 25_000, n),
+            positions=np.full(n, 100.0),
+            trade_sizes=np.zeros(n),
+        )
+
+    def test_round_trip(self):
+        """Decoded input matches the original"""
+        decoded = BacktestInput.from_bytes(self.inp.to_bytes())
+
+        self.assertIs(decoded.bt_cls, BacktestVnStocks)
+        self.assertEqual(decoded.bt_mode, TypeTradeMode.Train)
+        self.assertEqual(decoded.symbol_type, TypeSymbolType.VnStock)
+        self.assertEqual(decoded.book_size, self.inp.book_size)
+        np.testing.assert_array_equal(decoded.times, self.inp.times)
+        np.testing.assert_array_equal(decoded.prices, self.inp.prices)
+        self.assertEqual(decoded.actions, self.inp.actions)
+        self.assertIsInstance(decoded.actions[0], TypeAction)
+
+    def test_zero_copy_views(self):
+        """Decoded arrays are read-only views over the payload"""
+        decoded = load_backtest_input(self.inp.to_bytes())
+
+        self.assertFalse(decoded.prices.flags.writeable)
+        self.assertIsNotNone(decoded.prices.base)
+
+    def test_backtest_on_decoded_input(self):
+        """Backtest results are identical on decoded input"""
+        expected = BacktestVnStocks(self.inp).get_analysis()
+        actual = BacktestVnStocks(BacktestInput.from_bytes(self.inp.to_bytes())).get_analysis()
+
+        self.assertEqual(actual.end_value, expected.end_value)
+
+    def test_empty_and_invalid_frames(self):
+        """Empty arrays are supported and foreign payloads are rejected"""
+        meta, arrays = unpack_arrays(pack_arrays({"k": 1}, {"empty": np.array([], dtype=np.float64)}))
+
+        self.assertEqual(meta, {"k": 1})
+        self.assertEqual(arrays["empty"].shape, (0,))
+        with self.assertRaises(ValueError):
+            unpack_arrays(b"not a frame")
+
+    def test_pickle_rejected_by_default(self):
+        """Non-frame payloads are only unpickled when explicitly allowed"""
+        payload = pickle.dumps(self.inp)
+        with self.assertRaises(ValueError):
+            load_backtest_input(payload)
+
+        self.assertEqual(load_backtest_input(payload, allow_pickle=True).bot_id, "bot")
+
+    def test_task_by_reference(self):
+        """The worker task runs the backtest of an input stored by reference and consumes the entry"""
+        redis = FakeRedis()
+        with mock.patch.object(transport, "_redis", return_value=redis):
+            key = put_backtest_input(self.inp, "task-1")
+            result = run_backtest_by_reference.apply(args=(key, "task-1")).get()
+
+        self.assertEqual(result, BacktestVnStocks(self.inp).summarize().to_json().decode())
+        self.assertEqual(redis.data, {})
+        self.assertEqual(redis.ttl[key], transport.settings.backtest_input_ttl)
+
+
+if __name__ == "__main__":
+    unittest.main()
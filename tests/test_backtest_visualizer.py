@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from xno.backtest.visualizer import minmax_downsample
+
+
+def reference(values, n_buckets):
+    """Per-bucket first/min/max/last indices, bucket by bucket"""
+    bucket_size = -(-len(values) // n_buckets)
+    keep = set()
+    for start in range(0, len(values), bucket_size):
+        bucket = values[start:start + bucket_size]
+        keep.add(start)
+        keep.add(start + len(bucket) - 1)
+        if not np.all(np.isnan(bucket)):
+            keep.add(start + int(np.nanargmin(bucket)))
+            keep.add(start + int(np.nanargmax(bucket)))
+    return np.array(sorted(keep))
+
+
+class TestMinmaxDownsample(unittest.TestCase):
+    """Unit tests for the M4 downsampling of plotted series"""
+
+    def test_short_input_kept(self):
+        """Series with at most four points per bucket are returned whole"""
+        np.testing.assert_array_equal(minmax_downsample(np.arange(3.0), 10), np.arange(3))
+        np.testing.assert_array_equal(minmax_downsample(np.arange(40.0), 10), np.arange(40))
+        np.testing.assert_array_equal(minmax_downsample(np.arange(5.0), 0), np.arange(5))
+        self.assertEqual(len(minmax_downsample(np.array([]), 10)), 0)
+
+    def test_uneven_buckets(self):
+        """A length that does not divide evenly keeps the partial last bucket, including the last point"""
+        values = np.random.default_rng(0).normal(size=1_003)
+        idx = minmax_downsample(values, 100)
+
+        np.testing.assert_array_equal(idx, reference(values, 100))
+        self.assertEqual(idx[0], 0)
+        self.assertEqual(idx[-1], 1_002)
+
+    def test_min_max_in_time_order(self):
+        """Each bucket keeps its min and max, and the indices are strictly increasing"""
+        values = np.cumsum(np.random.default_rng(1).normal(size=10_000))
+        idx = minmax_downsample(values, 250)
+        bucket_size = -(-len(values) // 250)
+
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        self.assertLessEqual(len(idx), 4 * 250)
+        for start in range(0, len(values), bucket_size):
+            kept = idx[(idx >= start) & (idx < start + bucket_size)]
+            bucket = values[start:start + bucket_size]
+            self.assertEqual(values[kept].min(), bucket.min())
+            self.assertEqual(values[kept].max(), bucket.max())
+
+    def test_nan_ignored(self):
+        """NaNs are never picked as a bucket's min or max, all-NaN buckets keep their bounds"""
+        values = np.random.default_rng(2).normal(size=1_000)
+        values[::7] = np.nan
+        values[500:510] = np.nan
+        idx = minmax_downsample(values, 100)
+
+        np.testing.assert_array_equal(idx, reference(values, 100))
+        self.assertIn(500, idx)
+        self.assertIn(509, idx)
+
+
+if __name__ == "__main__":
+    unittest.main()
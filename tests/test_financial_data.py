@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from xno import settings
+from xno.data import financeData
+
+
+def make_statements(last_quarter_end: str, n: int = 8) -> pd.DataFrame:
+    index = pd.date_range(end=last_quarter_end, periods=n, freq="QE", name="time")
+    return pd.DataFrame({"ratio_P/E": range(n), "income_statement_Doanh thu (đồng)": [1e9 * (i + 1) for i in range(n)]},
+                        index=index)
+
+
+class TestMergeStatements(unittest.TestCase):
+    """Unit tests for the period-end indexing of the statements"""
+
+    def test_period_end_dates(self):
+        """Year/quarter pairs map to period ends, invalid quarters to NaT"""
+        dates = financeData.period_end_dates([2023, 2023, 2023, 2023, 2023, 2024, "2024"], [1, 2, 3, 4, 5, 0, "3"])
+        expected = pd.to_datetime(["2023-03-31", "2023-06-30", "2023-09-30", "2023-12-31", "2023-12-31", None,
+                                   "2024-09-30"])
+        pd.testing.assert_index_equal(dates, pd.DatetimeIndex(expected, name="time"))
+        self.assertEqual(financeData.period_end_dates([2022])[0], pd.Timestamp("2022-12-31"))
+
+    def test_aligned_merge(self):
+        """Statements with different periods are aligned on the union of period ends"""
+        income = pd.DataFrame({"CP": "SSI", "Năm": [2023, 2023, 2023, 2022], "Kỳ": [5, 4, 1, 4],
+                               "Doanh thu": [40.0, 12.0, 9.0, 11.0]})
+        ratio = pd.DataFrame({"Năm": [2023, 2024], "Kỳ": [1, 1], "P/E": [8.0, 9.0]})
+        yearly = pd.DataFrame({"Năm": [2021], "Vốn": [1.0]})
+        df = financeData.merge_statements(dict(income_statement=income, ratio=ratio, balance_sheet=yearly))
+
+        self.assertEqual(list(df.columns), ["income_statement_Doanh thu", "ratio_P/E", "balance_sheet_Vốn"])
+        pd.testing.assert_index_equal(df.index, pd.DatetimeIndex(
+            ["2021-12-31", "2022-12-31", "2023-03-31", "2023-12-31", "2024-03-31"], name="time"))
+        self.assertEqual(df.loc["2023-12-31", "income_statement_Doanh thu"], 12.0)
+        self.assertEqual(df.loc["2024-03-31", "ratio_P/E"], 9.0)
+        self.assertTrue(pd.isna(df.loc["2022-12-31", "ratio_P/E"]))
+
+
+class TestFinancialDataCache(unittest.TestCase):
+    """Unit tests for the on-disk financial statements cache"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patch = mock.patch.object(settings, "financial_cache_path", self.tmp.name)
+        self.patch.start()
+        financeData.get_financial_data.cache_clear()
+
+    def tearDown(self):
+        self.patch.stop()
+        financeData.get_financial_data.cache_clear()
+        self.tmp.cleanup()
+
+    def test_staleness_rules(self):
+        """Caches are refreshed when a new period may be published, rechecked at most daily, and expire"""
+        df = make_statements("2024-03-31")
+        now = pd.Timestamp("2024-06-15")
+        self.assertFalse(financeData.is_stale(df, now - pd.Timedelta(days=20), "quarter", now))
+        # Q2 2024 report may be out from 2024-07-20 on
+        later = pd.Timestamp("2024-07-25")
+        self.assertTrue(financeData.is_stale(df, now, "quarter", later))
+        self.assertFalse(financeData.is_stale(df, later - pd.Timedelta(hours=2), "quarter", later))
+        self.assertTrue(financeData.is_stale(df, now - pd.Timedelta(days=31), "quarter", now))
+        # Annual 2024 report is not expected before 2025-03-01
+        self.assertFalse(financeData.is_stale(df.loc[:"2023-12-31"], pd.Timestamp("2025-01-20"), "year",
+                                              pd.Timestamp("2025-02-01")))
+
+    def test_persistent_cache(self):
+        """Statements are downloaded once and then served from Parquet, also after a process restart"""
+        df = make_statements(financeData.latest_expected_period_end("quarter", pd.Timestamp.now()))
+        with mock.patch.object(financeData, "download_financial_data", return_value=df) as download:
+            first = financeData.get_financial_data("SSI", "quarter")
+            financeData.get_financial_data.cache_clear()  # in-process cache lost, e.g. worker restart
+            second = financeData.get_financial_data("SSI", "quarter")
+
+        self.assertEqual(download.call_count, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "quarter", "SSI.parquet")))
+        pd.testing.assert_frame_equal(first, df)
+        pd.testing.assert_frame_equal(second, df, check_freq=False)
+
+    def test_stale_cache_used_offline(self):
+        """A stale cache is returned when the download fails"""
+        df = make_statements("2020-12-31")
+        financeData._write_cache("HPG", "quarter", df)
+        with mock.patch.object(financeData, "download_financial_data", side_effect=ConnectionError("offline")):
+            cached = financeData.get_financial_data("HPG", "quarter")
+            with self.assertRaises(ConnectionError):
+                financeData.get_financial_data("VND", "quarter")
+
+        pd.testing.assert_frame_equal(cached, df, check_freq=False)
+
+    def test_many_symbols(self):
+        """Statements of many symbols are fetched together, failed downloads are left out"""
+        df = make_statements(financeData.latest_expected_period_end("quarter", pd.Timestamp.now()))
+        financeData._write_cache("HPG", "quarter", df)
+
+        def download(symbol, period):
+            if symbol == "VND":
+                raise ConnectionError("offline")
+            return df
+
+        with mock.patch.object(financeData, "download_financial_data", side_effect=download) as downloaded:
+            dfs = financeData.get_financial_data_many(["SSI", "HPG", "VND", "SSI"], "quarter")
+
+        self.assertEqual(list(dfs), ["SSI", "HPG"])
+        self.assertEqual(sorted(call.args[0] for call in downloaded.call_args_list), ["SSI", "VND"])
+        pd.testing.assert_frame_equal(dfs["HPG"], df, check_freq=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,328 @@
+import contextlib
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+try:
+    from xno.data import ohlcv
+except RuntimeError as e:  # xno.connectors needs a reachable Redis at import time
+    raise unittest.SkipTest(f"xno.data.ohlcv unavailable: {e}")
+
+T0 = pd.Timestamp("2024-01-02 09:00")
+
+
+def make_rows(start, n, base=100.0):
+    times = T0 + pd.to_timedelta(start + np.arange(n), unit="min")
+    close = base + np.arange(start, start + n, dtype=float)
+    return pd.DataFrame(dict(time=times, open=close, high=close + 1, low=close - 1, close=close, volume=1.0))
+
+
+def make_tick(minute, close):
+    """Realtime payload, times are epoch seconds"""
+    time = (T0 + pd.Timedelta(minutes=minute)).tz_localize("Asia/Ho_Chi_Minh").timestamp()
+    return dict(time=time, open=close, high=close, low=close, close=close, volume=1.0)
+
+
+class FakeDatabase:
+    """Serves `pd.read_sql_query` chunks from an in-memory table"""
+
+    def __init__(self, rows: pd.DataFrame):
+        self.rows = rows
+        self.queries = []
+
+    def read_sql_query(self, sql, con, params=None, chunksize=None, **kwargs):
+        self.queries.append(params)
+        mask = (self.rows["time"] >= pd.Timestamp(params["from_time"])) & \
+               (self.rows["time"] <= pd.Timestamp(params["to_time"]))
+        if "symbols" in params:
+            mask &= self.rows["symbol"].isin(params["symbols"])
+        selected = self.rows[mask]
+        if "symbols" in params:
+            selected = selected.sort_values(["symbol", "time"], kind="stable")
+        selected = selected.reset_index(drop=True)
+        return (selected.iloc[i:i + chunksize] for i in range(0, len(selected), chunksize))
+
+    @contextlib.contextmanager
+    def patch(self):
+        with mock.patch.object(ohlcv, "DistributedSemaphore", contextlib.nullcontext), \
+                mock.patch.object(ohlcv, "SqlSession", mock.MagicMock()), \
+                mock.patch.object(ohlcv, "tqdm", lambda chunks: chunks), \
+                mock.patch.object(ohlcv.pd, "read_sql_query", self.read_sql_query):
+            yield self
+
+
+class TestOhlcvData(unittest.TestCase):
+    """Unit tests for the cached OHLCV data of one symbol"""
+
+    def test_chunked_load_merges_once(self):
+        """Chunks are merged into one sorted, duplicate-free frame"""
+        db = FakeDatabase(make_rows(0, 5_500))
+        data = ohlcv.OhlcvData("m", "SSI")
+        with db.patch():
+            data.load_data(str(T0), str(T0 + pd.Timedelta(minutes=5_499)))
+
+        self.assertEqual(len(data.data), 5_500)
+        self.assertTrue(data.data.index.is_monotonic_increasing)
+        np.testing.assert_array_equal(data.data["close"].values, db.rows["close"].values)
+
+    def test_load_overlapping_ranges(self):
+        """Overlapping loads keep one row per time, database rows replacing cached ones"""
+        db = FakeDatabase(make_rows(0, 3_000))
+        data = ohlcv.OhlcvData("m", "SSI")
+        with db.patch():
+            data.load_data(str(T0 + pd.Timedelta(minutes=1_000)), str(T0 + pd.Timedelta(minutes=2_999)))
+            db.rows = make_rows(0, 3_000, base=200.0)
+            data.load_data(str(T0), str(T0 + pd.Timedelta(minutes=1_500)))
+
+        self.assertEqual(len(data.data), 3_000)
+        self.assertFalse(data.data.index.has_duplicates)
+        self.assertEqual(data.data["close"].iloc[1_500], 1_700.0)
+        self.assertEqual(data.data["close"].iloc[1_501], 1_601.0)
+
+    def test_concurrent_change_is_not_lost(self):
+        """Rows flushed while a load is merging are kept in the swapped-in frame"""
+        db = FakeDatabase(make_rows(0, 100))
+        data = ohlcv.OhlcvData("m", "SSI")
+        upsert = ohlcv._upsert
+        flushed = []
+
+        def upsert_after_flush(cached, new):
+            if not flushed:  # a realtime flush lands between the snapshot and the swap
+                flushed.append(True)
+                data.append_data(make_tick(500, 1.0))
+                data.consume_buffer()
+            return upsert(cached, new)
+
+        with db.patch(), mock.patch.object(ohlcv, "_upsert", upsert_after_flush):
+            data.load_data(str(T0), str(T0 + pd.Timedelta(minutes=99)))
+
+        self.assertEqual(len(data.data), 101)
+        self.assertEqual(data.data.index[-1], T0 + pd.Timedelta(minutes=500))
+
+    def test_datas_slices_range(self):
+        """datas() returns the requested range as a slice of the cache, bounds inclusive"""
+        db = FakeDatabase(make_rows(0, 10_000))
+        data = ohlcv.OhlcvData("m", "SSI")
+        with db.patch():
+            data.load_data(str(T0), str(T0 + pd.Timedelta(minutes=9_999)))
+            df = data.datas(T0 + pd.Timedelta(minutes=9_000), T0 + pd.Timedelta(minutes=9_029))
+            self.assertEqual(len(db.queries), 1)
+
+        self.assertEqual(len(df), 30)
+        self.assertEqual(df.index[0], T0 + pd.Timedelta(minutes=9_000))
+        self.assertEqual(df.index[-1], T0 + pd.Timedelta(minutes=9_029))
+        self.assertTrue(np.shares_memory(df["close"].values, data.data["close"].values))
+
+    def test_realtime_flush_keeps_index_sorted(self):
+        """Out-of-order and repeated realtime bars are merged into a sorted, duplicate-free index"""
+        db = FakeDatabase(make_rows(0, 100))
+        data = ohlcv.OhlcvData("m", "SSI")
+        with db.patch():
+            data.load_data(str(T0), str(T0 + pd.Timedelta(minutes=99)))
+        for minute, close in ((101, 1.0), (100, 2.0), (99, 3.0), (101, 4.0)):
+            data.append_data(make_tick(minute, close))
+        data.consume_buffer()
+
+        self.assertEqual(len(data.data), 102)
+        self.assertTrue(data.data.index.is_monotonic_increasing)
+        self.assertFalse(data.data.index.has_duplicates)
+        np.testing.assert_array_equal(data.data["close"].values[-3:], [3.0, 2.0, 4.0])
+
+    def test_shared_flusher(self):
+        """Instances share one flusher thread, which merges the buffers of dirty instances in a batch"""
+        threads = threading.active_count()
+        instances = [ohlcv.OhlcvData("m", f"S{i}") for i in range(50)]
+        for i, data in enumerate(instances[:10]):
+            data.append_data(make_tick(i, float(i)))
+
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        ohlcv._flusher.flush()  # what the scheduler thread does every settings.ohlcv_flush_interval
+        self.assertEqual([len(data.data) for data in instances[:10]], [1] * 10)
+        self.assertEqual(ohlcv._flusher.flush(), 0)
+        self.assertTrue(all(data.data.empty for data in instances[10:]))
+
+
+class TestOhlcvDataManager(unittest.TestCase):
+    """Unit tests for resampled reads through OhlcvDataManager"""
+
+    def setUp(self):
+        ohlcv.OhlcvDataManager._instances.clear()
+
+    def tearDown(self):
+        ohlcv.OhlcvDataManager._instances.clear()
+
+    def test_cached_resample_matches_direct(self):
+        """Sliced cached resamples equal a resample of the requested range, including cut buckets"""
+        db = FakeDatabase(make_rows(0, 5_000).sample(frac=0.8, random_state=0).sort_values("time"))
+        with db.patch():
+            ohlcv.OhlcvDataManager.get("1min", "SSI", T0, T0 + pd.Timedelta(minutes=4_999))
+            instance = ohlcv.OhlcvDataManager._instances[("m", "SSI")]
+            for resolution, start, stop, factor in (("5min", 7, 4_003, 1), ("15min", 0, 4_999, 1_000),
+                                                    ("60min", 61, 62, 1), ("7min", 100, 3_000, 1)):
+                from_time, to_time = T0 + pd.Timedelta(minutes=start), T0 + pd.Timedelta(minutes=stop)
+                df = ohlcv.OhlcvDataManager.get(resolution, "SSI", from_time, to_time, factor)
+                expected = ohlcv._resample(instance.data.loc[from_time:to_time], resolution, factor)
+                pd.testing.assert_frame_equal(df, expected, check_freq=False)
+
+    def test_new_bars_recompute_tail_only(self):
+        """After realtime bars only the buckets from the first changed time are re-aggregated"""
+        db = FakeDatabase(make_rows(0, 5_000))
+        to_time = T0 + pd.Timedelta(minutes=5_100)
+        with db.patch():
+            ohlcv.OhlcvDataManager.get("15min", "SSI", T0, to_time)
+            instance = ohlcv.OhlcvDataManager._instances[("m", "SSI")]
+            for minute in (4_998, 5_000, 5_001):
+                instance.append_data(make_tick(minute, 1.0))
+
+            resampled_rows = []
+            resample = ohlcv._resample
+
+            def counting_resample(df, resolution, factor=1):
+                resampled_rows.append(len(df))
+                return resample(df, resolution, factor)
+
+            with mock.patch.object(ohlcv, "_resample", counting_resample):
+                df = ohlcv.OhlcvDataManager.get("15min", "SSI", T0, to_time)
+
+        self.assertLess(max(resampled_rows), 20)
+        pd.testing.assert_frame_equal(df, resample(instance.data, "15min"), check_freq=False)
+        self.assertEqual(df["Close"].iloc[-1], 1.0)
+
+    def test_lru_eviction_and_reload(self):
+        """Instances over the memory budget are evicted least recently used first and reloaded on demand"""
+        db = FakeDatabase(make_rows(0, 1_000))
+        to_time = T0 + pd.Timedelta(minutes=999)
+        with db.patch():
+            ohlcv.OhlcvDataManager.get("1min", "A", T0, to_time)
+            one = ohlcv.OhlcvDataManager.stats()["total_bytes"]
+            before = ohlcv.OhlcvDataManager.stats()
+            with mock.patch.object(ohlcv.OhlcvDataManager, "max_bytes", int(2.5 * one)):
+                for symbol in ("B", "A", "C"):  # A is used again, so B is the least recently used
+                    ohlcv.OhlcvDataManager.get("1min", symbol, T0, to_time)
+                self.assertEqual(set(ohlcv.OhlcvDataManager._instances), {("m", "A"), ("m", "C")})
+                queries = len(db.queries)
+                df = ohlcv.OhlcvDataManager.get("1min", "B", T0, to_time)
+            stats = ohlcv.OhlcvDataManager.stats()
+
+        self.assertEqual(len(df), 1_000)
+        self.assertEqual(len(db.queries), queries + 1)
+        self.assertEqual(stats["evictions"] - before["evictions"], 2)
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertEqual(stats["misses"] - before["misses"], 3)
+
+    def test_eviction_keeps_pending_realtime_rows(self):
+        """Realtime rows not flushed yet survive the eviction of their instance"""
+        db = FakeDatabase(make_rows(0, 1_000))
+        to_time = T0 + pd.Timedelta(minutes=1_000)
+        with db.patch(), mock.patch.object(ohlcv._flusher, "flush"):  # no background flush
+            ohlcv.OhlcvDataManager.get("1min", "A", T0, to_time)
+            one = ohlcv.OhlcvDataManager.stats()["total_bytes"]
+            ohlcv.OhlcvDataManager.add("m", "A", make_tick(1_000, 7.0))
+            with mock.patch.object(ohlcv.OhlcvDataManager, "max_bytes", int(2.5 * one)):
+                for symbol in ("B", "C"):
+                    ohlcv.OhlcvDataManager.get("1min", symbol, T0, to_time)
+            self.assertEqual(len(ohlcv.OhlcvDataManager._instances[("m", "A")].data), 0)
+            df = ohlcv.OhlcvDataManager.get("1min", "A", T0, to_time)
+
+        self.assertEqual(len(df), 1_001)
+        self.assertEqual(df["Close"].iloc[-1], 7.0)
+
+    def test_retention_window(self):
+        """Minute history beyond the retention window is dropped once the request is no longer recent"""
+        db = FakeDatabase(make_rows(0, 10 * 24 * 60))
+        to_time = T0 + pd.Timedelta(days=10) - pd.Timedelta(minutes=1)
+        with db.patch(), mock.patch.dict(ohlcv.OhlcvDataManager.retention, {"m": pd.Timedelta(days=2)}), \
+                mock.patch.object(ohlcv.OhlcvDataManager, "requested_range_ttl", -1.0):
+            df = ohlcv.OhlcvDataManager.get("1min", "SSI", T0, to_time)
+            instance = ohlcv.OhlcvDataManager._instances[("m", "SSI")]
+            recent = ohlcv.OhlcvDataManager.get("1min", "SSI", to_time - pd.Timedelta(days=1), to_time)
+
+        self.assertEqual(len(df), 10 * 24 * 60)
+        self.assertEqual(instance.data.index[0], to_time - pd.Timedelta(days=2))
+        self.assertEqual(len(recent), 24 * 60 + 1)
+        self.assertEqual(len(db.queries), 1)
+
+    def test_requested_range_kept(self):
+        """A recently requested range longer than the retention window is not trimmed nor reloaded"""
+        db = FakeDatabase(make_rows(0, 10 * 24 * 60))
+        to_time = T0 + pd.Timedelta(days=10) - pd.Timedelta(minutes=1)
+        with db.patch(), mock.patch.dict(ohlcv.OhlcvDataManager.retention, {"m": pd.Timedelta(days=2)}):
+            for _ in range(3):
+                df = ohlcv.OhlcvDataManager.get("1min", "SSI", T0, to_time)
+            ohlcv.OhlcvDataManager.get("1min", "SSI", to_time - pd.Timedelta(days=1), to_time)
+            instance = ohlcv.OhlcvDataManager._instances[("m", "SSI")]
+
+        self.assertEqual(len(df), 10 * 24 * 60)
+        self.assertEqual(instance.data.index[0], T0)
+        self.assertEqual(len(db.queries), 1)
+
+    def test_preload_many_symbols(self):
+        """Preloading fetches symbols in batched queries and fills one instance per symbol"""
+        symbols = [f"S{i}" for i in range(7)]
+        db = FakeDatabase(pd.concat([make_rows(0, 300, base=100.0 * i).assign(symbol=symbol)
+                                     for i, symbol in enumerate(symbols)]))
+        to_time = T0 + pd.Timedelta(minutes=299)
+        with db.patch(), mock.patch.object(ohlcv, "preload_batch_size", 3), \
+                mock.patch.object(ohlcv, "load_chunk_size", 2):  # chunks of 200 rows split symbols
+            counts = ohlcv.OhlcvDataManager.preload(symbols + ["S0"], "5min", str(T0), str(to_time))
+            self.assertEqual(len(db.queries), 3)
+            session = ohlcv.SqlSession.return_value.__enter__.return_value
+            session.connection.assert_called_with(execution_options={"stream_results": True})
+            df = ohlcv.OhlcvDataManager.get("5min", "S4", T0, to_time)
+            self.assertEqual(len(db.queries), 3)
+
+        self.assertEqual(counts, {symbol: 300 for symbol in symbols})
+        self.assertEqual(df["Close"].iloc[-1], 400.0 + 299)
+        np.testing.assert_array_equal(ohlcv.OhlcvDataManager._instances[("m", "S6")].data["close"].values,
+                                      600.0 + np.arange(300))
+
+    def test_realtime_batch_grouped(self):
+        """A consumed batch is filtered and added with one instance lookup per (resolution, symbol)"""
+
+        class Message:
+            def __init__(self, value, error=None):
+                self._value, self._error = value, error
+
+            def value(self):
+                return self._value
+
+            def error(self):
+                return self._error
+
+        def message(symbol, minute, resolution="MIN", source="dnse"):
+            payload = dict(make_tick(minute, float(minute)), symbol=symbol, resolution=resolution, source=source,
+                           data_type="OH", updated=0)
+            return Message(ohlcv.orjson.dumps(payload))
+
+        messages = [message(symbol, minute) for minute in range(20) for symbol in ("SSI", "HPG")]
+        messages += [message("SSI", 0, resolution="HOUR1"), message("VND", 0, source="other"), Message(b"{"),
+                     Message(None, error="broker down")]
+        with mock.patch.object(ohlcv.OhlcvDataManager, "_instance", wraps=ohlcv.OhlcvDataManager._instance) as lookup:
+            added = ohlcv.OhlcvDataManager._handle_messages(messages)
+
+        self.assertEqual(added, 41)
+        self.assertEqual(lookup.call_count, 3)
+        ohlcv._flusher.flush()
+        instances = ohlcv.OhlcvDataManager._instances
+        self.assertEqual(set(instances), {("m", "SSI"), ("m", "HPG"), ("h", "SSI")})
+        np.testing.assert_array_equal(instances[("m", "HPG")].data["close"].values, np.arange(20.0))
+
+    def test_preload_does_not_evict_own_symbols(self):
+        """Memory limits are enforced once per preload: older instances go first, none of the loaded ones"""
+        symbols = ["A", "B", "C"]
+        db = FakeDatabase(pd.concat([make_rows(0, 1_000).assign(symbol=symbol) for symbol in ["OLD"] + symbols]))
+        to_time = T0 + pd.Timedelta(minutes=999)
+        with db.patch():
+            ohlcv.OhlcvDataManager.get("1min", "OLD", T0, to_time)
+            one = ohlcv.OhlcvDataManager.stats()["total_bytes"]
+            with mock.patch.object(ohlcv.OhlcvDataManager, "max_bytes", int(2.5 * one)):
+                ohlcv.OhlcvDataManager.preload(symbols, "1min", str(T0), str(to_time))
+
+        self.assertEqual(set(ohlcv.OhlcvDataManager._instances), {("m", symbol) for symbol in symbols})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,4 +2,8 @@
 from xno.backtest.visualizer import StrategyVisualizer
 from xno.backtest.vn_stocks import BacktestVnStocks
 from xno.backtest.vn_futures import BacktestVnFutures
-from xno.backtest.common import BaseBacktest
\ No newline at end of file
+from xno.backtest.common import BaseBacktest, BenchmarkCache
+from xno.backtest.index import IndexReturnsCache, batch_relative_metrics
+from xno.backtest.fleet import FleetAggregator
+from xno.backtest.streaming import StreamingBacktest, iter_parquet_chunks
+from xno.backtest.results_store import ResultsStore
@@ -1,9 +1,15 @@
 import abc
+import copy
+import hashlib
+import logging
+import threading
 from abc import abstractmethod
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, Any
 
 import numpy as np
+from cachetools import LRUCache
 
+from xno import settings
 from xno.models import (
     TradeAnalysis,
     TradePerformance,
@@ -13,15 +19,24 @@ from xno.models import (
     BotStateHistory,
     StateSeries,
     SeriesMetric,
-    BotBacktestResultSummary
+    BotBacktestResultSummary,
+    DrawdownEpisode,
 )
+from xno.backtest.bootstrap import bootstrap_confidence_intervals
+from xno.backtest.drawdown import top_drawdown_episodes
+from xno.backtest.index import IndexReturnsCache, align_index_returns, relative_metrics
+from xno.backtest.permutation import permutation_test
+from xno.backtest.costs import CostModel
 import quantstats as qs
 import pandas as pd
 
 
-def compound_returns(returns: np.ndarray) -> np.ndarray:
+def compound_returns(returns: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
     """Cumulative return theo công thức lãi kép."""
-    return np.cumprod(1 + returns) - 1
+    out = np.add(returns, 1, out=out)
+    np.cumprod(out, out=out)
+    out -= 1
+    return out
 
 
 def safe_divide(numer, denom, eps=1e-12):
@@ -133,22 +148,158 @@ def build_returns_series(times, returns):
     return return_series
 
 
+def period_bounds(times: np.ndarray, start: Any = None, end: Any = None, include_start: bool = True) -> Tuple[int, int]:
+    """
+    Bar range [start_idx, stop_idx) of the period between two timestamps (both inclusive by default).
+    :param times: sorted bar times
+    :param start: first time of the period, None = from the first bar
+    :param end: last time of the period, None = up to the last bar
+    :param include_start: if False the bar at exactly `start` is excluded (period strictly after `start`)
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    start_idx = 0 if start is None else int(np.searchsorted(
+        times, np.datetime64(pd.Timestamp(start), "ns"), side="left" if include_start else "right"
+    ))
+    stop_idx = len(times) if end is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), "ns"), side="right"))
+    return start_idx, max(start_idx, stop_idx)
+
+
+BenchmarkSeries = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]  # equities, returns, cumrets, pnls
+
+
+def price_fingerprint(times: np.ndarray, prices: np.ndarray, sample_size: int = 4096) -> tuple:
+    """
+    Cheap identity of a price history: length, first/last time and price, the sum of all prices and a
+    hash of an evenly strided sample. Any backward (dividend/split) adjustment changes the sum and the
+    sampled prices before the ex-date, without scanning the history byte by byte.
+    """
+    n = len(prices)
+    if n == 0:
+        return (0,)
+    prices = np.asarray(prices)
+    sample = np.ascontiguousarray(prices[::max(1, n // sample_size)])
+    return (
+        n,
+        np.asarray(times[:1]).tobytes(), np.asarray(times[-1:]).tobytes(),
+        float(prices[0]), float(prices[-1]), float(prices.sum(dtype=np.float64)),
+        hashlib.blake2b(sample.view(np.uint8), digest_size=16).digest(),
+    )
+
+
+class BenchmarkCache:
+    """
+    Process-wide cache of buy-and-hold benchmark series.
+    The benchmark only depends on the engine and its fee parameters, the book size and the price
+    history, so every bot on the same market shares one computation. Entries are keyed on a
+    fingerprint of the history (see `price_fingerprint`), computed once per backtest, and bounded by
+    `settings.benchmark_cache_max_bytes` (least recently used series are dropped first).
+    """
+    _cache: LRUCache = LRUCache(
+        maxsize=settings.benchmark_cache_max_bytes,
+        getsizeof=lambda series: sum(s.nbytes for s in series),
+    )
+    _lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+            engine: str,
+            symbol: str,
+            timeframe: str,
+            book_size: float,
+            times: np.ndarray,
+            prices: np.ndarray,
+            dtype=np.float64,
+            params: tuple = (),
+    ) -> tuple:
+        """
+        :param params: engine parameters the benchmark depends on (fee rate, contract size, ...)
+        """
+        return (engine, symbol, timeframe, float(book_size), np.dtype(dtype).str, tuple(params),
+                price_fingerprint(times, prices))
+
+    @classmethod
+    def get(cls, key: tuple) -> BenchmarkSeries | None:
+        with cls._lock:
+            return cls._cache.get(key)
+
+    @classmethod
+    def put(cls, key: tuple, series: BenchmarkSeries):
+        for s in series:
+            s.setflags(write=False)  # shared between bots
+        with cls._lock:
+            try:
+                cls._cache[key] = series
+            except ValueError:  # larger than the whole budget
+                logging.debug(f"Benchmark of {key[1]} not cached ({sum(s.nbytes for s in series)} bytes)")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+
 class BaseBacktest(abc.ABC):
+    """
+    Vectorized backtest of one bot.
+
+    Lean mode (``lean=True``) is meant for multi-million-bar inputs:
+
+    - series may be stored as float32 (``dtype=np.float32``, ~1e-7 relative precision, so equity
+      and compounded returns drift on very long runs);
+    - the pandas return series is only built when performance metrics are requested;
+    - `summarize` hands the arrays themselves to the summary instead of Python lists.
+
+    `__build__` always writes into preallocated buffers. On top of the inputs it allocates five series
+    (fees, pnls, equities, returns, cumulative returns), the cost model temporaries (at most two
+    series for the flat fees) and the four benchmark series, which are shared with every bot on the
+    same market through `BenchmarkCache`. With n bars and itemsize b a build therefore peaks at about
+    (5 + 2 + 4) * n * b above the inputs (plus one copy of each input not already in ``dtype``),
+    e.g. ~80 MiB for 1M float64 bars. On top of that:
+
+    - a lean `summarize` allocates one more series, the exposures, which the summary keeps
+      (the other summary series are the build buffers themselves);
+    - the futures margin ledger (``margin=True``) builds about 11 series of its own in ``dtype``,
+      eight of which stay referenced by ``margin_ledger``;
+    - benchmark series outlive the backtest: `BenchmarkCache` keeps up to
+      ``settings.benchmark_cache_max_bytes`` of them for the life of the process.
+
+    Inputs are never written to, so read-only (zero-copy decoded) arrays are fine.
+    """
     fee_rate = None
+    cost_model: CostModel | None = None  # None = the engine's flat fee (see default_cost_model)
+    lean = False
+    dtype = np.float64
+    drawdown_top_n = 10  # drawdown episodes kept in the summary
+    index_symbol: str | None = None  # e.g. "VNINDEX": add index-relative metrics to the summary
+    contract_multiplier = 1  # currency value of one unit of position per point of price
 
     def __init__(
         self,
-            inp: BacktestInput
+            inp: BacktestInput,
+            cost_model: CostModel | None = None,
+            lean: bool | None = None,
+            dtype=None,
     ):
+        """
+        :param inp: backtest input
+        :param cost_model: transaction cost model, overrides the class-level `cost_model`
+        :param lean: memory-lean mode (see class docstring), defaults to the class-level `lean`
+        :param dtype: float dtype of the series, np.float64 or np.float32 (lean mode only)
+        """
+        self.lean = self.lean if lean is None else lean
+        self.dtype = np.dtype(dtype or self.dtype) if self.lean else np.dtype(np.float64)
         self.timeframe = inp.timeframe
         self.bt_mode = TypeTradeMode(inp.bt_mode)
         self.actions = inp.actions
         self.bot_id = inp.bot_id
+        self.symbol = inp.symbol
         self.init_cash = inp.book_size
         self.times = inp.times
         self.prices = inp.prices
         self.positions = inp.positions
         self.trade_sizes = inp.trade_sizes
+        self.volumes = inp.volumes
+        self.cost_model = cost_model or self.cost_model or self.default_cost_model()
         self.periods = int(minute_bar_per_day / get_minutes(self.timeframe) * 250)
         # Calculated from code
         self.returns: np.ndarray | None = None
@@ -164,16 +315,32 @@ class BaseBacktest(abc.ABC):
         self.bm_cumrets: np.ndarray | None = None
         self.bm_equities: np.ndarray | None = None
         self.__build__()
-        self.return_series = self.build_returns()  # Build pandas series
+        if not self.lean:
+            self.return_series = self.build_returns()  # Build pandas series
         # tracking
         self.trade_analysis: Optional[TradeAnalysis] = None
         self.performance: Optional[TradePerformance] = None
+        self.drawdowns: List[DrawdownEpisode] | None = None
         self.series_metrics: Dict[str, SeriesMetric] | None = None
         # rolling defines
         self.rolling_sharpe: np.ndarray | None = None
         self.rolling_vol: np.ndarray | None = None
         self.rolling_drawdown: np.ndarray | None = None
 
+    @classmethod
+    def kernel(cls, book_size: float, cost_model: CostModel | None = None) -> "BaseBacktest":
+        """
+        Engine instance holding only its configuration (nothing is built), for callers that run the
+        per-bar hooks (`cost_model`, `_returns`, `_build_benchmark`) on their own arrays,
+        e.g. `StreamingBacktest`.
+        :param book_size: initial cash
+        :param cost_model: transaction cost model
+        """
+        bt = cls.__new__(cls)
+        bt.init_cash = book_size
+        bt.cost_model = cost_model or cls.cost_model or bt.default_cost_model()
+        return bt
+
     def build_returns(self):
         if self.return_series is None:
             self.return_series = build_returns_series(times=self.times, returns=self.returns)
@@ -200,6 +367,75 @@ class BaseBacktest(abc.ABC):
     def __build__(self) -> BotBacktestResultSummary:
         raise NotImplementedError()
 
+    @abstractmethod
+    def default_cost_model(self) -> CostModel:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def _returns(self, pnls: np.ndarray, equities: np.ndarray) -> np.ndarray:
+        """Per-bar returns from pnls and the equity curve (the first bar has no return)."""
+        raise NotImplementedError()
+
+    def _extra_series(self) -> Dict[str, np.ndarray]:
+        """Engine-specific series added to the summary."""
+        return {}
+
+    def _as_series(self, values) -> np.ndarray:
+        """Input as an array of the backtest dtype (no copy when it already is one)."""
+        return np.asarray(values, dtype=self.dtype)
+
+    def _build_pnls(self, multiplier: float | None = None) -> np.ndarray:
+        """
+        Per-bar pnl: previous position * price change (* multiplier) - fees, written in one buffer.
+        Requires `self.fees`. Bar 0 has no previous position.
+        """
+        pnls = np.empty(len(self.prices), dtype=self.dtype)
+        pnls[0] = 0
+        np.subtract(self.prices[1:], self.prices[:-1], out=pnls[1:])
+        np.multiply(pnls[1:], self.positions[:-1], out=pnls[1:])
+        if multiplier is not None:
+            pnls *= multiplier
+        pnls -= self.fees
+        return pnls
+
+    def _build_equities(self) -> np.ndarray:
+        """init_cash + cumulative pnl."""
+        equities = np.cumsum(self.pnls, out=np.empty_like(self.pnls))
+        equities += self.init_cash
+        return equities
+
+    def get_exposures(self) -> np.ndarray:
+        """Signed notional of the position held at each bar close."""
+        exposures = np.multiply(self.positions, self.prices)
+        if self.contract_multiplier != 1:
+            exposures *= self.contract_multiplier
+        return exposures
+
+    def get_fees(self) -> np.ndarray:
+        """Per-bar transaction costs from the cost model, computed over the whole history at once."""
+        return self.cost_model.costs(self.prices, self.trade_sizes, self.positions, self.volumes)
+
+    def _benchmark_params(self) -> tuple:
+        """Engine parameters `_build_benchmark` depends on besides the prices and book size."""
+        return (self.fee_rate,)
+
+    @abstractmethod
+    def _build_benchmark(self, prices: np.ndarray) -> BenchmarkSeries:
+        """Buy-and-hold benchmark: (bm_equities, bm_returns, bm_cumrets, bm_pnls)."""
+        raise NotImplementedError()
+
+    def get_benchmark(self) -> BenchmarkSeries:
+        """Benchmark series for the current prices, shared through `BenchmarkCache`."""
+        key = BenchmarkCache.make_key(
+            self.__class__.__name__, self.symbol, self.timeframe, self.init_cash, self.times, self.prices,
+            self.prices.dtype, self._benchmark_params(),
+        )
+        series = BenchmarkCache.get(key)
+        if series is None:
+            series = self._build_benchmark(self.prices)
+            BenchmarkCache.put(key, series)
+        return series
+
     def get_analysis(self) -> TradeAnalysis:
         if self.trade_analysis is not None:
             return self.trade_analysis
@@ -255,35 +491,214 @@ class BaseBacktest(abc.ABC):
     def get_performance(self) -> TradePerformance:
         if self.performance is not None:
             return self.performance
-        self.performance = get_performance(self.return_series, self.periods)
+        self.performance = get_performance(self.build_returns(), self.periods)
         return self.performance
 
+    def get_drawdowns(self, top_n: int | None = None) -> List[DrawdownEpisode]:
+        """
+        Deepest drawdown episodes of the equity curve, deepest first.
+        :param top_n: number of episodes, defaults to `drawdown_top_n`
+        """
+        top_n = top_n or self.drawdown_top_n
+        if self.drawdowns is not None and len(self.drawdowns) >= top_n:
+            return self.drawdowns[:top_n]
+        episodes = top_drawdown_episodes(self.equities, top_n)
+        self.drawdowns = [
+            DrawdownEpisode(
+                start=self.times[start],
+                trough=self.times[trough],
+                recovery=self.times[recovery] if recovery >= 0 else None,
+                depth=float(depth),
+                length=int(length),
+            )
+            for start, trough, recovery, depth, length in zip(
+                episodes["start"], episodes["trough"], episodes["recovery"], episodes["depth"], episodes["length"]
+            )
+        ]
+        return self.drawdowns
+
+    def get_index_metrics(self, index_symbol: str | None = None) -> Dict[str, float]:
+        """
+        Beta, alpha, correlation, tracking error and information ratio against a market index.
+        The index closes over the bot's bars are cached per (index, timeframe) in `IndexReturnsCache`.
+        The metrics are attached to `TradePerformance`. Use `xno.backtest.index.batch_relative_metrics`
+        for many bots at once.
+        :param index_symbol: index symbol, defaults to the class-level `index_symbol`
+        :return: metric name -> value
+        """
+        index_symbol = index_symbol or self.index_symbol
+        if index_symbol is None:
+            raise ValueError("No index symbol given")
+        times = np.asarray(self.times, dtype="datetime64[ns]")
+        index_series = IndexReturnsCache.get(index_symbol, self.timeframe, times[0], times[-1])
+        index_returns = align_index_returns(times, *index_series)
+        metrics = relative_metrics(self.returns, index_returns, self.periods)
+        self.set_index_metrics(metrics)
+        return metrics
+
+    def set_index_metrics(self, metrics: Dict[str, float]):
+        performance = self.get_performance()
+        for name, value in metrics.items():
+            setattr(performance, name, value)
+
+    def get_confidence_intervals(
+            self,
+            n_resamples: int = 1000,
+            block_size: int | None = None,
+            alpha: float = 0.05,
+            seed: int | None = None,
+    ) -> Dict[str, List[float]]:
+        """
+        Block-bootstrap confidence intervals of Sharpe, max drawdown and CAGR.
+        The intervals are attached to `TradePerformance` (sharpe_ci, max_drawdown_ci, annual_return_ci).
+        :param n_resamples: number of resampled paths
+        :param block_size: block length in bars, n^(1/3) if None
+        :param alpha: two-sided significance, 0.05 gives a 95% interval
+        :param seed: random seed
+        :return: metric name -> [lower, upper]
+        """
+        intervals = bootstrap_confidence_intervals(
+            self.returns,
+            self.periods,
+            alpha=alpha,
+            n_resamples=n_resamples,
+            block_size=block_size,
+            seed=seed,
+        )
+        performance = self.get_performance()
+        performance.sharpe_ci = intervals["sharpe"]
+        performance.max_drawdown_ci = intervals["max_drawdown"]
+        performance.annual_return_ci = intervals["annual_return"]
+        return intervals
+
+    def period(self, start: int, stop: int) -> "BaseBacktest":
+        """
+        View of the bars [start, stop) as if the bot had been backtested on that period alone,
+        derived from this run's cumulative arrays instead of a new run: the equity curve is rebased
+        to `init_cash` at `start` and the price move into the first bar belongs to the previous period.
+        Positions carried into the period are kept (the run is continuous).
+        Benchmark series are rebuilt for the period through `BenchmarkCache`.
+        :param start: first bar index
+        :param stop: bar index after the last one
+        """
+        bt = copy.copy(self)
+        bars = slice(start, stop)
+        bt.times = self.times[bars]
+        bt.prices = self.prices[bars]
+        bt.positions = self.positions[bars]
+        bt.trade_sizes = self.trade_sizes[bars]
+        bt.actions = self.actions[bars]
+        bt.volumes = None if self.volumes is None else self.volumes[bars]
+        bt.fees = self.fees[bars]
+        # equity(k) - init_cash = sum of the period pnls, with the first pnl reduced to its fee
+        offset = self.equities[start] - self.init_cash + self.fees[start]
+        bt.equities = self.equities[bars] - offset
+        bt.pnls = self.pnls[bars].copy()
+        bt.pnls[0] = -bt.fees[0]
+        bt.returns = bt._returns(bt.pnls, bt.equities)
+        bt.cum_rets = compound_returns(bt.returns)
+        bt.bm_equities, bt.bm_returns, bt.bm_cumrets, bt.bm_pnls = bt.get_benchmark()
+        bt.return_series = None
+        if not bt.lean:
+            bt.build_returns()
+        bt.trade_analysis = None
+        bt.performance = None
+        bt.drawdowns = None
+        bt.series_metrics = None
+        return bt
+
+    def summarize_periods(self, periods: Dict[TypeTradeMode, Tuple[int, int]]) -> BotBacktestResultSummary:
+        """
+        Summaries of several periods of one run (see `period`).
+        :param periods: trade mode -> bar range [start, stop); modes not given or with fewer than 2 bars stay empty
+        :return: the train/test/simulate/live summaries
+        """
+        summaries = {}
+        for mode in (TypeTradeMode.Train, TypeTradeMode.Test, TypeTradeMode.Simulate, TypeTradeMode.Live):
+            start, stop = periods.get(mode, (0, 0))
+            if stop - start < 2:
+                summaries[mode.value] = {}
+                continue
+            bt = self.period(start, stop)
+            bt.bt_mode = mode
+            summaries[mode.value] = bt.summarize()
+        return BotBacktestResultSummary(**summaries)
+
+    def get_permutation_test(
+            self,
+            n_permutations: int = 1000,
+            mode: str = "returns",
+            n_jobs: int | None = None,
+            seed: int | None = None,
+    ) -> Dict[str, float | np.ndarray]:
+        """
+        Permutation test of the Sharpe ratio against paths where positions and price moves are unrelated.
+        The p-value is attached to `TradePerformance.sharpe_pvalue`.
+        :param n_permutations: number of permuted backtests
+        :param mode: "returns" shuffles the price changes, "signals" shifts the position path by a random lag
+        :param n_jobs: worker processes, all CPUs if None, 1 runs in this process
+        :param seed: random seed
+        :return: observed sharpe, pvalue and the null distribution
+        """
+        result = permutation_test(
+            self.kernel(self.init_cash, self.cost_model),
+            self.prices,
+            self.positions,
+            self.fees,
+            self.returns,
+            self.periods,
+            volumes=self.volumes,
+            n_permutations=n_permutations,
+            mode=mode,
+            n_jobs=n_jobs,
+            seed=seed,
+        )
+        self.get_performance().sharpe_pvalue = result["pvalue"]
+        return result
+
     def summarize(self) -> BotTradeSummary:
-        list_times = self.times.tolist()
+        if self.index_symbol is not None and self.get_performance().beta is None:
+            try:
+                self.get_index_metrics()
+            except Exception as e:
+                logging.warning(f"Index metrics against {self.index_symbol} unavailable for bot_id={self.bot_id}: {e}")
+        if self.lean:
+            # Arrays are serialized directly by orjson; int64 nanoseconds keep the same JSON as tolist()
+            list_times = np.asarray(self.times, dtype="datetime64[ns]").view(np.int64)
+            values = np.asarray
+        else:
+            list_times = self.times.tolist()
+            values = np.ndarray.tolist
         self.series_metrics = {
             "actions": SeriesMetric("actions", times=list_times, values=self.actions),
             "prices": SeriesMetric("prices", times=list_times, values=self.prices),
-            "returns": SeriesMetric("returns", times=list_times, values=self.returns.tolist()),
-            "cumrets": SeriesMetric("cumrets", times=list_times, values=self.cum_rets.tolist()),
-            "fees": SeriesMetric("fees", times=list_times, values=self.fees.tolist()),
-            "pnls": SeriesMetric("pnls", times=list_times, values=self.pnls.tolist()),
-            "trade_sizes": SeriesMetric("trade_sizes", times=list_times, values=self.trade_sizes.tolist()),
-            "equities": SeriesMetric("equities", times=list_times, values=self.equities.tolist()),
-            "bm_returns": SeriesMetric("bm_returns", times=list_times, values=self.bm_returns.tolist()),
-            "bm_pnls": SeriesMetric("bm_pnls", times=list_times, values=self.bm_pnls.tolist()),
-            "bm_cumrets": SeriesMetric("bm_cumrets", times=list_times, values=self.bm_cumrets.tolist()),
-            "bm_equities": SeriesMetric("bm_equities", times=list_times, values=self.bm_equities.tolist()),
+            "returns": SeriesMetric("returns", times=list_times, values=values(self.returns)),
+            "cumrets": SeriesMetric("cumrets", times=list_times, values=values(self.cum_rets)),
+            "fees": SeriesMetric("fees", times=list_times, values=values(self.fees)),
+            "pnls": SeriesMetric("pnls", times=list_times, values=values(self.pnls)),
+            "trade_sizes": SeriesMetric("trade_sizes", times=list_times, values=values(self.trade_sizes)),
+            "equities": SeriesMetric("equities", times=list_times, values=values(self.equities)),
+            "exposures": SeriesMetric("exposures", times=list_times, values=values(self.get_exposures())),
+            "bm_returns": SeriesMetric("bm_returns", times=list_times, values=values(self.bm_returns)),
+            "bm_pnls": SeriesMetric("bm_pnls", times=list_times, values=values(self.bm_pnls)),
+            "bm_cumrets": SeriesMetric("bm_cumrets", times=list_times, values=values(self.bm_cumrets)),
+            "bm_equities": SeriesMetric("bm_equities", times=list_times, values=values(self.bm_equities)),
         }
+        for name, series in self._extra_series().items():
+            self.series_metrics[name] = SeriesMetric(name, times=list_times, values=values(series))
         return BotTradeSummary(
             total_candles=len(self.times),
             bot_id=self.bot_id,
+            symbol=self.symbol,
+            timeframe=self.timeframe,
             init_cash=self.init_cash,
             from_time=self.times[0],
             to_time=self.times[-1],
             analysis=self.get_analysis(),
             bt_mode=self.bt_mode,
             performance=self.get_performance(),
+            drawdowns=self.get_drawdowns(),
             series=self.series_metrics,
-            candles=self.times.tolist(),
+            candles=list_times,
         )
 
@@ -0,0 +1,161 @@
+"""
+Vectorized transaction cost models.
+
+A cost model maps the whole trade history to a per-bar cost array (in cash) with array operations only.
+Models compose with ``+``::
+
+    model = PercentFee(0.0015) + SellTax(0.001) + TickSlippage(HOSE_TICKS) + VolumeSlippage(impact=0.1)
+"""
+import abc
+from abc import abstractmethod
+from typing import Sequence, Tuple, List
+
+import numpy as np
+
+from xno import settings
+
+# Tick-size ladders: (price from, tick size), prices in VND
+HOSE_TICKS = ((0, 10), (10_000, 50), (50_000, 100))
+HNX_TICKS = ((0, 100),)
+UPCOM_TICKS = ((0, 100),)
+# VN30 index futures, in index points
+VN_FUTURE_TICKS = ((0, 0.1),)
+
+_exchange_ticks = {
+    "HOSE": HOSE_TICKS,
+    "HNX": HNX_TICKS,
+    "UPCOM": UPCOM_TICKS,
+}
+
+
+def tick_sizes(prices: np.ndarray, ladder: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Tick size applicable to each price."""
+    thresholds = np.array([lo for lo, _ in ladder], dtype=np.float64)
+    ticks = np.array([tick for _, tick in ladder], dtype=np.float64)
+    return ticks[np.searchsorted(thresholds, prices, side="right") - 1]
+
+
+class CostModel(abc.ABC):
+    """Base class of the cost models."""
+
+    @abstractmethod
+    def costs(
+            self,
+            prices: np.ndarray,
+            trade_sizes: np.ndarray,
+            positions: np.ndarray,
+            volumes: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Cost of each bar's trade, in cash.
+        :param prices: execution prices
+        :param trade_sizes: traded quantity per bar (sign is not relied upon)
+        :param positions: position after each bar, used to tell buys from sells
+        :param volumes: traded market volume per bar, if available
+        """
+        raise NotImplementedError()
+
+    def __add__(self, other: "CostModel") -> "CompositeCost":
+        return CompositeCost([self, other])
+
+
+class CompositeCost(CostModel):
+    """Sum of several cost models."""
+
+    def __init__(self, models: List[CostModel]):
+        self.models = []
+        for model in models:
+            self.models.extend(model.models if isinstance(model, CompositeCost) else [model])
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        total = self.models[0].costs(prices, trade_sizes, positions, volumes)
+        for model in self.models[1:]:
+            total = total + model.costs(prices, trade_sizes, positions, volumes)
+        return total
+
+
+class PercentFee(CostModel):
+    """Brokerage fee as a fraction of the traded value."""
+
+    def __init__(self, rate: float = settings.trading_fee.percent_stock_fee, multiplier: float = 1):
+        self.rate = rate
+        self.multiplier = multiplier
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        fees = np.abs(trade_sizes) * prices * self.rate
+        if self.multiplier != 1:
+            fees *= self.multiplier
+        return fees
+
+
+class PerContractFee(CostModel):
+    """Fixed fee per traded contract."""
+
+    def __init__(self, fee: float = settings.trading_fee.fixed_derivative_fee):
+        self.fee = fee
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        return np.abs(trade_sizes) * self.fee
+
+
+class SellTax(CostModel):
+    """Tax on the value of sells (bars where the position decreases)."""
+
+    def __init__(self, rate: float = settings.trading_fee.stock_sell_tax):
+        self.rate = rate
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        sells = np.diff(positions, prepend=0.0) < 0
+        return np.where(sells, np.abs(trade_sizes) * prices * self.rate, 0.0)
+
+
+class TickSlippage(CostModel):
+    """Crossing the spread: a number of ticks, looked up on the exchange ladder, per traded unit."""
+
+    def __init__(self, ladder: Sequence[Tuple[float, float]] | str = HOSE_TICKS, ticks: float = 0.5, multiplier: float = 1):
+        """
+        :param ladder: tick-size ladder or exchange name (HOSE, HNX, UPCOM)
+        :param ticks: ticks paid per trade, 0.5 = half spread
+        :param multiplier: cash value of one price unit per traded unit (contract size for futures)
+        """
+        self.ladder = _exchange_ticks[ladder.upper()] if isinstance(ladder, str) else ladder
+        self.ticks = ticks
+        self.multiplier = multiplier
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        return np.abs(trade_sizes) * tick_sizes(prices, self.ladder) * (self.ticks * self.multiplier)
+
+
+class VolumeSlippage(CostModel):
+    """
+    Market impact from volume participation: price * impact * (|size| / volume) ^ exponent per traded unit.
+    Participation is capped at 1; bars without volume are charged the cap.
+    """
+
+    def __init__(self, impact: float = 0.1, exponent: float = 0.5, multiplier: float = 1):
+        self.impact = impact
+        self.exponent = exponent
+        self.multiplier = multiplier
+
+    def costs(self, prices, trade_sizes, positions, volumes=None) -> np.ndarray:
+        sizes = np.abs(trade_sizes)
+        if volumes is None:
+            return np.zeros_like(sizes, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        participation = np.divide(sizes, volumes, out=np.ones_like(sizes, dtype=np.float64), where=volumes > 0)
+        np.minimum(participation, 1.0, out=participation)
+        return sizes * prices * (self.impact * self.multiplier) * participation ** self.exponent
+
+
+def vn_stock_cost_model(exchange: str = "HOSE", ticks: float = 0.5, impact: float = 0.1) -> CostModel:
+    """Realistic VN stock costs: brokerage fee, sell tax, half-spread on the exchange ladder and volume impact."""
+    return PercentFee() + SellTax() + TickSlippage(exchange, ticks=ticks) + VolumeSlippage(impact=impact)
+
+
+def vn_future_cost_model(ticks: float = 0.5, impact: float = 0.1, contract_size: float = 100_000) -> CostModel:
+    """Realistic VN30 futures costs: per-contract fee, half-spread and volume impact."""
+    return (
+        PerContractFee()
+        + TickSlippage(VN_FUTURE_TICKS, ticks=ticks, multiplier=contract_size)
+        + VolumeSlippage(impact=impact, multiplier=contract_size)
+    )
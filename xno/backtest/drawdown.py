@@ -0,0 +1,57 @@
+"""
+Vectorized drawdown episodes of an equity curve.
+
+An episode starts at a running peak, goes underwater and ends at the first bar back at (or above)
+that peak. Episodes are found with a running maximum and run-length arithmetic on the underwater
+mask, without a Python loop over bars.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def drawdown_episodes(equities: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    All drawdown episodes of an equity curve, in time order.
+    :param equities: equity curve (positive values)
+    :return: dict of arrays with one entry per episode:
+        start (peak bar), trough (bar), recovery (bar, -1 if not recovered),
+        depth (trough / peak - 1), length (bars from peak to recovery or to the last bar)
+    """
+    equities = np.asarray(equities, dtype=np.float64)
+    n = len(equities)
+    peaks = np.maximum.accumulate(equities)
+    drawdowns = equities / peaks - 1
+    underwater = drawdowns < 0
+
+    # Run boundaries: an episode covers the underwater bars [first, last]
+    edges = np.diff(underwater.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    first = np.flatnonzero(edges == 1)
+    last = np.flatnonzero(edges == -1) - 1
+    if len(first) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return dict(start=empty, trough=empty, recovery=empty, depth=np.empty(0), length=empty)
+
+    depth = np.minimum.reduceat(drawdowns, first)
+    # Trough = first bar of each run reaching the run minimum
+    run_id = np.cumsum(edges[:-1] == 1) - 1
+    at_min = underwater & (drawdowns == depth[np.maximum(run_id, 0)])
+    _, trough_pos = np.unique(run_id[at_min], return_index=True)
+    trough = np.flatnonzero(at_min)[trough_pos]
+
+    start = first - 1  # the bar before the first underwater one holds the peak (bar 0 is never underwater)
+    recovered = last + 1 < n
+    recovery = np.where(recovered, last + 1, -1)
+    length = np.where(recovered, last + 1, n - 1) - start
+    return dict(start=start, trough=trough, recovery=recovery, depth=depth, length=length)
+
+
+def top_drawdown_episodes(equities: np.ndarray, top_n: int | None = None) -> Dict[str, np.ndarray]:
+    """
+    Drawdown episodes sorted by depth, deepest first.
+    :param equities: equity curve
+    :param top_n: keep only the `top_n` deepest episodes (all if None)
+    """
+    episodes = drawdown_episodes(equities)
+    order = np.argsort(episodes["depth"], kind="stable")[:top_n]
+    return {name: values[order] for name, values in episodes.items()}
@@ -0,0 +1,183 @@
+"""
+Fleet-level aggregation of many bots' equity and exposure.
+
+Bots are aligned on the union of their bar times (one sort of all times). On that axis every bot
+holds its last known value: its initial cash before its first bar, its last equity and exposure
+after its last one. Totals are kept per axis bar, so refreshing one bot only re-aligns that bot
+(O(axis)) instead of rebuilding the whole fleet.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from xno.models import BotTradeSummary
+
+FleetPayload = Dict  # bot_id, symbol, init_cash, times, equities, exposures (optional)
+
+
+def _as_times(times) -> np.ndarray:
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.integer):
+        return times.astype(np.int64).view("datetime64[ns]")  # nanoseconds, as in summary JSON
+    return times.astype("datetime64[ns]")
+
+
+def _forward_fill(times: np.ndarray, values: np.ndarray, axis: np.ndarray, before: float) -> np.ndarray:
+    """Values of a series on `axis`: last value at or before each axis time, `before` ahead of the series."""
+    if len(times) == 0:
+        return np.full(len(axis), before)
+    pos = np.searchsorted(times, axis, side="right") - 1
+    out = values[np.maximum(pos, 0)]
+    out[pos < 0] = before
+    return out
+
+
+@dataclass
+class _BotColumns:
+    symbol: str | None
+    init_cash: float
+    times: np.ndarray
+    equities: np.ndarray
+    exposures: np.ndarray
+
+
+class FleetAggregator:
+    """
+    Incremental portfolio view over many bots.
+
+    Feed it `BotTradeSummary` objects or columnar payloads (dicts with ``bot_id``, ``symbol``,
+    ``init_cash``, ``times``, ``equities`` and optionally ``exposures``) with `update`.
+    Times may be datetime64 values or integer nanoseconds (the summary JSON format).
+    """
+
+    def __init__(self):
+        self._bots: Dict[str, _BotColumns] = {}
+        self._lock = threading.RLock()
+        self._axis: np.ndarray | None = None
+        self._equity: np.ndarray | None = None
+        self._exposure: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def _columns(item: BotTradeSummary | FleetPayload) -> Tuple[str, _BotColumns]:
+        if isinstance(item, BotTradeSummary):
+            series = item.series
+            times = series["equities"].times
+            exposures = series["exposures"].values if "exposures" in series else None
+            bot_id, symbol, init_cash, equities = item.bot_id, item.symbol, item.init_cash, series["equities"].values
+        else:
+            times = item["times"]
+            exposures = item.get("exposures")
+            bot_id, symbol, init_cash, equities = item["bot_id"], item.get("symbol"), item["init_cash"], item["equities"]
+        times = _as_times(times)
+        equities = np.asarray(equities, dtype=np.float64)
+        exposures = np.zeros_like(equities) if exposures is None else np.asarray(exposures, dtype=np.float64)
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, equities, exposures = times[order], equities[order], exposures[order]
+        return bot_id, _BotColumns(symbol, float(init_cash), times, equities, exposures)
+
+    def _aligned(self, bot: _BotColumns, axis: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (
+            _forward_fill(bot.times, bot.equities, axis, bot.init_cash),
+            _forward_fill(bot.times, bot.exposures, axis, 0.0),
+        )
+
+    def _rebuild(self):
+        bots = list(self._bots.values())
+        if not bots:
+            self._axis, self._equity, self._exposure = None, None, {}
+            return
+        self._axis = np.unique(np.concatenate([bot.times for bot in bots]))
+        self._equity = np.zeros(len(self._axis))
+        self._exposure = {}
+        for bot in bots:
+            self._add(bot, 1.0)
+
+    def _add(self, bot: _BotColumns, sign: float):
+        equity, exposure = self._aligned(bot, self._axis)
+        self._equity += sign * equity
+        symbol_exposure = self._exposure.setdefault(bot.symbol, np.zeros(len(self._axis)))
+        symbol_exposure += sign * exposure
+
+    def _extend_axis(self, times: np.ndarray) -> bool:
+        """Append times later than the axis end, holding totals flat. False if `times` needs an insertion."""
+        tail = times[times > self._axis[-1]]
+        head = times[times <= self._axis[-1]]
+        if len(head) > 0 and not np.all(np.isin(head, self._axis)):
+            return False
+        if len(tail) > 0:
+            tail = np.unique(tail)
+            self._axis = np.concatenate([self._axis, tail])
+            self._equity = np.concatenate([self._equity, np.full(len(tail), self._equity[-1])])
+            for symbol, exposure in self._exposure.items():
+                self._exposure[symbol] = np.concatenate([exposure, np.full(len(tail), exposure[-1])])
+        return True
+
+    def update(self, item: BotTradeSummary | FleetPayload):
+        """Add a bot or replace its series (e.g. after a live refresh)."""
+        bot_id, bot = self._columns(item)
+        with self._lock:
+            old = self._bots.get(bot_id)
+            self._bots[bot_id] = bot
+            if self._axis is None or len(self._axis) == 0 or not self._extend_axis(bot.times):
+                self._rebuild()
+                return
+            if old is not None:
+                self._add(old, -1.0)
+            self._add(bot, 1.0)
+
+    def update_many(self, items: Iterable[BotTradeSummary | FleetPayload]):
+        """Add or replace many bots with a single alignment pass."""
+        with self._lock:
+            for item in items:
+                bot_id, bot = self._columns(item)
+                self._bots[bot_id] = bot
+            self._rebuild()
+
+    def remove(self, bot_id: str):
+        with self._lock:
+            bot = self._bots.pop(bot_id, None)
+            if bot is not None and self._axis is not None:
+                self._add(bot, -1.0)
+
+    @property
+    def bot_ids(self) -> List[str]:
+        return list(self._bots)
+
+    def times(self) -> np.ndarray:
+        with self._lock:
+            return np.empty(0, dtype="datetime64[ns]") if self._axis is None else self._axis.copy()
+
+    def equity(self) -> np.ndarray:
+        """Total equity of the fleet on the union axis."""
+        with self._lock:
+            return np.empty(0) if self._equity is None else self._equity.copy()
+
+    def exposure_by_symbol(self) -> Dict[str, np.ndarray]:
+        """Signed notional exposure per symbol on the union axis."""
+        with self._lock:
+            return {symbol: exposure.copy() for symbol, exposure in self._exposure.items()}
+
+    def drawdown(self) -> np.ndarray:
+        """Fleet drawdown (equity / running peak - 1) on the union axis."""
+        equity = self.equity()
+        if len(equity) == 0:
+            return equity
+        return equity / np.maximum.accumulate(equity) - 1
+
+    def overview(self) -> Dict:
+        """Latest fleet figures, for dashboards."""
+        with self._lock:
+            if self._axis is None:
+                return dict(bots=0, time=None, equity=None, max_drawdown=None, drawdown=None, exposure={})
+            drawdown = self.drawdown()
+            return dict(
+                bots=len(self._bots),
+                time=self._axis[-1],
+                equity=float(self._equity[-1]),
+                max_drawdown=float(drawdown.min()),
+                drawdown=float(drawdown[-1]),
+                exposure={symbol: float(exposure[-1]) for symbol, exposure in self._exposure.items()},
+            )
@@ -0,0 +1,178 @@
+"""
+Metrics relative to a market index (VNINDEX, VN30, ...).
+
+Index closes are loaded per (index, timeframe) over the bots' bar range and cached process-wide
+(a bot outside the cached range extends it), then aligned to each bot's bars by forward-filling the last index close at or before every bar (one searchsorted).
+Beta, alpha, correlation, tracking error and information ratio are computed with array
+reductions, either for one bot or for a (bots x bars) matrix of returns sharing the same bars.
+"""
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+IndexSeries = Tuple[np.ndarray, np.ndarray]  # times (datetime64[ns]), closes
+
+
+def load_index_closes(index_symbol: str, timeframe: str, from_time, to_time) -> IndexSeries:
+    """
+    Index closes from the OHLCV data layer (imported lazily, the backtest itself needs no DB).
+    :param from_time: first bar time to load
+    :param to_time: last bar time to load
+    """
+    from xno.data.ohlcv import OhlcvDataManager
+
+    df = OhlcvDataManager.get(timeframe, index_symbol, from_time=from_time, to_time=to_time)
+    if df.empty:
+        raise ValueError(f"No OHLCV data found for index {index_symbol} - {timeframe} from {from_time} to {to_time}")
+    df = df.sort_index()
+    times = df.index.to_numpy(dtype="datetime64[ns]")
+    return times, df["Close"].to_numpy(dtype=np.float64)
+
+
+class IndexReturnsCache:
+    """
+    Process-wide cache of index closes per (index, timeframe), with the time range they cover.
+    A request outside the covered range reloads the union of both ranges with `load_index_closes`;
+    `put` registers series loaded elsewhere.
+    """
+    _cache: LRUCache = LRUCache(maxsize=32)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, index_symbol: str, timeframe: str, from_time, to_time) -> IndexSeries:
+        """
+        :param from_time: first bar time needed (e.g. the bot's first bar)
+        :param to_time: last bar time needed
+        """
+        from_time = np.datetime64(from_time, "ns")
+        to_time = np.datetime64(to_time, "ns")
+        key = (index_symbol, timeframe)
+        with cls._lock:
+            entry = cls._cache.get(key)
+        if entry is not None:
+            times, closes, covered_from, covered_to = entry
+            if covered_from <= from_time and to_time <= covered_to:
+                return times, closes
+            from_time, to_time = min(from_time, covered_from), max(to_time, covered_to)
+        logging.info(f"Loading index closes for {index_symbol} - {timeframe} from {from_time} to {to_time}")
+        times, closes = load_index_closes(index_symbol, timeframe, from_time, to_time)
+        return cls.put(index_symbol, timeframe, times, closes, from_time, to_time)
+
+    @classmethod
+    def put(cls, index_symbol: str, timeframe: str, times: np.ndarray, closes: np.ndarray,
+            from_time=None, to_time=None) -> IndexSeries:
+        """
+        :param from_time: start of the covered range, the first time if None
+        :param to_time: end of the covered range, the last time if None
+        """
+        times = np.asarray(times, dtype="datetime64[ns]")
+        closes = np.asarray(closes, dtype=np.float64)
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, closes = times[order], closes[order]
+        for arr in (times, closes):
+            arr.setflags(write=False)
+        covered_from = np.datetime64(times[0] if from_time is None else from_time, "ns")
+        covered_to = np.datetime64(times[-1] if to_time is None else to_time, "ns")
+        with cls._lock:
+            cls._cache[(index_symbol, timeframe)] = (times, closes, covered_from, covered_to)
+        return times, closes
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+
+def align_index_returns(times: np.ndarray, index_times: np.ndarray, index_closes: np.ndarray) -> np.ndarray:
+    """
+    Index returns on the bot's bars: the last index close at or before each bar, then bar-to-bar returns.
+    Bars before the first index close (and the first bar) get a zero return.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    pos = np.searchsorted(index_times, times, side="right") - 1
+    closes = np.where(pos >= 0, index_closes[np.maximum(pos, 0)], np.nan)
+    returns = np.zeros(len(times), dtype=np.float64)
+    if len(times) > 1:
+        np.divide(closes[1:], closes[:-1], out=returns[1:])
+        returns[1:] -= 1
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+def relative_metrics(returns: np.ndarray, index_returns: np.ndarray, periods: int) -> Dict[str, np.ndarray | float]:
+    """
+    Index-relative metrics of one return series (1D) or of many bots on the same bars (bots x bars).
+    Alpha and the information ratio are annualized with `periods` bars per year (arithmetic means).
+    :param returns: bot returns, shape (bars,) or (bots, bars)
+    :param index_returns: index returns on the same bars, shape (bars,)
+    :param periods: bars per year
+    :return: beta, alpha, correlation, tracking_error, information_ratio (floats for 1D input, arrays for 2D)
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    m = np.asarray(index_returns, dtype=np.float64)
+    single = r.ndim == 1
+    r = np.atleast_2d(r)
+    n = r.shape[1]
+
+    r_mean = r.mean(axis=1)
+    m_mean = m.mean()
+    r_dev = r - r_mean[:, None]
+    m_dev = m - m_mean
+    cov = r_dev @ m_dev / (n - 1)
+    m_var = m_dev @ m_dev / (n - 1)
+    r_var = np.einsum("ij,ij->i", r_dev, r_dev) / (n - 1)
+
+    active = r - m
+    active_mean = active.mean(axis=1)
+    active_std = active.std(axis=1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = cov / m_var
+        correlation = cov / np.sqrt(r_var * m_var)
+        information_ratio = active_mean / active_std * np.sqrt(periods)
+    alpha = (r_mean - beta * m_mean) * periods
+    tracking_error = active_std * np.sqrt(periods)
+
+    metrics = dict(
+        beta=beta,
+        alpha=alpha,
+        correlation=correlation,
+        tracking_error=tracking_error,
+        information_ratio=information_ratio,
+    )
+    if single:
+        return {name: float(values[0]) for name, values in metrics.items()}
+    return metrics
+
+
+def batch_relative_metrics(backtests: Iterable, index_symbol: str) -> List[Dict[str, float]]:
+    """
+    Index-relative metrics of many backtests. Bots with the same timeframe and bars are stacked
+    into one (bots x bars) matrix, so the index is aligned once per group.
+    The metrics are also attached to each bot's `TradePerformance`.
+    :param backtests: `BaseBacktest` instances
+    :param index_symbol: index symbol, e.g. "VNINDEX"
+    :return: metrics per backtest, in input order
+    """
+    backtests = list(backtests)
+    groups: Dict[tuple, List[int]] = {}
+    for i, bt in enumerate(backtests):
+        times = np.ascontiguousarray(bt.times, dtype="datetime64[ns]")
+        key = (bt.timeframe, bt.periods, len(times), hashlib.blake2b(times.view(np.uint8)).digest())
+        groups.setdefault(key, []).append(i)
+
+    results: List[Dict[str, float] | None] = [None] * len(backtests)
+    for (timeframe, periods, *_), members in groups.items():
+        first = backtests[members[0]]
+        times = np.asarray(first.times, dtype="datetime64[ns]")
+        index_returns = align_index_returns(times, *IndexReturnsCache.get(index_symbol, timeframe, times[0], times[-1]))
+        matrix = np.stack([np.asarray(backtests[i].returns, dtype=np.float64) for i in members])
+        metrics = relative_metrics(matrix, index_returns, periods)
+        for row, i in enumerate(members):
+            results[i] = {name: float(values[row]) for name, values in metrics.items()}
+            backtests[i].set_index_metrics(results[i])
+    return results
@@ -0,0 +1,158 @@
+"""
+Daily mark-to-market margin ledger for futures.
+
+Everything is computed over the whole history with array operations. A forced liquidation only
+changes the PnL between the breach and the strategy's next position change, so each event patches
+that window and shifts the equity of the later bars by a constant instead of rebuilding the ledger.
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from xno import settings
+
+# (bars slice, trade_sizes, positions) -> costs of those bars
+CostFunction = Callable[[slice, np.ndarray, np.ndarray], np.ndarray]
+
+
+@dataclass
+class MarginLedger:
+    positions: np.ndarray  # positions after forced liquidations
+    trade_sizes: np.ndarray  # trades, including liquidations
+    equities: np.ndarray  # mark-to-market equity
+    settled_cash: np.ndarray  # cash after the last daily settlement
+    variation_margin: np.ndarray  # cash settled at each session close
+    initial_margin: np.ndarray  # initial margin required by the open position
+    maintenance_margin: np.ndarray
+    margin_ratio: np.ndarray  # equity / initial margin, nan when flat
+    liquidations: np.ndarray  # bool, forced liquidation at this bar
+
+
+def session_ends(times: np.ndarray) -> np.ndarray:
+    """Boolean mask of the last bar of each trading day."""
+    days = np.asarray(times, dtype="datetime64[D]")
+    ends = np.ones(len(days), dtype=bool)
+    ends[:-1] = days[1:] != days[:-1]
+    return ends
+
+
+def _first_breach(slack: np.ndarray, active: np.ndarray, threshold: float, start: int, chunk: int = 4096) -> int | None:
+    """First bar >= start holding a position with slack below threshold, scanning in growing chunks."""
+    n = len(slack)
+    while start < n:
+        stop = min(n, start + chunk)
+        hits = np.flatnonzero(active[start:stop] & (slack[start:stop] < threshold))
+        if len(hits) > 0:
+            return start + int(hits[0])
+        start = stop
+        chunk *= 2
+    return None
+
+
+def simulate_margin(
+        times: np.ndarray,
+        prices: np.ndarray,
+        positions: np.ndarray,
+        init_cash: float,
+        contract_size: float,
+        costs: CostFunction,
+        initial_margin_rate: float = settings.futures_margin.initial_margin_rate,
+        maintenance_margin_ratio: float = settings.futures_margin.maintenance_margin_ratio,
+        trade_sizes: np.ndarray | None = None,
+        dtype=None,
+) -> MarginLedger:
+    """
+    Run the margin ledger over the position path of a futures bot.
+    When mark-to-market equity falls below the maintenance margin the position is closed at that bar
+    and stays flat until the strategy changes its target position again.
+    :param times: bar times
+    :param prices: prices in index points
+    :param positions: target positions (contracts) after each bar
+    :param init_cash: initial collateral
+    :param contract_size: cash value of one index point per contract
+    :param costs: transaction costs of a slice of bars given its trades and positions
+    :param initial_margin_rate: initial margin as a fraction of contract value
+    :param maintenance_margin_ratio: maintenance margin as a fraction of initial margin
+    :param trade_sizes: the strategy's trades, kept outside liquidation windows (position diffs if None)
+    :param dtype: float dtype of the ledger series, the dtype of `positions` if None
+    """
+    target = np.asarray(positions)
+    dtype = np.dtype(dtype or (target.dtype if target.dtype.kind == "f" else np.float64))
+    prices = np.asarray(prices, dtype=dtype)
+    positions = target.astype(dtype)  # copy, patched by liquidations
+    n = len(positions)
+
+    if trade_sizes is None:
+        trade_sizes = np.diff(positions, prepend=dtype.type(0))
+    else:
+        trade_sizes = np.array(trade_sizes, dtype=dtype)
+    point_pnls = np.diff(prices, prepend=prices[0])
+    point_pnls *= contract_size
+    pnls = np.empty(n, dtype=dtype)
+    pnls[0] = 0.0
+    pnls[1:] = positions[:-1] * point_pnls[1:]
+    pnls -= costs(slice(0, n), trade_sizes, positions)
+    equities = init_cash + np.cumsum(pnls)
+
+    initial_margin = np.abs(positions) * np.abs(prices) * (contract_size * initial_margin_rate)
+    maintenance_margin = initial_margin * maintenance_margin_ratio
+    slack = equities - maintenance_margin  # before liquidations
+    active = positions != 0
+    # Bars where the strategy itself changes its target position
+    target_changes = np.flatnonzero(np.diff(target, prepend=0) != 0)
+    liquidations = np.zeros(n, dtype=bool)
+
+    shift = 0.0  # equity change of bars after the last patched window
+    t = 0
+    while (i := _first_breach(slack, active, -shift, t)) is not None:
+        # Flat from the breach until the strategy's next own position change
+        k = np.searchsorted(target_changes, i, side="right")
+        j = int(target_changes[k]) if k < len(target_changes) else n
+        positions[i:j] = 0.0
+        active[i:j] = False
+        initial_margin[i:j] = 0.0
+        maintenance_margin[i:j] = 0.0
+        liquidations[i] = True
+
+        # Patch trades and PnL of bars i..j: close at i, flat until j, bar j re-enters from flat
+        last = min(j, n - 1)
+        lo = max(i - 1, 0)  # one bar of context for direction-based costs
+        window = slice(lo, last + 1)
+        trade_sizes[i] = -positions[i - 1] if i > 0 else 0.0
+        trade_sizes[i + 1:j] = 0.0
+        if j < n:
+            trade_sizes[j] = positions[j]
+        old = pnls[i:last + 1].sum()
+        prev_positions = positions[i - 1:last] if i > 0 else np.concatenate(([0.0], positions[:last]))
+        pnls[i:last + 1] = prev_positions * point_pnls[i:last + 1] \
+            - costs(window, trade_sizes[window], positions[window])[i - lo:]
+        shift += pnls[i:last + 1].sum() - old
+        t = j
+
+    equities = init_cash + np.cumsum(pnls)
+
+    ends = session_ends(times)
+    end_idx = np.flatnonzero(ends)
+    settled_at_close = equities[end_idx]
+    # Cash settled at the previous session close, carried through the next session
+    session_id = np.concatenate(([0], np.cumsum(ends[:-1])))
+    settled_cash = np.concatenate((np.array([init_cash], dtype=dtype), settled_at_close))[session_id]
+    variation_margin = np.zeros(n, dtype=dtype)
+    variation_margin[end_idx] = np.diff(settled_at_close, prepend=init_cash)
+
+    margin_ratio = np.divide(
+        equities, initial_margin,
+        out=np.full(n, np.nan, dtype=dtype), where=initial_margin > 0,
+    )
+    return MarginLedger(
+        positions=positions,
+        trade_sizes=trade_sizes,
+        equities=equities,
+        settled_cash=settled_cash,
+        variation_margin=variation_margin,
+        initial_margin=initial_margin,
+        maintenance_margin=maintenance_margin,
+        margin_ratio=margin_ratio,
+        liquidations=liquidations,
+    )
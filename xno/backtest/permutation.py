@@ -0,0 +1,164 @@
+"""
+Permutation significance test of a bot's Sharpe ratio.
+
+The null distribution is built by breaking the link between positions and price moves, then
+re-running the backtest for many paths at once with the engine's own hooks on (paths x bars) matrices:
+
+- ``"returns"``: the bar price changes are shuffled, positions and fees are kept;
+- ``"signals"``: the position path is circularly shifted by a random lag (its holding periods and
+  trade count are kept), fees are recomputed by the cost model.
+
+Permutations are split across a process pool. Prices, positions, fees and volumes are placed once in
+`multiprocessing.shared_memory` and every worker maps them without copying.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_modes = ("returns", "signals")
+SharedArray = Tuple[str, Tuple[int, ...], str]  # shared memory name, shape, dtype
+
+
+def sharpe_ratios(returns: np.ndarray, periods: int) -> np.ndarray:
+    """Annualized Sharpe ratio of each row (mean / std with ddof=1, as quantstats)."""
+    returns = np.atleast_2d(returns)
+    std = returns.std(axis=-1, ddof=1)
+    return np.divide(returns.mean(axis=-1), std, out=np.full(len(returns), np.nan), where=std > 0) * np.sqrt(periods)
+
+
+def permuted_sharpes(
+        engine,
+        prices: np.ndarray,
+        positions: np.ndarray,
+        fees: np.ndarray,
+        volumes: np.ndarray | None,
+        periods: int,
+        n_permutations: int,
+        mode: str,
+        rng: np.random.Generator,
+        max_chunk_bytes: int = 128 * 1024 ** 2,
+) -> np.ndarray:
+    """
+    Sharpe ratios of permuted backtests (matrix kernel).
+    :param engine: engine instance providing `cost_model`, `contract_multiplier`, `init_cash` and `_returns`
+        (see `BaseBacktest.kernel`)
+    :param prices: bar prices
+    :param positions: position after each bar
+    :param fees: per-bar costs of the original run (kept in "returns" mode)
+    :param volumes: market volumes for the cost model, or None
+    :param periods: bars per year
+    :param n_permutations: number of permuted paths
+    :param mode: "returns" or "signals"
+    :param rng: random generator
+    :param max_chunk_bytes: memory cap for the per-chunk matrices
+    """
+    if mode not in _modes:
+        raise ValueError(f"Unknown permutation mode {mode}, expected one of {_modes}")
+    n = len(prices)
+    price_diff = np.diff(prices)
+    chunk = max(1, int(max_chunk_bytes // (n * 8 * 4)))
+    sharpes = np.empty(n_permutations)
+    for start in range(0, n_permutations, chunk):
+        rows = min(chunk, n_permutations - start)
+        pnls = np.zeros((rows, n))
+        if mode == "returns":
+            diffs = rng.permuted(np.broadcast_to(price_diff, (rows, n - 1)), axis=1)
+            np.multiply(diffs, positions[:-1], out=pnls[:, 1:])
+            costs = fees
+        else:
+            lags = rng.integers(1, n, size=rows)
+            paths = positions[(np.arange(n) - lags[:, None]) % n]
+            np.multiply(price_diff, paths[:, :-1], out=pnls[:, 1:])
+            costs = engine.cost_model.costs(prices, np.diff(paths, axis=1, prepend=0.0), paths, volumes)
+        if engine.contract_multiplier != 1:
+            pnls *= engine.contract_multiplier
+        pnls -= costs
+        equities = np.cumsum(pnls, axis=1)
+        equities += engine.init_cash
+        sharpes[start:start + rows] = sharpe_ratios(engine._returns(pnls, equities), periods)
+    return sharpes
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Tuple[Dict[str, SharedArray], List[shared_memory.SharedMemory]]:
+    specs, blocks = {}, []
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+        specs[name] = (block.name, arr.shape, arr.dtype.str)
+        blocks.append(block)
+    return specs, blocks
+
+
+def _permutation_worker(engine, specs: Dict[str, SharedArray], periods: int, n_permutations: int, mode: str,
+                        seed: np.random.SeedSequence) -> np.ndarray:
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs.values()]
+    try:
+        arrays = {
+            key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            for (key, (_, shape, dtype)), block in zip(specs.items(), blocks)
+        }
+        return permuted_sharpes(
+            engine, arrays["prices"], arrays["positions"], arrays["fees"], arrays.get("volumes"),
+            periods, n_permutations, mode, np.random.default_rng(seed),
+        )
+    finally:
+        arrays = None  # drop the views before closing the mappings
+        for block in blocks:
+            block.close()
+
+
+def permutation_test(
+        engine,
+        prices: np.ndarray,
+        positions: np.ndarray,
+        fees: np.ndarray,
+        returns: np.ndarray,
+        periods: int,
+        volumes: np.ndarray | None = None,
+        n_permutations: int = 1000,
+        mode: str = "returns",
+        n_jobs: int | None = None,
+        seed: int | None = None,
+) -> Dict[str, float | np.ndarray]:
+    """
+    One-sided permutation test of the Sharpe ratio.
+    :param engine: engine kernel (see `permuted_sharpes`)
+    :param returns: returns of the original run, for the observed Sharpe
+    :param n_jobs: worker processes, all CPUs if None, 1 runs in the calling process
+    :param seed: random seed
+    :return: observed Sharpe, p-value = (1 + #{permuted >= observed}) / (1 + n_permutations) and the null distribution
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    fees = np.asarray(fees, dtype=np.float64)
+    observed = float(sharpe_ratios(returns, periods)[0])
+    n_jobs = min(n_jobs or os.cpu_count() or 1, n_permutations)
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    counts = [n_permutations // n_jobs + (i < n_permutations % n_jobs) for i in range(n_jobs)]
+
+    if n_jobs == 1:
+        null = permuted_sharpes(engine, prices, positions, fees, volumes, periods, n_permutations, mode,
+                                np.random.default_rng(seeds[0]))
+    else:
+        arrays = dict(prices=prices, positions=positions, fees=fees)
+        if volumes is not None:
+            arrays["volumes"] = np.asarray(volumes, dtype=np.float64)
+        specs, blocks = _share(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                parts = pool.map(
+                    _permutation_worker,
+                    [engine] * n_jobs, [specs] * n_jobs, [periods] * n_jobs, counts, [mode] * n_jobs, seeds,
+                )
+                null = np.concatenate(list(parts))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    exceed = int(np.count_nonzero(null >= observed))
+    return dict(sharpe=observed, pvalue=(1 + exceed) / (1 + n_permutations), null=null)
@@ -0,0 +1,215 @@
+"""
+Parquet sink for backtest results, queried locally with DuckDB.
+
+Layout under the store root (Hive partitions, one file per bot and partition)::
+
+    summaries/bt_mode=<mode>/engine=<engine>/<bot_id>.parquet   one row per bot
+    series/bt_mode=<mode>/engine=<engine>/<bot_id>.parquet      one row per bar, one row group per month
+
+Series rows carry a `date` column; time filters skip row groups by their min/max statistics, so a
+bot's history stays in one file however many days it spans. Writing a bot again atomically replaces
+its files in its bt_mode/engine partition (series first, then summary), so re-runs do not duplicate rows.
+Example::
+
+    store = ResultsStore()
+    store.write(bt.summarize(), engine=TypeEngine.TABot)
+    store.query("SELECT bot_id, sharpe FROM summaries WHERE sharpe > 1 AND timeframe = '5min'")
+"""
+import glob
+import logging
+import os
+import uuid
+from dataclasses import fields
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, get_args, get_origin
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from xno import settings
+from xno.models import BotTradeSummary, BotBacktestResultSummary, TradeAnalysis, TradePerformance, TypeEngine
+
+_tables = ("summaries", "series")
+
+
+def _metric_columns(cls) -> List[tuple]:
+    """
+    (column, field, type, item) of the metrics of a dataclass. [lower, upper] intervals become two
+    columns reading item 0 and 1, scalars have item None.
+    """
+    columns = []
+    for f in fields(cls):
+        args = get_args(f.type) or (f.type,)  # `int | None` -> (int, NoneType), plain `int` -> (int,)
+        if any(get_origin(arg) is list for arg in args):
+            columns += [(f"{f.name}_lower", f.name, float, 0), (f"{f.name}_upper", f.name, float, 1)]
+        else:
+            columns.append((f.name, f.name, int if int in args else float, None))
+    return columns
+
+
+_analysis_columns = _metric_columns(TradeAnalysis)
+_performance_columns = _metric_columns(TradePerformance)
+
+
+class ResultsStore:
+    """
+    Backtest summaries and per-bar series as partitioned Parquet files.
+    :param root: store directory, `settings.results_store_path` if None
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = root or settings.results_store_path
+
+    @staticmethod
+    def _file_name(bot_id: str) -> str:
+        return f"{quote(str(bot_id), safe='')}.parquet"
+
+    def _partition(self, table: str, bt_mode, engine) -> str:
+        return os.path.join(self.root, table, f"bt_mode={bt_mode}", f"engine={engine}")
+
+    @staticmethod
+    def _write_table(table, path: str, row_groups: Iterable[tuple] | None = None):
+        """
+        Write `table` to `path` atomically (temporary file + rename, readers never see a partial file).
+        :param row_groups: (offset, length) slices written as separate row groups, the whole table if None
+        """
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with pq.ParquetWriter(tmp, table.schema) as writer:
+            for offset, length in row_groups or [(0, table.num_rows)]:
+                writer.write_table(table.slice(offset, length), row_group_size=max(length, 1))
+        os.replace(tmp, path)
+
+    def _summary_row(self, summary: BotTradeSummary) -> Dict[str, Any]:
+        row = dict(
+            bot_id=summary.bot_id,
+            symbol=summary.symbol,
+            timeframe=summary.timeframe,
+            from_time=pd.Timestamp(summary.from_time),
+            to_time=pd.Timestamp(summary.to_time),
+            init_cash=float(summary.init_cash),
+            total_candles=int(summary.total_candles),
+            written_at=pd.Timestamp(datetime.now(timezone.utc)).tz_localize(None),
+        )
+        for metrics, columns in ((summary.analysis, _analysis_columns), (summary.performance, _performance_columns)):
+            for column, name, kind, item in columns:
+                value = getattr(metrics, name, None)
+                if value is not None and item is not None:
+                    value = value[item]
+                row[column] = None if value is None else kind(value)
+        return row
+
+    def _summary_table(self, summary: BotTradeSummary):
+        import pyarrow as pa
+
+        row = self._summary_row(summary)
+        types = dict(bot_id=pa.string(), symbol=pa.string(), timeframe=pa.string(), from_time=pa.timestamp("ns"),
+                     to_time=pa.timestamp("ns"), init_cash=pa.float64(), total_candles=pa.int64(),
+                     written_at=pa.timestamp("ns"))
+        for column, _, kind, _ in _analysis_columns + _performance_columns:
+            types[column] = pa.int64() if kind is int else pa.float64()
+        return pa.table({column: pa.array([value], type=types[column]) for column, value in row.items()})
+
+    def _series_table(self, summary: BotTradeSummary):
+        import pyarrow as pa
+
+        times = pd.to_datetime(np.asarray(summary.candles)).values.astype("datetime64[ns]")
+        columns = dict(
+            bot_id=pa.array(np.full(len(times), summary.bot_id, dtype=object), type=pa.string()),
+            date=pa.array(times.astype("datetime64[D]"), type=pa.date32()),
+            time=pa.array(times),
+        )
+        for name, series in summary.series.items():
+            columns[name] = pa.array(np.asarray(series.values, dtype=np.float64))
+        return times, pa.table(columns)
+
+    def write(self, summary: BotTradeSummary, engine: TypeEngine | str = TypeEngine.Default):
+        """
+        Write (or replace) a bot's summary row and series.
+        :param summary: backtest summary
+        :param engine: bot engine, the second partition level
+        """
+        file_name = self._file_name(summary.bot_id)
+
+        times, table = self._series_table(summary)
+        # Bars are time-ordered: each month is a contiguous slice, written as one row group
+        months = times.astype("datetime64[M]")
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(times) else np.array([0])
+        stops = np.r_[starts[1:], len(times)]
+        path = os.path.join(self._partition("series", summary.bt_mode, engine), file_name)
+        self._write_table(table, path, zip(starts.tolist(), (stops - starts).tolist()))
+
+        path = os.path.join(self._partition("summaries", summary.bt_mode, engine), file_name)
+        self._write_table(self._summary_table(summary), path)
+        logging.debug(f"Stored results of bot_id={summary.bot_id} ({len(times)} bars, {len(starts)} row groups)")
+
+    def write_periods(self, result: BotBacktestResultSummary, engine: TypeEngine | str = TypeEngine.Default):
+        """Write the train/test/simulate/live summaries of `BaseRunner.backtest_periods` (empty periods skipped)."""
+        for summary in (result.train, result.test, result.simulate, result.live):
+            if isinstance(summary, BotTradeSummary):
+                self.write(summary, engine)
+
+    def write_many(self, summaries: Iterable[BotTradeSummary], engine: TypeEngine | str = TypeEngine.Default):
+        for summary in summaries:
+            self.write(summary, engine)
+
+    def connect(self):
+        """
+        DuckDB in-memory connection with the `summaries` and `series` views over the store
+        (a view is only created once the table has files).
+        """
+        import duckdb
+
+        conn = duckdb.connect()
+        for table in _tables:
+            if not glob.glob(os.path.join(glob.escape(os.path.join(self.root, table)), "*", "*", "*.parquet")):
+                continue
+            pattern = os.path.join(self.root, table, "*", "*", "*.parquet").replace("'", "''")
+            conn.execute(f"CREATE VIEW {table} AS SELECT * FROM "
+                         f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)")
+        return conn
+
+    def query(self, sql: str, params: Iterable[Any] | None = None) -> pd.DataFrame:
+        """
+        Run SQL over the `summaries` and `series` views.
+        Filters on bt_mode and engine prune partitions without reading the other files, filters on
+        series date/time skip row groups.
+        """
+        conn = self.connect()
+        try:
+            result = conn.execute(sql, params) if params else conn.execute(sql)
+            return result.df()
+        finally:
+            conn.close()
+
+    def read_series(
+            self,
+            bot_id: str,
+            bt_mode=None,
+            engine: TypeEngine | str | None = None,
+            start=None,
+            end=None,
+    ) -> pd.DataFrame:
+        """
+        Per-bar series of one bot, indexed by time.
+        :param start: first bar time (inclusive), or None
+        :param end: last bar time (inclusive), or None
+        """
+        conditions, params = ["bot_id = ?"], [str(bot_id)]
+        for column, value in (("bt_mode", bt_mode), ("engine", engine)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(str(value))
+        if start is not None:
+            conditions += ["date >= ?", "time >= ?"]
+            start = pd.Timestamp(start)
+            params += [start.date(), start.to_pydatetime()]
+        if end is not None:
+            conditions += ["date <= ?", "time <= ?"]
+            end = pd.Timestamp(end)
+            params += [end.date(), end.to_pydatetime()]
+        df = self.query(f"SELECT * FROM series WHERE {' AND '.join(conditions)} ORDER BY time", params)
+        return df.drop(columns=["date"]).set_index("time")
@@ -0,0 +1,332 @@
+"""
+Out-of-core backtest for histories that do not fit in memory.
+
+`StreamingBacktest` consumes (times, prices, positions, trade_sizes[, volumes]) chunk by chunk,
+carries the state needed across chunk boundaries (last bar, equity, compounded wealth, benchmark,
+drawdown peak and metric accumulators), optionally appends the per-bar series to a Parquet file
+and keeps only O(chunk) arrays in memory. The per-bar math is the engine's own (cost model,
+`_returns`, `_build_benchmark`), so results match `BaseBacktest` up to floating-point summation order.
+
+Metrics that need the whole return distribution (VaR, CVaR, tail ratio, omega, gain to pain) are not
+computed and stay None; CAGR uses the bar count (n / periods years) like quantstats.
+"""
+import logging
+from typing import Dict, Iterable, Iterator, Mapping, Type
+
+import numpy as np
+import pandas as pd
+
+from xno.backtest.common import BaseBacktest, get_minutes, minute_bar_per_day
+from xno.backtest.costs import CostModel
+from xno.models import TradeAnalysis, TradePerformance, BotTradeSummary, TypeTradeMode
+
+_input_columns = ("times", "prices", "positions", "trade_sizes")
+
+
+def iter_parquet_chunks(
+        path: str,
+        batch_size: int = 1_000_000,
+        columns: Mapping[str, str] | None = None,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Read backtest inputs from a Parquet file in batches.
+    :param path: Parquet file
+    :param batch_size: rows per chunk
+    :param columns: input name (times, prices, positions, trade_sizes, volumes) -> column name in the file
+    """
+    import pyarrow.parquet as pq
+
+    columns = dict(columns or {})
+    parquet = pq.ParquetFile(path)
+    available = set(parquet.schema_arrow.names)
+    names = {name: columns.get(name, name) for name in _input_columns + ("volumes",)}
+    names = {name: column for name, column in names.items() if column in available}
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=list(names.values())):
+        yield {name: batch.column(column).to_numpy(zero_copy_only=False) for name, column in names.items()}
+
+
+class StreamingBacktest:
+    """
+    Chunked backtest with bounded memory.
+
+    Usage::
+
+        bt = StreamingBacktest(BacktestVnFutures, bot_id="bot", timeframe="1min", book_size=1e9,
+                               series_path="/data/bot-series.parquet")
+        summary = bt.run(iter_parquet_chunks("/data/bot-input.parquet"))
+
+    Chunks are mappings (dict or DataFrame) with times, prices, positions, trade_sizes and
+    optionally volumes, in time order. Futures margin simulation is not supported.
+    """
+
+    def __init__(
+            self,
+            bt_cls: Type[BaseBacktest],
+            bot_id: str,
+            timeframe: str,
+            book_size: float,
+            symbol: str | None = None,
+            bt_mode: TypeTradeMode = TypeTradeMode.Train,
+            cost_model: CostModel | None = None,
+            series_path: str | None = None,
+    ):
+        """
+        :param bt_cls: engine class, e.g. BacktestVnStocks
+        :param bot_id: bot id
+        :param timeframe: bar timeframe
+        :param book_size: initial cash
+        :param symbol: traded symbol
+        :param bt_mode: trade mode reported in the summary
+        :param cost_model: transaction cost model, the engine's default if None
+        :param series_path: Parquet file receiving the per-bar series, nothing is written if None
+        """
+        self.engine = bt_cls.kernel(book_size, cost_model)
+        self.bot_id = bot_id
+        self.timeframe = timeframe
+        self.symbol = symbol
+        self.bt_mode = TypeTradeMode(bt_mode)
+        self.init_cash = book_size
+        self.periods = int(minute_bar_per_day / get_minutes(timeframe) * 250)
+        self.series_path = series_path
+        self._writer = None
+        # Carried state
+        self.n = 0
+        self.from_time = None
+        self.to_time = None
+        self.first_price = None
+        self.last_price = None
+        self.last_position = 0.0
+        self.last_pnl = 0.0
+        self.start_value = None
+        self.equity = float(book_size)
+        self.wealth = 1.0  # 1 + cumulative return
+        self.peak = 1.0
+        self.bm_equity = None
+        self.bm_wealth = 1.0
+        # Accumulators
+        self.total_fee = 0.0
+        self.total_trades = 0
+        self.total_closed_trades = 0
+        self.sum_ret = 0.0
+        self.mean_ret = 0.0
+        self.m2_ret = 0.0  # sum of squared deviations, merged across chunks (Chan et al.)
+        self.sum_down_sq = 0.0
+        self.win_count = 0
+        self.win_sum = 0.0
+        self.loss_count = 0
+        self.loss_sum = 0.0
+        self.best = -np.inf
+        self.worst = np.inf
+        self.max_drawdown = 0.0
+        self.sum_sq_drawdown = 0.0
+
+    @staticmethod
+    def _columns(chunk) -> Dict[str, np.ndarray]:
+        if isinstance(chunk, pd.DataFrame) and "times" not in chunk.columns:
+            chunk = chunk.assign(times=chunk.index)
+        cols = {name: np.asarray(chunk[name], dtype=np.float64) for name in _input_columns[1:]}
+        cols["times"] = np.asarray(chunk["times"], dtype="datetime64[ns]")
+        volumes = chunk.get("volumes") if hasattr(chunk, "get") else None
+        cols["volumes"] = None if volumes is None else np.asarray(volumes, dtype=np.float64)
+        return cols
+
+    def process(self, chunk) -> Dict[str, np.ndarray]:
+        """
+        Backtest one chunk, update the carried state and write its series.
+        :return: the chunk's per-bar series
+        """
+        cols = self._columns(chunk)
+        times, prices, positions, trade_sizes = (cols[name] for name in _input_columns)
+        m = len(times)
+        if not (m == len(prices) == len(positions) == len(trade_sizes)):
+            raise ValueError("times, prices, positions, and trade_sizes must have the same length.")
+        if m == 0:
+            return {}
+        engine = self.engine
+        k = 1 if self.n > 0 else 0  # the previous chunk's last bar is prepended as a carry bar
+
+        if k:
+            ext_prices = np.concatenate([[self.last_price], prices])
+            ext_positions = np.concatenate([[self.last_position], positions])
+            ext_trades = np.concatenate([[0.0], trade_sizes])
+            ext_volumes = None if cols["volumes"] is None else np.concatenate([[0.0], cols["volumes"]])
+        else:
+            ext_prices, ext_positions, ext_trades, ext_volumes = prices, positions, trade_sizes, cols["volumes"]
+            self.first_price = float(prices[0])
+            self.from_time = times[0]
+
+        fees = engine.cost_model.costs(ext_prices, ext_trades, ext_positions, ext_volumes)[k:]
+        pnls = np.zeros(m)
+        np.multiply(np.diff(ext_prices), ext_positions[:-1], out=pnls[1 - k:])
+        if engine.contract_multiplier != 1:
+            pnls *= engine.contract_multiplier
+        pnls -= fees
+        equities = np.cumsum(pnls)
+        equities += self.equity
+
+        if k:
+            returns = engine._returns(np.concatenate([[0.0], pnls]), np.concatenate([[self.equity], equities]))[1:]
+            bm = engine._build_benchmark(np.concatenate([[self.first_price, self.last_price], prices]))
+            bm_equities, bm_returns, _, bm_pnls = (s[2:] for s in bm)
+        else:
+            returns = engine._returns(pnls, equities)
+            bm_equities, bm_returns, _, bm_pnls = engine._build_benchmark(prices)
+            self.start_value = float(equities[0])
+        wealth = np.cumprod(1 + returns) * self.wealth
+        bm_cumrets = np.cumprod(1 + bm_returns) * self.bm_wealth - 1
+
+        # Drawdown of the compounded wealth, against the peak carried from previous chunks
+        peaks = np.maximum.accumulate(np.maximum(wealth, self.peak))
+        drawdowns = wealth / peaks - 1
+
+        signs = np.sign(positions)
+        prev_signs = np.concatenate([[np.sign(self.last_position)], signs[:-1]])
+        self.total_closed_trades += int(np.count_nonzero((prev_signs != 0) & (prev_signs != signs)))
+        self.total_trades += int(np.count_nonzero(trade_sizes))
+        self.total_fee += float(np.sum(fees))
+
+        wins = returns[returns > 0]
+        losses = returns[returns < 0]
+        chunk_mean = float(np.mean(returns))
+        delta = chunk_mean - self.mean_ret
+        self.m2_ret += float(np.dot(returns - chunk_mean, returns - chunk_mean)) + delta ** 2 * self.n * m / (self.n + m)
+        self.mean_ret += delta * m / (self.n + m)
+        self.sum_ret += float(np.sum(returns))
+        self.sum_down_sq += float(np.dot(losses, losses))
+        self.win_count += len(wins)
+        self.win_sum += float(np.sum(wins))
+        self.loss_count += len(losses)
+        self.loss_sum += float(np.sum(losses))
+        self.best = max(self.best, float(np.max(returns)))
+        self.worst = min(self.worst, float(np.min(returns)))
+        self.max_drawdown = min(self.max_drawdown, float(np.min(drawdowns)))
+        self.sum_sq_drawdown += float(np.dot(drawdowns, drawdowns))
+
+        self.n += m
+        self.to_time = times[-1]
+        self.last_price = float(prices[-1])
+        self.last_position = float(positions[-1])
+        self.last_pnl = float(pnls[-1])
+        self.equity = float(equities[-1])
+        self.wealth = float(wealth[-1])
+        self.peak = float(peaks[-1])
+        self.bm_equity = float(bm_equities[-1])
+        self.bm_wealth = float(bm_cumrets[-1]) + 1
+
+        series = dict(
+            times=times,
+            prices=prices,
+            positions=positions,
+            trade_sizes=trade_sizes,
+            fees=fees,
+            pnls=pnls,
+            equities=equities,
+            exposures=positions * prices * engine.contract_multiplier,
+            returns=returns,
+            cumrets=wealth - 1,
+            bm_equities=bm_equities,
+            bm_returns=bm_returns,
+            bm_cumrets=bm_cumrets,
+            bm_pnls=bm_pnls,
+        )
+        if self.series_path is not None:
+            self._write(series)
+        return series
+
+    def _write(self, series: Dict[str, np.ndarray]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(series)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.series_path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Finish the series file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def run(self, chunks: Iterable) -> BotTradeSummary:
+        """Process all chunks, close the series file and summarize."""
+        try:
+            for i, chunk in enumerate(chunks):
+                self.process(chunk)
+                logging.debug(f"Streaming backtest bot_id={self.bot_id}: chunk {i}, {self.n} bars")
+        finally:
+            self.close()
+        return self.summarize()
+
+    def get_analysis(self) -> TradeAnalysis:
+        return TradeAnalysis(
+            start_value=self.start_value,
+            end_value=self.equity,
+            total_return=(self.equity - self.start_value) / self.start_value,
+            benchmark_return=self.bm_wealth - 1,
+            total_fee=self.total_fee,
+            total_trades=self.total_trades,
+            total_closed_trades=self.total_closed_trades,
+            total_open_trades=int(self.last_position != 0),
+            open_trade_pnl=self.last_pnl,
+            best_trade=self.best,
+            worst_trade=self.worst,
+            avg_win_trade=self.win_sum / self.win_count if self.win_count else 0.0,
+            avg_loss_trade=self.loss_sum / self.loss_count if self.loss_count else 0.0,
+            avg_win_trade_duration=None,
+            avg_loss_trade_duration=None,
+        )
+
+    def get_performance(self) -> TradePerformance:
+        n = self.n
+        mean = self.mean_ret
+        std = np.sqrt(self.m2_ret / (n - 1)) if n > 1 else np.nan
+        downside = np.sqrt(self.sum_down_sq / n)
+        nonzero = self.win_count + self.loss_count
+        avg_win = self.win_sum / self.win_count if self.win_count else np.nan
+        avg_loss = self.loss_sum / self.loss_count if self.loss_count else np.nan
+        win_rate = self.win_count / nonzero if nonzero else np.nan
+        win_loss_ratio = avg_win / abs(avg_loss) if self.loss_count else np.nan
+        max_dd = self.max_drawdown
+        annual_return = self.wealth ** (self.periods / n) - 1 if self.wealth > 0 else np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return TradePerformance(
+                avg_return=(self.win_sum + self.loss_sum) / nonzero if nonzero else np.nan,
+                cumulative_return=self.wealth - 1,
+                cvar=None,
+                gain_to_pain_ratio=None,
+                kelly_criterion=win_rate - (1 - win_rate) / win_loss_ratio,
+                max_drawdown=max_dd,
+                omega=None,
+                profit_factor=self.win_sum / abs(self.loss_sum) if self.loss_sum else np.nan,
+                recovery_factor=abs(self.sum_ret) / abs(max_dd) if max_dd else np.nan,
+                sharpe=mean / std * np.sqrt(self.periods),
+                sortino=mean / downside * np.sqrt(self.periods) if downside else np.nan,
+                tail_ratio=None,
+                ulcer_index=np.sqrt(self.sum_sq_drawdown / (n - 1)) if n > 1 else np.nan,
+                var=None,
+                volatility=std * np.sqrt(self.periods),
+                win_loss_ratio=win_loss_ratio,
+                win_rate=win_rate,
+                annual_return=annual_return,
+                calmar=annual_return / abs(max_dd) if max_dd else np.nan,
+            )
+
+    def summarize(self) -> BotTradeSummary:
+        """Summary without in-memory series (they are in `series_path`)."""
+        if self.n == 0:
+            raise ValueError("No bars processed.")
+        return BotTradeSummary(
+            bot_id=self.bot_id,
+            symbol=self.symbol,
+            timeframe=self.timeframe,
+            total_candles=self.n,
+            candles=[],
+            init_cash=self.init_cash,
+            from_time=self.from_time,
+            to_time=self.to_time,
+            analysis=self.get_analysis(),
+            performance=self.get_performance(),
+            series={},
+            bt_mode=self.bt_mode,
+        )
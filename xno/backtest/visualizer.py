@@ -1,8 +1,45 @@
 from typing import Dict
 import logging
+
+import numpy as np
+import pandas as pd
+
 from xno.models import BotTradeSummary
 
 
+def minmax_downsample(values: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Shape-preserving downsampling (first/min/max/last per bucket, a.k.a. M4).
+    With one bucket per horizontal pixel the rendered line is visually identical to the full series.
+    :param values: 1-D series values
+    :param n_buckets: number of buckets, usually the plot width in pixels
+    :return: sorted indices of the points to keep
+    """
+    n = len(values)
+    if n_buckets <= 0 or n <= 4 * n_buckets:
+        return np.arange(n)
+
+    bucket_size = -(-n // n_buckets)  # ceil
+    n_rows = -(-n // bucket_size)
+    padded = np.full(n_rows * bucket_size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_rows, bucket_size)
+    nan_mask = np.isnan(padded)
+
+    starts = np.arange(n_rows) * bucket_size
+    idx_min = np.argmin(np.where(nan_mask, np.inf, padded), axis=1)
+    idx_max = np.argmax(np.where(nan_mask, -np.inf, padded), axis=1)
+    idx_last = np.minimum(bucket_size - 1, n - 1 - starts)
+
+    keep = np.concatenate([starts, starts + idx_min, starts + idx_max, starts + idx_last])
+    return np.unique(keep)
+
+
+def _downsampled(series: pd.Series, n_buckets: int) -> pd.Series:
+    idx = minmax_downsample(series.to_numpy(dtype=np.float64, na_value=np.nan), n_buckets)
+    return series.iloc[idx]
+
+
 class StrategyVisualizer:
     def __init__(self, runner, name: str = None):
         """
@@ -41,11 +78,21 @@ class StrategyVisualizer:
             'Win/Loss Ratio': self.performance.win_loss_ratio,
         }
 
-    def visualize(self):
+    def visualize(self, width: int = 1600):
+        """
+        Plot strategy vs benchmark and price with buy/sell markers.
+        Line series are downsampled to the plot width (min/max buckets) and rendered with WebGL,
+        buy/sell markers are always drawn at their exact bars.
+        :param width: approximate figure width in pixels, used to pick the downsampling resolution
+        """
         if len(self.summary.candles) == 0:
             logging.warning("No backtest data available to visualize.")
             return
         df = self.summary.get_dataframe()
+        n_buckets = int(width * 0.8)  # the xy column takes 80% of the figure
+        cumrets = _downsampled(df['cumrets'], n_buckets)
+        bm_cumrets = _downsampled(df['bm_cumrets'], n_buckets)
+        prices = _downsampled(df['prices'], n_buckets)
 
         performance = self.performance_summary()
         metric_names = list(sorted(performance.keys()))
@@ -67,19 +114,19 @@ class StrategyVisualizer:
         )
 
         # === Row 1: Strategy vs Benchmark ===
-        fig.add_trace(go.Scatter(
-            x=df.index, y=df['cumrets'], mode='lines', name='Strategy',
+        fig.add_trace(go.Scattergl(
+            x=cumrets.index, y=cumrets.values, mode='lines', name='Strategy',
             line=dict(color='blue')
         ), row=1, col=1)
 
-        fig.add_trace(go.Scatter(
-            x=df.index, y=df['bm_cumrets'], mode='lines', name='Benchmark',
+        fig.add_trace(go.Scattergl(
+            x=bm_cumrets.index, y=bm_cumrets.values, mode='lines', name='Benchmark',
             line=dict(color='gray', dash='dot')
         ), row=1, col=1)
 
         # === Row 2: Price with Buy/Sell signals ===
-        fig.add_trace(go.Scatter(
-            x=df.index, y=df['prices'], mode='lines', name='Price',
+        fig.add_trace(go.Scattergl(
+            x=prices.index, y=prices.values, mode='lines', name='Price',
             line=dict(color='black')
         ), row=2, col=1)
 
@@ -91,7 +138,7 @@ class StrategyVisualizer:
         buy_df['amount_str'] = buy_df['trade_sizes'].astype(float).apply(lambda x: f"{x:.2f}")
         buy_df['fee_str'] = buy_df['fees'].astype(float).apply(lambda x: f"{x:.2f}")
         buy_df['price_str'] = buy_df['prices'].astype(float).apply(lambda x: f"{x:.2f}")
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=buy_df.index, y=buy_df['prices'], mode='markers', name='Buy',
             marker=dict(symbol='triangle-up', color='green', size=10),
             hovertemplate="Buy [%{customdata[0]}]<br>"
@@ -112,7 +159,7 @@ class StrategyVisualizer:
         sell_df['amount_str'] = sell_df['trade_sizes'].astype(float).apply(lambda x: f"{x:.2f}")
         sell_df['fee_str'] = sell_df['fees'].astype(float).apply(lambda x: f"{x:.2f}")
         sell_df['price_str'] = sell_df['prices'].astype(float).apply(lambda x: f"{x:.2f}")
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=sell_df.index, y=sell_df['prices'], mode='markers', name='Sell',
             marker=dict(symbol='triangle-down', color='red', size=10),
             hovertemplate="Sell [%{customdata[0]}]<br>"
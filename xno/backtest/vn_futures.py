@@ -1,5 +1,11 @@
-from xno.backtest.common import BaseBacktest, safe_divide, compound_returns
+from xno import settings
+from xno.backtest.common import BaseBacktest, BenchmarkSeries, safe_divide, compound_returns
 from xno.models import BotBacktestResult
+from xno.backtest.costs import CostModel, PerContractFee
+from xno.backtest.margin import MarginLedger, session_ends, simulate_margin
+from xno.models import BacktestInput, TypeAction
+from dataclasses import fields
+from typing import Dict
 import numpy as np
 
 from xno.utils.stock import round_to_lot
@@ -10,30 +16,46 @@ class BacktestVnFutures(BaseBacktest):
     # Const
     cash_per_contract = 100_000
     price_per_contract = 25_000_000
-    fee_rate = 20_000
+    contract_multiplier = cash_per_contract
+    fee_rate = settings.trading_fee.fixed_derivative_fee
+    margin_enabled = False
+
+    def __init__(
+            self,
+            inp: BacktestInput,
+            cost_model: CostModel | None = None,
+            margin: bool | None = None,
+            lean: bool | None = None,
+            dtype=None,
+    ):
+        """
+        :param inp: backtest input
+        :param cost_model: transaction cost model
+        :param margin: simulate daily mark-to-market margin with forced liquidations
+            (defaults to the class-level `margin_enabled`)
+        :param lean: memory-lean mode (see `BaseBacktest`)
+        :param dtype: float dtype of the series in lean mode
+        """
+        self.margin_enabled = self.margin_enabled if margin is None else margin
+        self.margin_ledger: MarginLedger | None = None
+        super().__init__(inp, cost_model=cost_model, lean=lean, dtype=dtype)
 
     def __build__(self) -> BotBacktestResult:
         if not (len(self.times) == len(self.prices) == len(self.positions) == len(self.trade_sizes)):
             raise ValueError("times, prices, positions, and trade_sizes must have the same length.")
 
-        self.prices = np.asarray(self.prices, dtype=np.float64)
-        self.positions = np.asarray(self.positions, dtype=np.float64)
-        self.trade_sizes = np.asarray(self.trade_sizes, dtype=np.float64)
-
-        # positions = positions - trade_sizes
-        positions_prev = np.roll(self.positions, 1)  # Use previous positions for PnL calculation
-        positions_prev[0] = 0  # assume no position before first bar
-
-        self.fees = np.abs(self.trade_sizes) * self.fee_rate
-        price_diff = np.diff(self.prices, prepend=self.prices[0])
-        self.pnls = positions_prev * price_diff * self.cash_per_contract - self.fees
+        self.prices = self._as_series(self.prices)
+        self.positions = self._as_series(self.positions)
+        self.trade_sizes = self._as_series(self.trade_sizes)
+        if self.margin_enabled:
+            self.__apply_margin__()
 
-        pnl_cum = np.cumsum(self.pnls)
-        # fees_cum = np.cumsum(fees)
-        self.equities = self.init_cash + pnl_cum
+        # PnL uses the previous bar's position, no position before the first bar
+        self.fees = self.get_fees()
+        self.pnls = self._build_pnls(self.cash_per_contract)
+        self.equities = self._build_equities()
 
-        self.returns = np.zeros_like(self.equities)
-        self.returns[1:] = safe_divide(self.equities[1:] - self.equities[:-1], self.equities[:-1])
+        self.returns = self._returns(self.pnls, self.equities)
 
         self.cum_rets = compound_returns(self.returns)
         # returns = pd.Series(returns, index=pd.to_datetime(times))
@@ -46,13 +68,7 @@ class BacktestVnFutures(BaseBacktest):
         # bm_cumret = _compound_returns(bm_returns)
         # Benchmark: mua và giữ, trừ phí giao dịch ban đầu
 
-        max_contracts = round_to_lot(self.init_cash / self.price_per_contract, 1)
-        initial_fee = max_contracts * self.fee_rate  # Phí mua ban đầu
-        self.bm_pnls = price_diff * max_contracts * self.cash_per_contract
-        self.bm_equities = self.init_cash + np.cumsum(self.bm_pnls) - initial_fee  # Trừ phí ban đầu
-        self.bm_returns = np.zeros_like(self.bm_equities)
-        self.bm_returns[1:] = safe_divide(self.bm_equities[1:] - self.bm_equities[:-1], self.bm_equities[:-1])
-        self.bm_cumrets = compound_returns(self.bm_returns)
+        self.bm_equities, self.bm_returns, self.bm_cumrets, self.bm_pnls = self.get_benchmark()
 
         return BotBacktestResult(
             times=self.times,
@@ -69,3 +85,87 @@ class BacktestVnFutures(BaseBacktest):
             bm_cumret=self.bm_cumrets,
             bm_pnl=self.bm_pnls
         )
+
+    def __apply_margin__(self):
+        """Replace the position path with the margin-adjusted one (forced liquidations included)."""
+        self.margin_ledger = simulate_margin(
+            times=self.times,
+            prices=self.prices,
+            positions=self.positions,
+            trade_sizes=self.trade_sizes,
+            dtype=self.dtype,
+            init_cash=self.init_cash,
+            contract_size=self.cash_per_contract,
+            costs=lambda bars, trade_sizes, positions: self.cost_model.costs(
+                self.prices[bars], trade_sizes, positions, None if self.volumes is None else self.volumes[bars]
+            ),
+        )
+        self.positions = self.margin_ledger.positions
+        self.trade_sizes = self.margin_ledger.trade_sizes
+        liquidated = np.flatnonzero(self.margin_ledger.liquidations)
+        if len(liquidated) > 0:
+            self.actions = list(self.actions)
+            for i in liquidated:
+                self.actions[i] = TypeAction.Sell if self.trade_sizes[i] < 0 else TypeAction.Buy
+
+    def _extra_series(self) -> Dict[str, np.ndarray]:
+        if self.margin_ledger is None:
+            return {}
+        return {
+            "settled_cash": self.margin_ledger.settled_cash,
+            "variation_margin": self.margin_ledger.variation_margin,
+            "initial_margin": self.margin_ledger.initial_margin,
+            "maintenance_margin": self.margin_ledger.maintenance_margin,
+            "margin_ratio": self.margin_ledger.margin_ratio,
+            "liquidations": self.margin_ledger.liquidations,
+        }
+
+    def default_cost_model(self) -> CostModel:
+        return PerContractFee(self.fee_rate)
+
+    def _returns(self, pnls: np.ndarray, equities: np.ndarray) -> np.ndarray:
+        returns = np.zeros_like(equities)
+        # also (paths x bars) matrices
+        returns[..., 1:] = safe_divide(equities[..., 1:] - equities[..., :-1], equities[..., :-1])
+        return returns
+
+    def period(self, start: int, stop: int) -> "BacktestVnFutures":
+        """
+        See `BaseBacktest.period`. The margin ledger is sliced and its cash columns are rebased like
+        the equity curve: the period starts with `init_cash` settled, later sessions settle the rebased equity.
+        """
+        bt = super().period(start, stop)
+        if self.margin_ledger is not None:
+            ledger = MarginLedger(**{
+                f.name: getattr(self.margin_ledger, f.name)[start:stop] for f in fields(MarginLedger)
+            })
+            offset = self.equities[start] - bt.equities[0]
+            ledger.equities = ledger.equities - offset
+            # Bars up to the first session close in the period were settled at the period start
+            ends = np.flatnonzero(session_ends(bt.times))
+            first_end = int(ends[0]) if len(ends) > 0 else len(bt.times) - 1
+            ledger.settled_cash = ledger.settled_cash - offset
+            ledger.settled_cash[:first_end + 1] = self.init_cash
+            ledger.variation_margin = ledger.variation_margin.copy()
+            if len(ends) > 0:
+                ledger.variation_margin[first_end] = ledger.equities[first_end] - self.init_cash
+            ledger.margin_ratio = np.divide(
+                ledger.equities, ledger.initial_margin,
+                out=np.full(len(ledger.equities), np.nan), where=ledger.initial_margin > 0,
+            )
+            bt.margin_ledger = ledger
+        return bt
+
+    def _benchmark_params(self) -> tuple:
+        return self.fee_rate, self.price_per_contract, self.cash_per_contract
+
+    def _build_benchmark(self, prices: np.ndarray) -> BenchmarkSeries:
+        price_diff = np.diff(prices, prepend=prices[0])
+        max_contracts = round_to_lot(self.init_cash / self.price_per_contract, 1)
+        initial_fee = max_contracts * self.fee_rate  # Phí mua ban đầu
+        bm_pnls = price_diff * max_contracts * self.cash_per_contract
+        bm_equities = self.init_cash + np.cumsum(bm_pnls) - initial_fee  # Trừ phí ban đầu
+        bm_returns = np.zeros_like(bm_equities)
+        bm_returns[1:] = safe_divide(bm_equities[1:] - bm_equities[:-1], bm_equities[:-1])
+        bm_cumrets = compound_returns(bm_returns)
+        return bm_equities, bm_returns, bm_cumrets, bm_pnls
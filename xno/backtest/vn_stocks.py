@@ -1,5 +1,7 @@
-from xno.backtest.common import BaseBacktest, safe_divide, compound_returns
+from xno import settings
+from xno.backtest.common import BaseBacktest, BenchmarkSeries, safe_divide, compound_returns
 from xno.models.result import BotBacktestResult
+from xno.backtest.costs import CostModel, PercentFee
 import numpy as np
 
 from xno.utils.stock import round_to_lot
@@ -23,30 +25,21 @@ df = pd.DataFrame(
 """
 
 class BacktestVnStocks(BaseBacktest):
-    fee_rate = 0.0015  # 0.15
+    fee_rate = settings.trading_fee.percent_stock_fee  # 0.15%
 
     def __build__(self) -> BotBacktestResult:
         if not (len(self.times) == len(self.prices) == len(self.positions) == len(self.trade_sizes)):
             raise ValueError("times, prices, positions, and trade_sizes must have the same length.")
 
-        self.prices = np.asarray(self.prices, dtype=np.float64)
-        self.positions = np.asarray(self.positions, dtype=np.float64)
-        self.trade_sizes = np.asarray(self.trade_sizes, dtype=np.float64)
-        # positions = positions - trade_sizes  # Do not update positions here
-        positions_prev = np.roll(self.positions, 1)  # Use previous positions for PnL calculation
-        positions_prev[0] = 0  # assume no position before first bar
+        self.prices = self._as_series(self.prices)
+        self.positions = self._as_series(self.positions)
+        self.trade_sizes = self._as_series(self.trade_sizes)
+        # PnL uses the previous bar's position, no position before the first bar
+        self.fees = self.get_fees()
+        self.pnls = self._build_pnls()
+        self.equities = self._build_equities()
 
-        self.fees = np.abs(self.trade_sizes) * self.prices * self.fee_rate
-        price_diff = np.diff(self.prices, prepend=self.prices[0])
-        self.pnls = positions_prev * price_diff - self.fees
-
-        pnl_cum = np.cumsum(self.pnls)
-        # fees_cum = np.cumsum(fees)
-        self.equities = self.init_cash + pnl_cum
-
-        self.returns = np.zeros_like(self.pnls)
-        # self.returns[1:] = safe_divide(self.equities[1:] - self.equities[:-1], self.equities[:-1])
-        self.returns[1:] = self.pnls[1:] / self.init_cash
+        self.returns = self._returns(self.pnls, self.equities)
 
         self.cum_rets = compound_returns(self.returns)
 
@@ -58,13 +51,7 @@ class BacktestVnStocks(BaseBacktest):
         # bm_cumret = _compound_returns(bm_returns)
         # bm_pnl = bm_equity - init_cash
 
-        bm_shares = round_to_lot(self.init_cash / self.prices[0], 100)
-        initial_fee = bm_shares * self.prices[0] * self.fee_rate
-        self.bm_equities = bm_shares * self.prices - initial_fee
-        self.bm_returns = np.zeros_like(self.bm_equities)
-        self.bm_returns[1:] = safe_divide(self.bm_equities[1:] - self.bm_equities[:-1], self.bm_equities[:-1])
-        self.bm_cumrets = compound_returns(self.bm_returns)
-        self.bm_pnls = self.bm_returns * self.init_cash
+        self.bm_equities, self.bm_returns, self.bm_cumrets, self.bm_pnls = self.get_benchmark()
 
         return BotBacktestResult(
             times=self.times,
@@ -81,3 +68,22 @@ class BacktestVnStocks(BaseBacktest):
             bm_cumret=self.bm_cumrets,
             bm_pnl=self.bm_pnls
         )
+
+    def default_cost_model(self) -> CostModel:
+        return PercentFee(self.fee_rate)
+
+    def _returns(self, pnls: np.ndarray, equities: np.ndarray) -> np.ndarray:
+        returns = np.zeros_like(pnls)
+        # returns[1:] = safe_divide(equities[1:] - equities[:-1], equities[:-1])
+        returns[..., 1:] = pnls[..., 1:] / self.init_cash  # also (paths x bars) matrices
+        return returns
+
+    def _build_benchmark(self, prices: np.ndarray) -> BenchmarkSeries:
+        bm_shares = round_to_lot(self.init_cash / prices[0], 100)
+        initial_fee = bm_shares * prices[0] * self.fee_rate
+        bm_equities = bm_shares * prices - initial_fee
+        bm_returns = np.zeros_like(bm_equities)
+        bm_returns[1:] = safe_divide(bm_equities[1:] - bm_equities[:-1], bm_equities[:-1])
+        bm_cumrets = compound_returns(bm_returns)
+        bm_pnls = bm_returns * self.init_cash
+        return bm_equities, bm_returns, bm_cumrets, bm_pnls
@@ -6,6 +6,12 @@ import logging
 class FeeConfig:
     percent_stock_fee = 0.0015  # 0.15% per trade
     fixed_derivative_fee = 20000  # VND 20,000 per trade
+    stock_sell_tax = 0.001  # 0.1% personal income tax on sell value
+
+
+class MarginConfig:
+    initial_margin_rate = 0.17  # VN30F initial margin, fraction of contract value
+    maintenance_margin_ratio = 0.8  # maintenance margin, fraction of initial margin
 
 
 class AppConfig:
@@ -59,8 +65,38 @@ class AppConfig:
     kafka_state_latest_topic: str = "strategy.state.latest"
     redis_signal_latest_hash: str = "strategy.signal.latest"
     redis_state_latest_hash: str = "strategy.state.latest"
+    # Backtest inputs are stored once in Redis and passed to workers by key
+    redis_backtest_input_prefix: str = "strategy.backtest.input"
+    backtest_input_ttl: int = int(os.environ.get('BACKTEST_INPUT_TTL', 24 * 3600))  # seconds
+    # Parquet results store (bt_mode/engine/date partitions), queried locally with DuckDB
+    results_store_path: str = os.environ.get('RESULTS_STORE_PATH', os.path.join('data', 'results'))
+    # Realtime OHLCV bars are flushed into the cached data of dirty symbols on this cadence
+    ohlcv_flush_interval: float = float(os.environ.get('OHLCV_FLUSH_INTERVAL', 1.0))  # seconds
+    # Realtime OHLCV messages fetched per Kafka consume call, and the longest wait for a batch
+    ohlcv_consume_batch_size: int = int(os.environ.get('OHLCV_CONSUME_BATCH_SIZE', 1000))
+    ohlcv_consume_timeout: float = float(os.environ.get('OHLCV_CONSUME_TIMEOUT', 1.0))  # seconds
+    # Memory budget of the benchmark series shared between backtests of the same market
+    benchmark_cache_max_bytes: int = int(os.environ.get('BENCHMARK_CACHE_MAX_BYTES', 256 * 1024 ** 2))
+    # Memory budget of the cached OHLCV data (least recently used symbols are evicted beyond it)
+    ohlcv_cache_max_bytes: int = int(os.environ.get('OHLCV_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+    # Days of history kept in RAM per base resolution ("m", "h", "D"), older bars are reloaded on demand
+    ohlcv_retention_days: dict = {
+        "m": int(os.environ.get('OHLCV_MINUTE_RETENTION_DAYS', 90)),
+    }
+    # On-disk Parquet cache of financial statements, one file per (period, symbol)
+    financial_cache_path: str = os.environ.get('FINANCIAL_CACHE_PATH', os.path.join('data', 'financials'))
+    financial_cache_recheck_hours: float = float(os.environ.get('FINANCIAL_CACHE_RECHECK_HOURS', 24))
+    financial_cache_max_age_days: float = float(os.environ.get('FINANCIAL_CACHE_MAX_AGE_DAYS', 30))
+    # Concurrent statement downloads when fetching many symbols at once
+    financial_download_workers: int = int(os.environ.get('FINANCIAL_DOWNLOAD_WORKERS', 8))
+    # Days after a period end before its report can be published
+    financial_report_lag_days: dict = {"quarter": 20, "year": 60}
+    # Days after a period end at which its report is treated as known when joined onto bars (point in time)
+    financial_publish_lag_days: dict = {"quarter": 45, "year": 90}
     # Fee config
     trading_fee = FeeConfig()
+    # Futures margin config
+    futures_margin = MarginConfig()
 
 settings = AppConfig()
 
@@ -1,18 +1,40 @@
+import logging
+import threading
+
+import numpy as np
 import pandas as pd
+from cachetools import LRUCache
+from xno import settings
 from xno.data.ohlcv import OhlcvDataManager
 from xno.data import Fields
-from xno.data.financeData import get_financial_data
-from typing import Literal
+from xno.data.financeData import get_financial_data, get_financial_data_many
+from typing import Dict, Iterable, List, Literal
 
 from xno.utils.dc import timing
 
 
 class AllData:
-    def __init__(self):
+    """
+    OHLCV bars of a symbol with the requested financial fields joined point in time: a period's
+    figures only appear on bars after its report is known, i.e. `reporting_lag` days after the
+    period end, or at the publication date when `publish_date_column` is present in the statements.
+    """
+    # Aligned financial columns per (symbol, resolution, period, fields, lag), reused while the
+    # bars and the statements are unchanged
+    _aligned_cache: LRUCache = LRUCache(maxsize=256)
+    _aligned_lock = threading.Lock()
+
+    def __init__(self, reporting_lag: Dict[str, int] | None = None, publish_date_column: str | None = None):
+        """
+        :param reporting_lag: days from period end to publication per period, `settings.financial_publish_lag_days` if None
+        :param publish_date_column: statements column holding the actual publication date, if any
+        """
         self.fields = set()
         self.ohlcv_fields = set()
         self.finance_fields = set()
         self.always_include_close = True
+        self.reporting_lag = dict(settings.financial_publish_lag_days if reporting_lag is None else reporting_lag)
+        self.publish_date_column = publish_date_column
 
     def add_field(self, field_name: str) -> 'AllData':
         self.fields.add(field_name)
@@ -25,10 +47,47 @@ class AllData:
 
         return self
 
-    @timing
-    def get(self, resolution: str, symbol: str, period: Literal['quarter', 'year'] = 'quarter', from_time=None) -> pd.DataFrame:
-        OhlcvDataManager.stats()
-        ohlcv_df = OhlcvDataManager.get(resolution, symbol, factor=1000, from_time=from_time)
+    def known_at(self, financial_df: pd.DataFrame, period: Literal['quarter', 'year']) -> pd.Series:
+        """Time at which each period's figures are known."""
+        lag = pd.Timedelta(days=self.reporting_lag.get(period, 0))
+        known_at = pd.Series(financial_df.index + lag, index=financial_df.index)
+        if self.publish_date_column is not None and self.publish_date_column in financial_df.columns:
+            published = pd.to_datetime(financial_df[self.publish_date_column], errors='coerce')
+            known_at = published.fillna(known_at)
+        return known_at.astype('datetime64[ns]')
+
+    def align_financials(
+            self,
+            symbol: str,
+            resolution: str,
+            period: Literal['quarter', 'year'],
+            financial_df: pd.DataFrame,
+            columns: List[str],
+            index: pd.DatetimeIndex,
+    ) -> pd.DataFrame:
+        """
+        As-of join of financial `columns` onto the bar times `index` (sorted): each bar gets the
+        latest period known at or before it.
+        """
+        key = (symbol, resolution, period, tuple(columns), tuple(sorted(self.reporting_lag.items())),
+               self.publish_date_column, index[0] if len(index) else None, index[-1] if len(index) else None, len(index))
+        with self._aligned_lock:
+            entry = self._aligned_cache.get(key)
+        if entry is not None and entry[0] is financial_df:
+            return entry[1]
+
+        right = financial_df[columns].assign(_known_at=self.known_at(financial_df, period).to_numpy())
+        right = right.dropna(subset=['_known_at']).sort_values('_known_at', kind='stable')
+        left = pd.DataFrame({'_time': index.astype('datetime64[ns]')})
+        aligned = pd.merge_asof(left, right, left_on='_time', right_on='_known_at', direction='backward')
+        aligned = aligned[columns].set_axis(index, axis=0)
+        with self._aligned_lock:
+            self._aligned_cache[key] = (financial_df, aligned)
+        return aligned
+
+    def _bars(self, resolution: str, symbol: str, from_time=None, to_time=None) -> pd.DataFrame:
+        """Close and the requested OHLCV fields of a symbol, sorted by time."""
+        ohlcv_df = OhlcvDataManager.get(resolution, symbol, factor=1000, from_time=from_time, to_time=to_time)
         if ohlcv_df.empty:
             raise ValueError(f"No OHLCV data found: {symbol} - {resolution} from=[{from_time}]")
 
@@ -45,7 +104,15 @@ class AllData:
             if col in ohlcv_df.columns and col != 'Close':
                 selected_ohlcv_cols.append(col)
 
-        result_df = ohlcv_df[selected_ohlcv_cols].copy()
+        return ohlcv_df[selected_ohlcv_cols].copy()
+
+    def _financial_columns(self, financial_df: pd.DataFrame) -> List[str]:
+        return sorted(col for col in self.finance_fields if col in financial_df.columns)
+
+    @timing
+    def get(self, resolution: str, symbol: str, period: Literal['quarter', 'year'] = 'quarter', from_time=None,
+            to_time=None) -> pd.DataFrame:
+        result_df = self._bars(resolution, symbol, from_time=from_time, to_time=to_time)
 
         # Add financial fields if requested
         if len(self.finance_fields) > 0:
@@ -55,17 +122,92 @@ class AllData:
             if financial_df.empty:
                 print("Warning: No financial data available.")
             else:
-                selected_financial_cols = [col for col in self.finance_fields if col in financial_df.columns]
+                selected_financial_cols = self._financial_columns(financial_df)
 
                 if selected_financial_cols:
-                    selected_financial = financial_df[selected_financial_cols]
-                    selected_financial = selected_financial.reindex(result_df.index, method='ffill')
+                    selected_financial = self.align_financials(
+                        symbol, resolution, period, financial_df, selected_financial_cols, result_df.index
+                    )
                     result_df = result_df.join(selected_financial, how='left')
 
         result_df = result_df.infer_objects(copy=False)
         
         return result_df
 
+    def align_financials_many(
+            self,
+            period: Literal['quarter', 'year'],
+            financial_dfs: Dict[str, pd.DataFrame],
+            indexes: Dict[str, pd.DatetimeIndex],
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        `align_financials` for many symbols in one as-of join: the statements of all symbols are
+        stacked, joined onto the stacked bar times by symbol, and the result is split per symbol.
+        Each symbol only gets the requested columns its own statements have.
+        """
+        columns = {}
+        for symbol, financial_df in financial_dfs.items():
+            if symbol in indexes and not financial_df.empty and self._financial_columns(financial_df):
+                columns[symbol] = self._financial_columns(financial_df)
+        if not columns:
+            return {}
+        symbols = list(columns)
+        all_columns = sorted(set().union(*columns.values()))
+
+        right = pd.concat([
+            financial_dfs[symbol][columns[symbol]].assign(
+                _symbol=symbol, _known_at=self.known_at(financial_dfs[symbol], period).to_numpy()
+            )
+            for symbol in symbols
+        ], ignore_index=True).reindex(columns=all_columns + ['_symbol', '_known_at'])
+        right = right.dropna(subset=['_known_at']).sort_values('_known_at', kind='stable')
+
+        lengths = [len(indexes[symbol]) for symbol in symbols]
+        left = pd.DataFrame({
+            '_symbol': np.repeat(symbols, lengths),
+            '_time': np.concatenate([indexes[symbol].to_numpy(dtype='datetime64[ns]') for symbol in symbols]),
+        })
+        left = left.sort_values('_time', kind='stable')
+        aligned = pd.merge_asof(left, right, left_on='_time', right_on='_known_at', by='_symbol', direction='backward')
+        aligned = aligned.set_axis(left.index, axis=0).sort_index()
+
+        results, offset = {}, 0
+        for symbol, length in zip(symbols, lengths):
+            part = aligned.iloc[offset:offset + length]
+            results[symbol] = part[columns[symbol]].set_axis(indexes[symbol], axis=0)
+            offset += length
+        return results
+
+    @timing
+    def get_many(self, resolution: str, symbols: Iterable[str], period: Literal['quarter', 'year'] = 'quarter',
+                 from_time=None, to_time=None) -> Dict[str, pd.DataFrame]:
+        """
+        `get` for many symbols with the same fields. With `from_time`, the bars of all symbols are
+        first loaded in bulk (`OhlcvDataManager.preload`). The statements of all symbols are then
+        fetched together (`get_financial_data_many`) and joined in one `align_financials_many`.
+        Symbols without bars are left out.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if from_time is not None:
+            to_time = pd.Timestamp.now() if to_time is None else to_time
+            OhlcvDataManager.preload(symbols, resolution, str(pd.Timestamp(from_time)), str(pd.Timestamp(to_time)))
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self._bars(resolution, symbol, from_time=from_time, to_time=to_time)
+            except ValueError as e:
+                logging.warning(f"Skipping {symbol}: {e}")
+
+        if len(self.finance_fields) > 0 and results:
+            financial_dfs = get_financial_data_many(list(results), period=period)
+            aligned = self.align_financials_many(
+                period, financial_dfs, {symbol: df.index for symbol, df in results.items()}
+            )
+            for symbol, financial in aligned.items():
+                results[symbol] = results[symbol].join(financial, how='left')
+
+        return {symbol: df.infer_objects(copy=False) for symbol, df in results.items()}
+
 if __name__ == "__main__":
     import logging
     # OhlcvDataManager.consume_realtime()
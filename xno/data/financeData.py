@@ -1,19 +1,125 @@
 import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 from cachetools import TTLCache, cached
-from typing import Literal
+from typing import Dict, Iterable, Literal, Tuple
+from urllib.parse import quote
 
+from xno import settings
 from xno.utils.dc import timing
 
-# Cache for 10 minutes (600 seconds)
+# Merged statements per (symbol, period), for 10 minutes (600 seconds)
 finance_cache = TTLCache(maxsize=128, ttl=600)
 
-@cached(cache=finance_cache)
+
+def latest_expected_period_end(period: Literal['quarter', 'year'], now: pd.Timestamp) -> pd.Timestamp:
+    """End of the latest period whose report may be published by `now` (see `settings.financial_report_lag_days`)."""
+    t = now - pd.Timedelta(days=settings.financial_report_lag_days[period])
+    p = t.to_period('Q' if period == 'quarter' else 'Y')
+    end = p.end_time.normalize()
+    return end if end <= t else (p - 1).end_time.normalize()
+
+
+def is_stale(df: pd.DataFrame, written_at: pd.Timestamp, period: Literal['quarter', 'year'], now: pd.Timestamp = None) -> bool:
+    """
+    Whether cached statements should be downloaded again:
+    - always after `financial_cache_max_age_days` (restatements, ratio updates);
+    - while the latest period that may have been published is missing, at most every `financial_cache_recheck_hours`.
+    A cache holding the latest expected period stays fresh until the next period can be published.
+    """
+    now = pd.Timestamp.now() if now is None else now
+    if written_at < now - pd.Timedelta(days=settings.financial_cache_max_age_days):
+        return True
+    if len(df) > 0 and df.index.max() >= latest_expected_period_end(period, now):
+        return False
+    return written_at < now - pd.Timedelta(hours=settings.financial_cache_recheck_hours)
+
+
+def _cache_path(symbol: str, period: str) -> str:
+    return os.path.join(settings.financial_cache_path, period, f"{quote(symbol, safe='')}.parquet")
+
+
+def _read_cache(symbol: str, period: str) -> Tuple[pd.DataFrame | None, pd.Timestamp | None]:
+    path = _cache_path(symbol, period)
+    try:
+        written_at = pd.Timestamp(os.path.getmtime(path), unit='s')
+        return pd.read_parquet(path), written_at
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable financial cache {path}: {e}")
+        return None, None
+
+
+def _write_cache(symbol: str, period: str, df: pd.DataFrame):
+    path = _cache_path(symbol, period)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(tmp)
+        os.replace(tmp, path)  # readers never see a partial file
+    except Exception as e:
+        logging.warning(f"Could not cache financial data of {symbol} ({period}) to {path}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@cached(cache=finance_cache, lock=threading.Lock())
 @timing
 def get_financial_data(
     symbol: str,
     period: Literal['quarter', 'year'] = 'quarter'
+) -> pd.DataFrame:
+    """
+    Financial statements and ratios of a symbol, one row per period end.
+    Served from the on-disk Parquet cache (`settings.financial_cache_path`) unless it is stale
+    (see `is_stale`); a stale cache is still used if the download fails.
+    """
+    cached_df, written_at = _read_cache(symbol, period)
+    if cached_df is not None and not is_stale(cached_df, written_at, period):
+        return cached_df
+    try:
+        financial_df = download_financial_data(symbol, period)
+    except Exception as e:
+        if cached_df is None:
+            raise
+        logging.warning(f"Using stale financial data of {symbol} ({period}), download failed: {e}")
+        return cached_df
+    _write_cache(symbol, period, financial_df)
+    return financial_df
+
+
+def get_financial_data_many(
+    symbols: Iterable[str],
+    period: Literal['quarter', 'year'] = 'quarter'
+) -> Dict[str, pd.DataFrame]:
+    """
+    `get_financial_data` for many symbols, cached ones served directly and the downloads of the
+    others run concurrently (`settings.financial_download_workers`). Symbols whose statements
+    cannot be fetched are logged and left out.
+    """
+    symbols = list(dict.fromkeys(symbols))
+
+    def fetch(symbol):
+        try:
+            return get_financial_data(symbol=symbol, period=period)
+        except Exception as e:
+            logging.warning(f"No financial data for {symbol} ({period}): {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.financial_download_workers, len(symbols)))) as executor:
+        results = dict(zip(symbols, executor.map(fetch, symbols)))
+    return {symbol: df for symbol, df in results.items() if df is not None}
+
+
+def download_financial_data(
+    symbol: str,
+    period: Literal['quarter', 'year'] = 'quarter'
 ) -> pd.DataFrame:
     from vnstock import Finance
 
@@ -26,61 +132,58 @@ def get_financial_data(
     if ratio_df.columns.nlevels > 1:
         ratio_df.columns = ratio_df.columns.get_level_values(-1)
 
-    def quarter_to_date(row, year_col='Năm', quarter_col='Kỳ'):
-        if year_col not in row.index or quarter_col not in row.index:
-            return pd.NaT
-        year = row[year_col]
-        quarter = row[quarter_col]
-
-        if quarter == 1:
-            return pd.Timestamp(f'{year}-03-31')
-        elif quarter == 2:
-            return pd.Timestamp(f'{year}-06-30')
-        elif quarter == 3:
-            return pd.Timestamp(f'{year}-09-30')
-        elif quarter == 4 or quarter == 5:
-            return pd.Timestamp(f'{year}-12-31')
-        else:
-            return pd.NaT
-
-    def year_to_date(row, year_col='Năm'):
-        if year_col not in row.index:
-            return pd.NaT
-        year = row[year_col]
-        return pd.Timestamp(f'{year}-12-31')
-
     financial_dfs = {
         'income_statement': incomStatement_df,
         'balance_sheet': balanSheet_df,
         'cash_flow': cashFlow_df,
         'ratio': ratio_df
     }
+    return merge_statements(financial_dfs)
+
 
-    processed_dfs = {}
+def period_end_dates(years, quarters=None) -> pd.DatetimeIndex:
+    """
+    Vectorized period end of each (year, quarter): quarters 1-3 end on Mar 31, Jun 30 and Sep 30,
+    quarter 4 and 5 (full year) on Dec 31, no quarter means the year end. Invalid values give NaT.
+    """
+    years = pd.to_numeric(pd.Series(years), errors='coerce').reset_index(drop=True)
+    if quarters is None:
+        months = pd.Series(12, index=years.index)
+    else:
+        quarters = pd.to_numeric(pd.Series(quarters), errors='coerce').reset_index(drop=True)
+        months = quarters.where(quarters.isin([1, 2, 3, 4, 5])).clip(upper=4) * 3
+    starts = pd.to_datetime(pd.DataFrame({'year': years, 'month': months, 'day': 1}), errors='coerce')
+    return pd.DatetimeIndex(starts + pd.offsets.MonthEnd(0), name='time')
+
+
+def merge_statements(financial_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Index each statement by its period end, prefix its columns with the statement name and
+    align all of them in one outer concat. A full-year row (quarter 5) is dropped when the
+    quarter 4 row of the same year exists.
+    """
+    processed_dfs = []
     for key, df in financial_dfs.items():
         if 'Năm' not in df.columns:
             logging.warning(f"Warning: {key} does not have 'Năm' column. Skipping.")
             continue
 
-        if 'Kỳ' in df.columns:
-            df['time'] = df.apply(lambda row: quarter_to_date(row, 'Năm', 'Kỳ'), axis=1)
-            df = df.dropna(subset=['time'])
-            df.set_index('time', inplace=True)
-            df.drop(columns=['Năm', 'Kỳ', 'CP'], inplace=True, errors='ignore')
-        else:
-            df['time'] = df.apply(lambda row: year_to_date(row, 'Năm'), axis=1)
-            df = df.dropna(subset=['time'])
-            df.set_index('time', inplace=True)
-            df.drop(columns=['Năm', 'CP'], inplace=True, errors='ignore')
-
+        quarters = df['Kỳ'] if 'Kỳ' in df.columns else None
+        index = period_end_dates(df['Năm'], quarters)
+        order = pd.to_numeric(pd.Series(quarters), errors='coerce').to_numpy() if quarters is not None else None
+        df = df.drop(columns=['Năm', 'Kỳ', 'CP'], errors='ignore')
         df.columns = [f"{key}_{col}" for col in df.columns]
-        processed_dfs[key] = df.sort_index(ascending=True)
-
+        df.index = index
+        valid = ~index.isna()
+        df = df[valid]
+        if order is not None:
+            # Stable sort by (time, quarter) keeps quarter 4 ahead of quarter 5 on Dec 31
+            df = df.iloc[np.lexsort((order[valid], df.index.to_numpy()))]
+        else:
+            df = df.sort_index(kind='stable')
+        processed_dfs.append(df[~df.index.duplicated(keep='first')])
 
-    if processed_dfs:
-        financial_df = pd.concat(processed_dfs.values(), axis=1)
-    else:
-        financial_df = pd.DataFrame()
+    if not processed_dfs:
         logging.warning("Warning: No financial data processed.")
-
-    return financial_df
+        return pd.DataFrame()
+    return pd.concat(processed_dfs, axis=1, join='outer', sort=True)
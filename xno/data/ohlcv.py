@@ -1,20 +1,21 @@
-import json
 import logging
 import threading
 import time
 import confluent_kafka
 import numpy
+import orjson
 import pandas as pd
 from confluent_kafka import Consumer
 from tqdm import tqdm
 from xno import settings
 from xno.connectors.mem import DistributedSemaphore
 from xno.connectors.sql import SqlSession
-from typing import Literal, Dict
+from typing import Literal, Dict, List, Tuple
+import collections
 import queue
 from readerwriterlock import rwlock
 from sqlalchemy import text
-import datetime, random
+import datetime
 
 _accepted_resolutions = {"h", "D", "m"}
 _map_db_accept_resolutions = {
@@ -44,6 +45,14 @@ _ohlcv_data_template = pd.DataFrame({
 }).set_index("time")
 
 load_chunk_size = 1000  # rows
+change_log_size = 64  # changes remembered per OhlcvData for incremental resampling
+_ohlcv_agg = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
 load_data_query = """
 SELECT time, open, high, low, close, volume
 FROM vn_market.history_stock_ohlcv
@@ -52,6 +61,124 @@ WHERE symbol = :symbol
   AND time >= :from_time
   AND time <= :to_time
 """
+preload_batch_size = 500  # symbols per preload query
+preload_data_query = """
+SELECT symbol, time, open, high, low, close, volume
+FROM vn_market.history_stock_ohlcv
+WHERE symbol = ANY(:symbols)
+  AND resolution = :resolution
+  AND time >= :from_time
+  AND time <= :to_time
+ORDER BY symbol, time
+"""
+
+
+def _merge_frames(frames) -> pd.DataFrame:
+    """Concatenate frames once, keep the last row of each duplicated time and sort by time."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _ohlcv_data_template.copy()
+    df = frames[0] if len(frames) == 1 else pd.concat(frames)
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep="last")]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True).sum())
+
+
+def _upsert(data: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge time-sorted `new` rows into time-sorted `data`, `new` winning on equal times.
+    Only the part of `data` from the first new time on is re-merged, so appending bars is a plain concat.
+    """
+    if data.empty or new.empty:
+        return new if data.empty else data
+    pos = data.index.searchsorted(new.index[0], side="left")
+    if pos == 0:
+        return _merge_frames([data, new])
+    if pos == len(data):
+        return pd.concat([data, new])
+    return pd.concat([data.iloc[:pos], _merge_frames([data.iloc[pos:], new])])
+
+
+def _resample(df: pd.DataFrame, resolution: str, factor=1) -> pd.DataFrame:
+    """Aggregate bars to `resolution`, scale prices by `factor` and rename columns to the runner format."""
+    df = df.resample(resolution).agg(_ohlcv_agg).dropna()
+    # xfactor adjustment for open, high, low, close
+    if factor != 1:
+        df['open'] = df['open'] * factor
+        df['high'] = df['high'] * factor
+        df['low'] = df['low'] * factor
+        df['close'] = df['close'] * factor
+    return df.rename(
+        columns={
+            'open': 'Open',
+            'high': 'High',
+            'low': 'Low',
+            'close': 'Close',
+            'volume': 'Volume'
+        },
+    )
+
+
+def _is_incremental(resolution: str) -> bool:
+    """
+    Whether buckets of `resolution` have a fixed width dividing a day: their boundaries then do not
+    depend on where the resampled data starts, so a cached resample can be sliced and extended.
+    """
+    try:
+        offset = pd.tseries.frequencies.to_offset(resolution)
+    except ValueError:
+        return False
+    return isinstance(offset, pd.offsets.Tick) and pd.Timedelta(days=1) % pd.Timedelta(offset) == pd.Timedelta(0)
+
+
+class _BufferFlusher:
+    """
+    One background thread flushing the realtime buffers of all OhlcvData instances.
+    Instances register themselves when a row is appended; every `interval` seconds the dirty
+    set is swapped out and flushed as a batch. Readers still flush their own buffer on demand.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def mark_dirty(self, instance: "OhlcvData"):
+        with self._lock:
+            self._dirty.add(instance)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ohlcv-flusher", daemon=True)
+                self._thread.start()
+
+    def discard(self, instance: "OhlcvData"):
+        with self._lock:
+            self._dirty.discard(instance)
+
+    def flush(self) -> int:
+        """Flush every dirty instance now, return the number of instances flushed."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for instance in dirty:
+            try:
+                instance.consume_buffer()
+            except Exception as e:
+                logging.error(f"Failed to flush realtime data of {instance.symbol} at {instance.resolution}: {e}")
+        return len(dirty)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+_flusher = _BufferFlusher(settings.ohlcv_flush_interval)
 
 
 class OhlcvData:
@@ -60,17 +187,17 @@ class OhlcvData:
         self.resolution = resolution
         self.symbol = symbol
         self.data = _ohlcv_data_template.copy()
+        self.version = 0  # bumped on every change of self.data
+        self._changes = collections.deque(maxlen=change_log_size)  # (version, first changed time)
+        self._resampled: Dict[tuple, Tuple[int, pd.DataFrame]] = {}  # (resolution, factor) -> (version, frame)
+        self._resample_lock = threading.Lock()
+        self._data_nbytes = _frame_nbytes(self.data)
+        self._resampled_nbytes: Dict[tuple, int] = {}
         self.buffer = queue.Queue()
         self.lock = rwlock.RWLockFair()
-        self._stop_event = threading.Event()
-        self.consume_buffer_interval = random.randint(10, 300)  # seconds
-
-        # Start background flusher thread
-        self._threads = [
-            threading.Thread(target=self._commit_buffer, daemon=True),
-        ]
-        for t in self._threads:
-            t.start()
+        # Start of the widest recently requested range and when it was requested (time.monotonic)
+        self.requested_from: pd.Timestamp | None = None
+        self.requested_at = 0.0
 
     def get_max_data_time(self):
         query = """
@@ -90,11 +217,22 @@ class OhlcvData:
                 return max_time
 
     def append_data(self, data: dict):
-        """Append incoming row (dict) to buffer safely."""
-        with self.lock.gen_wlock():
-            self.buffer.put(data)
+        """Append incoming row (dict) to buffer, the shared flusher merges it into the data."""
+        self.buffer.put(data)  # queue.Queue is thread safe
+        _flusher.mark_dirty(self)
+
+    def append_many(self, rows: List[dict]):
+        """Append several incoming rows to the buffer, registering with the flusher once."""
+        for row in rows:
+            self.buffer.put(row)
+        _flusher.mark_dirty(self)
 
     def load_data(self, from_time: str, to_time: str):
+        """
+        Load a time range from the database and merge it into the cached data.
+        Chunks are collected without holding the lock and merged once (O(n log n) instead of one
+        concat/sort of the whole frame per chunk); loaded rows win over cached rows at the same time.
+        """
         params = {
             "symbol": self.symbol,
             "resolution": _map_db_accept_resolutions.get(self.resolution),
@@ -110,30 +248,40 @@ class OhlcvData:
                     chunksize=load_chunk_size,
                     # dtype=_ohlcv_data_template.dtypes,
                 )
-                # Iterate over each chunk and append it to the main DataFrame
+                frames = []
                 for chunk_df in tqdm(chunks):
-                    logging.debug("Yielding chunk of size %d", len(chunk_df))
+                    logging.debug("Loaded chunk of size %d", len(chunk_df))
                     if not chunk_df.empty:
-                        chunk_df.set_index("time", inplace=True)
-                        with self.lock.gen_wlock():
-                            # Concatenate the new chunk with existing data
-                            self.data = pd.concat([self.data, chunk_df])
-                            # Remove duplicates by time and keep the last one (most recent)
-                            self.data = self.data[~self.data.index.duplicated(keep="last")]
-                            # Sort the data by index (time)
-                            self.data.sort_index(inplace=True)
+                        frames.append(chunk_df.set_index("time"))
+        if frames:
+            self.merge_loaded(_merge_frames(frames))
+
+    def merge_loaded(self, loaded: pd.DataFrame):
+        """Merge time-sorted bars loaded from the database into the cached data, loaded rows winning."""
+        if loaded.empty:
+            return
+        # Merge against a snapshot, then swap it in under a brief write lock.
+        # If the data changed meanwhile (realtime flush, concurrent load), merge again under the lock.
+        with self.lock.gen_rlock():
+            data, version = self.data, self.version
+        merged = _upsert(data, loaded)
+        with self.lock.gen_wlock():
+            if self.version != version:
+                merged = _upsert(self.data, loaded)
+            self._set_data(merged, loaded.index[0])
 
     def datas(self, from_time, to_time) -> pd.DataFrame:
         """
         Retrieves and prepares OHLCV data for the specified time range and resolution.
         It loads historical data only for missing time periods to optimize performance.
+        The result is a slice of the cached frame (no copy), callers must not modify it in place.
         """
         self.consume_buffer()
-        # Get the min/max index from the currently loaded data
+        # Get the min/max index from the currently loaded data (the index is kept sorted)
         with self.lock.gen_rlock():
             if not self.data.empty:
-                min_index = self.data.index.min()
-                max_index = self.data.index.max()
+                min_index = self.data.index[0]
+                max_index = self.data.index[-1]
             else:
                 # If no data is loaded, set min/max index to None
                 min_index = None
@@ -155,25 +303,30 @@ class OhlcvData:
                 logging.debug(f"Loading historical data for {self.symbol} from {max_index} to {to_time}")
                 self.load_data(max_index.strftime('%Y-%m-%d %H:%M:%S'), to_time)
 
-        # After loading, get a read lock and filter the data
+        # self.data is replaced, never modified in place, so the reference stays valid after the lock
         with self.lock.gen_rlock():
-            datas = self.data.copy()
+            datas = self.data
 
-        # Filter by the requested time range
-        datas = datas[(datas.index >= from_time) & (datas.index <= to_time)]
-        return datas
+        # Binary search of the requested time range on the sorted index
+        start = datas.index.searchsorted(from_time, side="left")
+        stop = datas.index.searchsorted(to_time, side="right")
+        return datas.iloc[start:stop]
 
-    def consume_buffer(self) -> bool:
-        """
-        Flushes real-time data from the buffer queue to the main DataFrame.
-        """
+    def drain_buffer(self) -> List[dict]:
+        """Take the buffered realtime rows that are not merged yet."""
         rows = []
         try:
             while True:
                 rows.append(self.buffer.get_nowait())
         except queue.Empty:
             pass
+        return rows
 
+    def consume_buffer(self) -> bool:
+        """
+        Flushes real-time data from the buffer queue to the main DataFrame.
+        """
+        rows = self.drain_buffer()
         if not rows:
             return False
         df = pd.DataFrame(
@@ -198,31 +351,111 @@ class OhlcvData:
             .tz_convert("Asia/Ho_Chi_Minh")
             .tz_localize(None)
         )
-        df = df[~df.index.duplicated(keep="last")]
+        df = _merge_frames([df])
         with self.lock.gen_wlock():
-            self.data = pd.concat([self.data, df])
+            self._set_data(_upsert(self.data, df), df.index[0])
         return True
 
-    def _commit_buffer(self):
-        """Background thread that flushes buffer every 1s."""
-        while not self._stop_event.is_set():
-            time.sleep(self.consume_buffer_interval)
-            self.consume_buffer()
+    def _set_data(self, data: pd.DataFrame, changed_from: pd.Timestamp):
+        """Replace the cached frame (write lock held), rows from `changed_from` on may have changed."""
+        self.data = data
+        self.version += 1
+        self._changes.append((self.version, changed_from))
+        self._data_nbytes = _frame_nbytes(data)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the cached bars and resampled frames."""
+        return self._data_nbytes + sum(self._resampled_nbytes.values())
+
+    def trim(self, keep: pd.Timedelta) -> int:
+        """
+        Drop bars older than `keep` before the last bar (they are reloaded if requested again).
+        :return: number of dropped bars
+        """
+        with self.lock.gen_wlock():
+            if self.data.empty:
+                return 0
+            start = self.data.index.searchsorted(self.data.index[-1] - keep, side="left")
+            if start == 0:
+                return 0
+            # Copy so that the dropped rows are released
+            self._set_data(self.data.iloc[start:].copy(), self.data.index[start])
+        with self._resample_lock:
+            self._resampled.clear()
+            self._resampled_nbytes.clear()
+        return int(start)
+
+    def _changed_since(self, version: int) -> pd.Timestamp | None:
+        """Earliest time changed after `version` (read lock held), None if the change log does not reach back."""
+        if not self._changes or self._changes[0][0] > version + 1:
+            return None
+        return min(changed_from for v, changed_from in self._changes if v > version)
+
+    def resampled(self, resolution: str, factor=1) -> pd.DataFrame:
+        """
+        The whole cached data resampled to `resolution` (see `_resample`), cached per (resolution, factor).
+        After new bars, only the buckets from the first changed time on are recomputed.
+        Requires a resolution accepted by `_is_incremental`.
+        """
+        key = (resolution, factor)
+        with self._resample_lock:
+            cached = self._resampled.get(key)
+            with self.lock.gen_rlock():
+                data, version = self.data, self.version
+                if cached is not None and cached[0] == version:
+                    return cached[1]
+                changed_from = None if cached is None else self._changed_since(cached[0])
+            if changed_from is None:
+                frame = _resample(data, resolution, factor)
+            else:
+                bucket = changed_from.floor(resolution)
+                kept = cached[1].iloc[:cached[1].index.searchsorted(bucket, side="left")]
+                fresh = _resample(data.iloc[data.index.searchsorted(bucket, side="left"):], resolution, factor)
+                frame = pd.concat([kept, fresh]) if len(kept) > 0 else fresh
+            self._resampled[key] = (version, frame)
+            self._resampled_nbytes[key] = _frame_nbytes(frame)
+            return frame
 
     def stop(self):
-        """Stop background thread gracefully."""
-        self._stop_event.set()
-        for t in self._threads:
-            t.join(timeout=2)
+        """Flush pending realtime rows and stop scheduling flushes for this instance."""
+        _flusher.discard(self)
+        self.consume_buffer()
+
+
+def _query_resolution(resolution: str) -> Tuple[str, int]:
+    """Base resolution loaded for a requested resolution, and the default lookback in days."""
+    resolution = resolution.lower()
+    if "d" in resolution:
+        return "D", 30
+    if "h" in resolution:
+        return "h", 7
+    if "min" in resolution:
+        return "m", 1
+    raise ValueError(f"Unsupported resolution: {resolution}")
 
 
 class OhlcvDataManager:
     """
     Manages and provides OhlcvData instances for different symbols and resolutions.
+    Instances are kept in least recently used order within a memory budget (`max_bytes`), and the
+    history of each base resolution is trimmed to its retention window, widened to the longest range
+    requested within `requested_range_ttl`. Evicted instances and trimmed ranges are reloaded from
+    the database on the next request.
     """
     _allowed_symbols = set()  # If empty, allow all symbols
-    _instances: Dict[tuple, OhlcvData] = {}
-    _lock = rwlock.RWLockFair()
+    _instances: "collections.OrderedDict[tuple, OhlcvData]" = collections.OrderedDict()  # LRU first
+    _lock = threading.RLock()
+    max_bytes: int = settings.ohlcv_cache_max_bytes
+    retention: Dict[str, pd.Timedelta] = {
+        resolution: pd.Timedelta(days=days) for resolution, days in settings.ohlcv_retention_days.items() if days
+    }
+    retention_slack = 0.1  # trim once the history exceeds the retention by this fraction
+    requested_range_ttl = 3600.0  # seconds a requested range stays exempt from the retention trim
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+    _trimmed_rows = 0
 
     @classmethod
     def add_symbol(cls, symbol: str):
@@ -231,42 +464,153 @@ class OhlcvDataManager:
 
     @classmethod
     def stats(cls):
-        with cls._lock.gen_rlock():
+        with cls._lock:
             return {
                 "total_instances": len(cls._instances),
-                # "total_records": sum(len(instance.datas()) for instance in cls._instances.values())
+                "total_bytes": sum(instance.nbytes for instance in cls._instances.values()),
+                "max_bytes": cls.max_bytes,
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "evictions": cls._evictions,
+                "trimmed_rows": cls._trimmed_rows,
             }
 
     @classmethod
-    def add(cls, resolution: str, symbol: str, payload: dict):
+    def _instance(cls, resolution: str, symbol: str, count: bool = False) -> OhlcvData:
+        """Get or create the instance of (resolution, symbol) and mark it most recently used."""
         key = (resolution, symbol)
-        with cls._lock.gen_wlock():
-            if key not in cls._instances:
+        with cls._lock:
+            instance = cls._instances.get(key)
+            if instance is None:
                 logging.debug("Creating new OhlcvData instance for %s at %s", symbol, resolution)
-                cls._instances[key] = OhlcvData(resolution, symbol)
-            cls._instances[key].append_data(payload)
+                instance = cls._instances[key] = OhlcvData(resolution, symbol)
+                cls._misses += count
+            else:
+                cls._instances.move_to_end(key)
+                cls._hits += count
+            return instance
+
+    @classmethod
+    def _mark_requested(cls, instance: OhlcvData, from_time):
+        """Record a request from `from_time`, keeping the widest of the recent ones."""
+        from_time, now = pd.Timestamp(from_time), time.monotonic()
+        if instance.requested_from is None or from_time <= instance.requested_from \
+                or now - instance.requested_at > cls.requested_range_ttl:
+            instance.requested_from, instance.requested_at = from_time, now
+
+    @classmethod
+    def _keep(cls, instance: OhlcvData) -> pd.Timedelta | None:
+        """History kept by the retention trim: the retention window or the recently requested range if longer."""
+        keep = cls.retention.get(instance.resolution)
+        if keep is None or instance.requested_from is None \
+                or time.monotonic() - instance.requested_at > cls.requested_range_ttl:
+            return keep
+        return max(keep, instance.data.index[-1] - instance.requested_from)
+
+    @classmethod
+    def _enforce_limits(cls, *instances: OhlcvData):
+        """
+        Trim `instances` to their retention window (see `_keep`), then evict least recently used instances over
+        budget (never one of `instances`). Realtime rows still buffered in an evicted instance are
+        handed to an empty instance of the same symbol, merged with the data once it is reloaded.
+        """
+        for instance in instances:
+            index = instance.data.index
+            keep = cls._keep(instance) if len(index) > 0 else None
+            if keep is not None and index[0] < index[-1] - keep * (1 + cls.retention_slack):
+                trimmed = instance.trim(keep)
+                with cls._lock:
+                    cls._trimmed_rows += trimmed
+        protected = {id(instance) for instance in instances}
+        with cls._lock:
+            total = sum(item.nbytes for item in cls._instances.values())
+            for key, victim in list(cls._instances.items()):
+                if total <= cls.max_bytes:
+                    break
+                if id(victim) in protected:
+                    continue
+                del cls._instances[key]
+                _flusher.discard(victim)
+                pending = victim.drain_buffer()
+                if pending:
+                    cls._instances[key] = OhlcvData(victim.resolution, victim.symbol)
+                    cls._instances[key].append_many(pending)
+                total -= victim.nbytes
+                cls._evictions += 1
+                logging.debug(f"Evicted OhlcvData of {victim.symbol} at {victim.resolution} ({victim.nbytes} bytes)")
+
+    @classmethod
+    def add(cls, resolution: str, symbol: str, payload: dict):
+        with cls._lock:  # not appended to an instance being evicted
+            cls._instance(resolution, symbol).append_data(payload)
+
+    @classmethod
+    def add_many(cls, resolution: str, symbol: str, payloads: List[dict]):
+        with cls._lock:
+            cls._instance(resolution, symbol).append_many(payloads)
+
+    @classmethod
+    def preload(cls, symbols, resolution: str, from_time, to_time) -> Dict[str, int]:
+        """
+        Load the bars of many symbols with one query per `preload_batch_size` symbols
+        (instead of one semaphore-guarded query per symbol) and merge them into their instances.
+        Rows are streamed with a server-side cursor. Memory limits are enforced once everything is
+        loaded, so symbols of the same call do not evict each other.
+        :param symbols: symbols to load
+        :param resolution: resolution as accepted by `get` (e.g. "1min", "D"), the base data is loaded
+        :return: number of bars loaded per symbol
+        """
+        query_res, _ = _query_resolution(resolution)
+        symbols = list(dict.fromkeys(symbols))
+        counts, instances = {}, {}
+        for i in range(0, len(symbols), preload_batch_size):
+            params = {
+                "symbols": symbols[i:i + preload_batch_size],
+                "resolution": _map_db_accept_resolutions.get(query_res),
+                "from_time": from_time,
+                "to_time": to_time,
+            }
+            with DistributedSemaphore():
+                with SqlSession(_ohlcv_db) as session:
+                    # Without stream_results the driver buffers the whole result before the first chunk
+                    conn = session.connection(execution_options={"stream_results": True})
+                    chunks = pd.read_sql_query(
+                        text(preload_data_query),
+                        conn,
+                        params=params,
+                        chunksize=load_chunk_size * 100,
+                    )
+                    # Rows come ordered by symbol: a symbol is merged as soon as the stream moves past it
+                    pending_symbol, pending = None, []
+                    for chunk_df in chunks:
+                        for symbol, frame in chunk_df.groupby("symbol", sort=False):
+                            if symbol != pending_symbol and pending:
+                                instances[pending_symbol], counts[pending_symbol] = \
+                                    cls._merge_preloaded(query_res, pending_symbol, pending)
+                                pending = []
+                            pending_symbol = symbol
+                            pending.append(frame.drop(columns="symbol").set_index("time"))
+                    if pending:
+                        instances[pending_symbol], counts[pending_symbol] = \
+                            cls._merge_preloaded(query_res, pending_symbol, pending)
+            logging.info(f"Preloaded {len(params['symbols'])} symbols at {query_res} from {from_time} to {to_time}")
+        for instance in instances.values():
+            cls._mark_requested(instance, from_time)
+        cls._enforce_limits(*instances.values())
+        return counts
+
+    @classmethod
+    def _merge_preloaded(cls, resolution: str, symbol: str, frames) -> Tuple[OhlcvData, int]:
+        loaded = _merge_frames(frames)
+        instance = cls._instance(resolution, symbol)
+        instance.merge_loaded(loaded)
+        return instance, len(loaded)
 
     @classmethod
     def get(cls, resolution: str, symbol: str, from_time=None, to_time=None, factor=1) -> pd.DataFrame:
         resolution = resolution.lower()
-        if "d" in resolution:
-            query_res = "D"
-            days = 30
-        elif "h" in resolution:
-            query_res = "h"
-            days = 7
-        elif "min" in resolution:
-            query_res = "m"
-            days = 1
-        else:
-            raise ValueError(f"Unsupported resolution: {resolution}")
-
-        key = (query_res, symbol)
-        with cls._lock.gen_rlock():
-            if key not in cls._instances:
-                logging.debug(f"Creating new OhlcvData instance for {symbol} at {resolution}")
-                cls._instances[key] = OhlcvData(query_res, symbol)
-            instance = cls._instances[key]
+        query_res, days = _query_resolution(resolution)
+        instance = cls._instance(query_res, symbol, count=True)
         if to_time is None:
             to_time = instance.get_max_data_time()
         to_time = pd.to_datetime(to_time)
@@ -274,33 +618,27 @@ class OhlcvDataManager:
         if from_time is None:
             from_time = to_time - datetime.timedelta(days=days)
         from_time = pd.to_datetime(from_time)
-        df = instance.datas(from_time, to_time)
-        # Resample to requested resolution if needed
-        df = df.resample(resolution).agg({
-            'open': 'first',
-            'high': 'max',
-            'low': 'min',
-            'close': 'last',
-            'volume': 'sum',
-        }).dropna()
-        # Rename
-        # xfactor adjustment for open, high, low, close
-        if factor != 1:
-            df['open'] = df['open'] * factor
-            df['high'] = df['high'] * factor
-            df['low'] = df['low'] * factor
-            df['close'] = df['close'] * factor
-        df = df.rename(
-            columns={
-                'open': 'Open',
-                'high': 'High',
-                'low': 'Low',
-                'close': 'Close',
-                'volume': 'Volume'
-            },
-        )
+        cls._mark_requested(instance, from_time)
+        df = cls._resample_range(instance, instance.datas(from_time, to_time), resolution, from_time, to_time, factor)
+        cls._enforce_limits(instance)
         return df
 
+    @staticmethod
+    def _resample_range(instance: OhlcvData, df: pd.DataFrame, resolution: str, from_time, to_time, factor):
+        if not _is_incremental(resolution):
+            return _resample(df, resolution, factor)
+        # Slice the cached resample of the instance. The buckets cut by from_time/to_time are
+        # re-aggregated from the requested bars only, as a direct resample of the range would.
+        full = instance.resampled(resolution, factor)
+        start = full.index.searchsorted(from_time, side="left")
+        stop = full.index.searchsorted(to_time, side="right")
+        if stop <= start:
+            return _resample(df, resolution, factor)
+        head = df.iloc[:df.index.searchsorted(full.index[start], side="left")]
+        tail = df.iloc[df.index.searchsorted(full.index[stop - 1], side="left"):]
+        parts = [_resample(head, resolution, factor), full.iloc[start:stop - 1], _resample(tail, resolution, factor)]
+        parts = [part for part in parts if len(part) > 0]
+        return pd.concat(parts) if parts else _resample(df, resolution, factor)
 
     @classmethod
     def _consume_realtime(cls):
@@ -322,13 +660,30 @@ class OhlcvDataManager:
         consumer.subscribe([settings.kafka_market_data_topic], on_assign=latest_assign)
         logging.info("Started Kafka consumer for real-time OHLCV data.")
         while True:
-            m = consumer.poll(1)
-            if m is None:
-                continue
+            messages = consumer.consume(
+                num_messages=settings.ohlcv_consume_batch_size,
+                timeout=settings.ohlcv_consume_timeout,
+            )
+            if messages:
+                cls._handle_messages(messages)
+
+    @classmethod
+    def _handle_messages(cls, messages) -> int:
+        """
+        Decode a batch of Kafka messages, keep the accepted bars and add them grouped by
+        (resolution, symbol), so each instance is looked up and registered for flushing once per batch.
+        :return: number of bars added
+        """
+        groups: Dict[Tuple[str, str], List[dict]] = collections.defaultdict(list)
+        for m in messages:
             if m.error():
                 logging.error(f"Kafka error: {m.error()}")
                 continue
-            payload = json.loads(m.value())
+            try:
+                payload = orjson.loads(m.value())
+            except orjson.JSONDecodeError as e:
+                logging.error(f"Invalid realtime message: {e}")
+                continue
 
             symbol = payload.get('symbol')
             if cls._allowed_symbols and symbol not in cls._allowed_symbols:
@@ -340,23 +695,27 @@ class OhlcvDataManager:
             if data_type != _accepted_data_type or data_source != _accepted_data_source:
                 continue
 
-            # Check resolution
+            # Check resolution, messages carry either the database ("MIN") or the short ("m") name
             resolution = payload.get('resolution')
+            resolution = _map_accept_db_resolutions.get(resolution, resolution)
             if resolution not in _accepted_resolutions:
                 continue
 
-            resolution = _map_accept_db_resolutions.get(resolution)
-            # Add to corresponding OhlcvData instance
-            new_payload = {
+            groups[(resolution, symbol)].append({
                 "time": payload.get('time'),
                 "open": payload.get('open'),
                 "high": payload.get('high'),
                 "low": payload.get('low'),
                 "close": payload.get('close'),
                 "volume": payload.get('volume'),
-            }
-            cls.add(resolution, payload['symbol'], new_payload)
-            logging.debug(f'Received message [{datetime.datetime.fromtimestamp(payload['updated'])}]: {payload}')
+            })
+
+        # Add to corresponding OhlcvData instances
+        for (resolution, symbol), rows in groups.items():
+            cls.add_many(resolution, symbol, rows)
+        total = sum(len(rows) for rows in groups.values())
+        logging.debug(f"Received {len(messages)} messages: {total} bars of {len(groups)} symbols")
+        return total
 
     @classmethod
     def consume_realtime(cls):
@@ -12,5 +12,6 @@ from xno.models.backtest import *
 from xno.models.summary import BotTradeSummary, SeriesMetric
 from xno.models.analysis import TradeAnalysis
 from xno.models.pf import TradePerformance
+from xno.models.drawdown import DrawdownEpisode
 from xno.models.state_history import BotStateHistory, StateSeries
 from xno.models.result import *
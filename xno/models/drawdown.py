@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from xno.basic_type import DateTimeType
+from xno.utils.struct import DefaultStruct
+
+__all__ = ["DrawdownEpisode"]
+
+
+@dataclass
+class DrawdownEpisode(DefaultStruct):
+    start: DateTimeType  # last peak before the drawdown
+    trough: DateTimeType
+    recovery: DateTimeType | None  # first bar back at the peak, None if not recovered yet
+    depth: float  # trough / peak - 1 (negative)
+    length: int  # bars from the peak to the recovery (or to the last bar)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import List
 
 __all__ = ["TradePerformance"]
 
@@ -26,6 +27,18 @@ class TradePerformance(DefaultStruct):
     win_rate: float | None
     annual_return: float | None
     calmar: float | None
+    # Bootstrap confidence intervals, [lower, upper] (see BaseBacktest.get_confidence_intervals)
+    sharpe_ci: List[float] | None = None
+    max_drawdown_ci: List[float] | None = None
+    annual_return_ci: List[float] | None = None
+    # Permutation test p-value of the Sharpe ratio (see BaseBacktest.get_permutation_test)
+    sharpe_pvalue: float | None = None
+    # Relative to a market index (see BaseBacktest.get_index_metrics)
+    beta: float | None = None
+    alpha: float | None = None
+    correlation: float | None = None
+    tracking_error: float | None = None
+    information_ratio: float | None = None
 
 
 if __name__ == "__main__":
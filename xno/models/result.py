@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 
+from xno.models.summary import BotTradeSummary
 from xno.utils.struct import DefaultStruct
 import numpy as np
 
@@ -8,10 +9,11 @@ __all__ = ["BotBacktestResult", "BotBacktestResultSummary"]
 
 @dataclass
 class BotBacktestResultSummary(DefaultStruct):
-    train: dict
-    test: dict
-    simulate: dict
-    live: dict
+    # Empty dict when the period was not run
+    train: BotTradeSummary | dict
+    test: BotTradeSummary | dict
+    simulate: BotTradeSummary | dict
+    live: BotTradeSummary | dict
 
 @dataclass
 class BotBacktestResult(DefaultStruct):
@@ -7,6 +7,7 @@ import pandas as pd
 from xno.models import TypeTradeMode
 from xno.models.analysis import TradeAnalysis
 from xno.models.pf import TradePerformance
+from xno.models.drawdown import DrawdownEpisode
 from xno.basic_type import DateTimeType, NumericType
 from dataclasses import dataclass
 from xno.utils.struct import DefaultStruct
@@ -33,6 +34,9 @@ class BotTradeSummary(DefaultStruct):
     performance: TradePerformance
     series: Dict[str, SeriesMetric]
     bt_mode: TypeTradeMode
+    drawdowns: List[DrawdownEpisode] | None = None  # deepest drawdown episodes first
+    symbol: str | None = None
+    timeframe: str | None = None
 
     def __repr__(self):
         return (f"StrategyTradeSummary(strategy_id={self.bot_id}, init_cash={self.init_cash}, "
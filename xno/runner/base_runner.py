@@ -4,7 +4,7 @@ from typing import List, Dict, Optional, Type
 from confluent_kafka import Producer
 
 from xno import settings
-from xno.backtest.common import BaseBacktest
+from xno.backtest.common import BaseBacktest, period_bounds
 from xno.connectors.rd import RedisClient
 from xno.models import (
     BotState,
@@ -15,7 +15,8 @@ from xno.models import (
     AdvancedConfig,
     BotTradeSummary,
     BotConfig,
-    TypeSymbolType
+    TypeSymbolType,
+    BotBacktestResultSummary
 )
 import pandas as pd
 import logging
@@ -23,6 +24,7 @@ import xno.utils.keys as ukeys
 import numpy as np
 from xno.tasks import capp, CeleryTaskGroups
 import pickle
+from xno.tasks.transport import put_backtest_input, run_backtest_task, run_backtest_task_by_reference
 import uuid
 
 from xno.models.backtest import BacktestInput
@@ -30,7 +32,7 @@ from xno.utils.dc import timing
 from xno.utils.stream import delivery_report
 from xno.data.all_data_final import AllData
 import threading
-from xno.backtest import StrategyVisualizer
+from xno.backtest import StrategyVisualizer, ResultsStore
 
 from xno.models import TypeTradeMode
 
@@ -154,6 +156,7 @@ class BaseRunner(ABC):
             prices=np.array(self.prices, dtype=np.float64),
             positions=np.array(self.ht_positions, dtype=np.float64),
             trade_sizes=np.array(self.ht_trade_sizes, dtype=np.float64),
+            volumes=self.datas["Volume"].to_numpy(dtype=np.float64) if "Volume" in self.datas else None,
         )
 
     def __load_data__(self):
@@ -406,19 +409,26 @@ class BaseRunner(ABC):
         """
         raise NotImplementedError("Subclasses should implement this method.")
 
-    def send_backtest_task(self, task_id: str = None):
+    def send_backtest_task(self, task_id: str = None, by_reference: bool = True):
         """
         Use this function to send backtest task to celery worker.
+        :param task_id: Celery task id, generated if None
+        :param by_reference: store the input as a binary frame in Redis (see `BacktestInput.to_bytes`)
+            and send only its key to `xno.tasks.backtest.run_backtest_by_reference`. False sends the
+            pickled input to the legacy `run_backtest` task, for workers not yet running that task.
         :return: None
         """
         if task_id is None:
             task_id = uuid.uuid4().hex
 
         bt_input = self.get_backtest_input()
-        bt_input_bytes = pickle.dumps(bt_input)
+        if by_reference:
+            task_name, bt_input_arg = run_backtest_task_by_reference, put_backtest_input(bt_input, task_id)
+        else:
+            task_name, bt_input_arg = run_backtest_task, pickle.dumps(bt_input)
         sig = capp.signature(
-            f"{CeleryTaskGroups.BACKTEST}.run_backtest",
-            args=(bt_input_bytes, task_id, ),
+            f"{CeleryTaskGroups.BACKTEST}.{task_name}",
+            args=(bt_input_arg, task_id, ),
         )
         sig.apply_async(task_id=task_id)
         logging.info(f"Sending backtest task for strategy {self.bot_id}. Task ID: {task_id}")
@@ -435,6 +445,48 @@ class BaseRunner(ABC):
             self.bt_summary = bt_calculator.summarize()
         return self.bt_summary
 
+    def store_backtest(self, store: ResultsStore | None = None):
+        """
+        Write the backtest summary and series to the Parquet results store.
+        :param store: results store, the one at `settings.results_store_path` if None
+        """
+        (store or ResultsStore()).write(self.backtest(), engine=self.run_engine)
+
+    def get_period_bounds(self, live_from=None) -> Dict[TypeTradeMode, tuple]:
+        """
+        Bar ranges of the train/test/simulate/live periods from `AdvancedConfig`:
+        train = [train_from, train_to], test = [val_from or after train_to, val_to],
+        simulate = after val_to (up to live_from), live = from live_from (empty if None).
+        :param live_from: first time of the live period
+        """
+        cfg = self.cfg.advanced_config
+        times = np.array(self.times, dtype='datetime64[ns]')
+        bounds = {TypeTradeMode.Train: period_bounds(times, cfg.train_from, cfg.train_to)}
+        if cfg.val_from is not None:
+            bounds[TypeTradeMode.Test] = period_bounds(times, cfg.val_from, cfg.val_to)
+        elif cfg.train_to is not None:
+            bounds[TypeTradeMode.Test] = period_bounds(times, cfg.train_to, cfg.val_to, include_start=False)
+        if cfg.val_to is not None:
+            simulate_to = None
+            if live_from is not None:
+                simulate_to = pd.Timestamp(live_from) - pd.Timedelta(1, "ns")
+            bounds[TypeTradeMode.Simulate] = period_bounds(times, cfg.val_to, simulate_to, include_start=False)
+        if live_from is not None:
+            bounds[TypeTradeMode.Live] = period_bounds(times, live_from)
+        return bounds
+
+    @timing
+    def backtest_periods(self, live_from=None) -> BotBacktestResultSummary:
+        """
+        Train/test/simulate/live summaries from a single run over the union of the periods
+        (`run_from`/`run_to` must cover them). The arrays of the run are split at the
+        `AdvancedConfig` boundaries instead of running the bot once per period.
+        :param live_from: first time of the live period, the live summary stays empty if None
+        :return:
+        """
+        bt_calculator = self.bt_cls(self.get_backtest_input())
+        return bt_calculator.summarize_periods(self.get_period_bounds(live_from))
+
     @timing
     def visualize(self, name: str = None) -> None:
         """
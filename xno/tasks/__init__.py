@@ -23,6 +23,7 @@ class CeleryTaskGroups:
 capp = Celery(
     broker=broker_url,
     backend=backend_url,
+    include=["xno.tasks.backtest"],  # tasks registered on workers
 )
 capp.conf.task_queues = (
     Queue(CeleryQueueNames.BACKTEST),
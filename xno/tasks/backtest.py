@@ -0,0 +1,21 @@
+"""
+Worker-side backtest tasks.
+"""
+import logging
+
+from xno.tasks import capp, CeleryTaskGroups
+from xno.tasks.transport import load_backtest_input, run_backtest_task_by_reference
+
+
+@capp.task(name=f"{CeleryTaskGroups.BACKTEST}.{run_backtest_task_by_reference}")
+def run_backtest_by_reference(bt_input_ref: str, task_id: str) -> str:
+    """
+    Run the backtest of an input stored in Redis by `put_backtest_input` (the entry is consumed).
+    :param bt_input_ref: Redis key of the encoded `BacktestInput`
+    :param task_id: task id, for logging
+    :return: the `BotTradeSummary` as JSON
+    """
+    bt_input = load_backtest_input(bt_input_ref, delete=True)
+    logging.info(f"Running backtest of bot_id={bt_input.bot_id} ({len(bt_input.prices)} bars). Task ID: {task_id}")
+    summary = bt_input.bt_cls(bt_input).summarize()
+    return summary.to_json().decode()
@@ -0,0 +1,64 @@
+"""
+Wire format for backtest tasks.
+
+`BacktestInput` is encoded with `BacktestInput.to_bytes` (raw NumPy buffers + small header),
+stored once in Redis and passed to the worker by key, so Celery's JSON payload stays tiny.
+
+By-reference tasks go to their own task name, `run_backtest_task_by_reference`, consumed by
+`xno.tasks.backtest.run_backtest_by_reference`. Workers that only know the pickled
+`run_backtest_task` keep working while both are deployed.
+"""
+import logging
+import pickle
+
+from xno import settings
+from xno.models.backtest import BacktestInput
+from xno.utils.binary import is_frame
+import xno.utils.keys as ukeys
+
+run_backtest_task = "run_backtest"  # args: (pickled BacktestInput, task_id)
+run_backtest_task_by_reference = "run_backtest_by_reference"  # args: (Redis key, task_id)
+
+
+def _redis():
+    from xno.connectors.rd import RedisClient  # connects at import, only needed when sending/receiving
+
+    return RedisClient
+
+
+def put_backtest_input(bt_input: BacktestInput, task_id: str) -> str:
+    """
+    Store the encoded input in Redis.
+    :return: the reference (Redis key) to send to the worker
+    """
+    key = ukeys.generate_backtest_input_key(task_id)
+    payload = bt_input.to_bytes()
+    _redis().set(key, payload, ex=settings.backtest_input_ttl)
+    logging.debug(f"Stored backtest input {key} ({len(payload)} bytes)")
+    return key
+
+
+def load_backtest_input(ref: str | bytes, delete: bool = False, allow_pickle: bool = False) -> BacktestInput:
+    """
+    Worker-side decode. Accepts a Redis key or an inline binary frame.
+    Numeric arrays of the returned input are zero-copy views over the fetched buffer.
+    :param ref: Redis key (str) or raw payload (bytes)
+    :param delete: remove the Redis entry once fetched
+    :param allow_pickle: also accept legacy pickled inputs; only for payloads from a trusted sender,
+        unpickling runs arbitrary code
+    """
+    if isinstance(ref, str):
+        client = _redis()
+        payload = client.get(ref)
+        if payload is None:
+            raise KeyError(f"Backtest input {ref} not found (expired or already consumed)")
+        if delete:
+            client.delete(ref)
+    else:
+        payload = ref
+
+    if is_frame(payload):
+        return BacktestInput.from_bytes(payload)
+    if not allow_pickle:
+        raise ValueError("Backtest input is not a binary frame (legacy pickled inputs need allow_pickle=True)")
+    return pickle.loads(payload)
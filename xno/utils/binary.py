@@ -0,0 +1,88 @@
+"""
+Compact binary framing for NumPy arrays.
+
+Layout of a frame::
+
+    MAGIC (8 bytes) | header length (uint32, little endian) | header (orjson) | padding | buffers...
+
+Every buffer starts at a 64-byte aligned offset so that the decoder can map it
+with ``np.frombuffer`` without copying.
+"""
+import struct
+from typing import Dict, Tuple, Any
+
+import numpy as np
+import orjson
+
+MAGIC = b"XNOBIN1\x00"
+_ALIGN = 64
+_LEN = struct.Struct("<I")
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def is_frame(buf) -> bool:
+    """Check whether a buffer starts with the frame magic bytes."""
+    return bytes(memoryview(buf)[:len(MAGIC)]) == MAGIC
+
+
+def pack_arrays(meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> bytes:
+    """
+    Pack metadata and arrays into a single frame.
+    :param meta: JSON-serializable metadata
+    :param arrays: named arrays, written in C order with their native dtype
+    :return: the frame bytes
+    """
+    specs = []
+    buffers = []
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        offset = _aligned(offset)
+        specs.append({
+            "name": name,
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+        })
+        buffers.append((offset, arr))
+        offset += arr.nbytes
+
+    header = orjson.dumps({"meta": meta, "arrays": specs}, option=orjson.OPT_SERIALIZE_NUMPY)
+    data_start = _aligned(len(MAGIC) + _LEN.size + len(header))
+    out = bytearray(data_start + offset)
+    out[:len(MAGIC)] = MAGIC
+    _LEN.pack_into(out, len(MAGIC), len(header))
+    out[len(MAGIC) + _LEN.size:len(MAGIC) + _LEN.size + len(header)] = header
+    view = memoryview(out)
+    for buf_offset, arr in buffers:
+        start = data_start + buf_offset
+        view[start:start + arr.nbytes] = arr.reshape(-1).view(np.uint8)
+    return bytes(out)
+
+
+def unpack_arrays(buf) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Decode a frame produced by `pack_arrays`.
+    Arrays are zero-copy views over ``buf`` and are read-only when ``buf`` is immutable (e.g. bytes).
+    :param buf: bytes, bytearray or memoryview
+    :return: (meta, arrays)
+    """
+    view = memoryview(buf)
+    if not is_frame(view):
+        raise ValueError("Invalid binary frame: magic bytes mismatch")
+    (header_len,) = _LEN.unpack_from(view, len(MAGIC))
+    header_start = len(MAGIC) + _LEN.size
+    header = orjson.loads(view[header_start:header_start + header_len])
+    data_start = _aligned(header_start + header_len)
+
+    arrays = {}
+    for spec in header["arrays"]:
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        arr = np.frombuffer(view, dtype=dtype, count=count, offset=data_start + spec["offset"])
+        arrays[spec["name"]] = arr.reshape(shape)
+    return header["meta"], arrays
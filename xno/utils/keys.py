@@ -18,3 +18,6 @@ def generate_backtest_overview_kafka_topic() -> str:
 
 def generate_backtest_history_kafka_topic() -> str:
     return settings.kafka_backtest_history_topic
+
+def generate_backtest_input_key(task_id: str) -> str:
+    return f"{settings.redis_backtest_input_prefix}:{task_id}"